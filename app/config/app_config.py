@@ -32,11 +32,71 @@ class AppConfig:
         "Authorization": f"Bearer {SUPERWISE_AUTH_TOKEN}" if SUPERWISE_AUTH_TOKEN else ""
     }
     
-    # Data Configuration
+    # Data Configuration: one directory, or several sites as "site=path,site=path"
     DATA_DIR = os.getenv("DATA_DIR", "synthetic-data")
-    SENSOR_DATA_FILE = "synthetic_sensor_data.csv"
-    MAINTENANCE_DATA_FILE = "synthetic_maintenance_records.csv"
-    
+    # Site ID of a DATA_DIR given without one
+    DATA_SITE = os.getenv("DATA_SITE", "default")
+    # Threads loading sites in parallel (0 uses one per site)
+    DATA_LOAD_WORKERS = int(os.getenv("DATA_LOAD_WORKERS", "0"))
+    # Export read from DATA_DIR: "csv", "txt" (delimited text) or "json"
+    DATA_FILE_FORMAT = os.getenv("DATA_FILE_FORMAT", "csv").lower()
+    SENSOR_DATA_FILE = f"synthetic_sensor_data.{DATA_FILE_FORMAT}"
+    MAINTENANCE_DATA_FILE = f"synthetic_maintenance_records.{DATA_FILE_FORMAT}"
+
+    # Sensor Storage Configuration ("csv", "parquet", "partitioned" or "auto")
+    SENSOR_STORAGE_BACKEND = os.getenv("SENSOR_STORAGE_BACKEND", "csv")
+    SENSOR_PARQUET_FILE = "synthetic_sensor_data.parquet"
+    # Partitioned layout: <DATA_DIR>/sensor/machine_id=<id>/date=<YYYY-MM-DD>/part-<n>.<format>
+    SENSOR_PARTITION_DIR = "sensor"
+    SENSOR_PARTITION_FORMAT = os.getenv("SENSOR_PARTITION_FORMAT", "csv")
+    PARQUET_ROW_GROUP_SIZE = int(os.getenv("PARQUET_ROW_GROUP_SIZE", "65536"))
+    # How far behind a machine's newest reading an appended row may arrive ("" accepts any delay)
+    SENSOR_LATE_ARRIVAL_WINDOW = os.getenv("SENSOR_LATE_ARRIVAL_WINDOW", "")
+    # Re-read only rows appended to the sensor CSV instead of caching it forever
+    SENSOR_INCREMENTAL_INGEST = os.getenv("SENSOR_INCREMENTAL_INGEST", "false").lower() == "true"
+    # Rows per chunk for the streaming, dtype-optimized CSV loader (0 disables it)
+    SENSOR_LOAD_CHUNK_SIZE = int(os.getenv("SENSOR_LOAD_CHUNK_SIZE", "0"))
+    SENSOR_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+    # Maximum history points returned for charting before downsampling kicks in
+    HISTORY_MAX_POINTS = int(os.getenv("HISTORY_MAX_POINTS", "500"))
+    # Rollup tiers kept for downsampled history queries (empty disables rollups)
+    ROLLUP_TIERS = [tier.strip() for tier in os.getenv("ROLLUP_TIERS", "1min,1h,1D").split(",") if tier.strip()]
+    # Most recent readings per machine kept in memory-bounded ring buffers
+    RECENT_WINDOW_SIZE = int(os.getenv("RECENT_WINDOW_SIZE", "256"))
+    # Machines whose complete history read through predicate pushdown stays cached
+    PUSHDOWN_CACHE_MACHINES = int(os.getenv("PUSHDOWN_CACHE_MACHINES", "32"))
+    # Readings scored per chunk when backfilling the risk history
+    RISK_BACKFILL_CHUNK_SIZE = int(os.getenv("RISK_BACKFILL_CHUNK_SIZE", "65536"))
+    # Streaming anomaly detection: EWMA smoothing factor, CUSUM slack and alarm
+    # threshold (in standard deviations), readings before alarms are raised and
+    # EWMA half-lives replayed per machine when seeding from stored history
+    ANOMALY_EWMA_ALPHA = float(os.getenv("ANOMALY_EWMA_ALPHA", "0.01"))
+    ANOMALY_CUSUM_SLACK = float(os.getenv("ANOMALY_CUSUM_SLACK", "0.5"))
+    ANOMALY_CUSUM_THRESHOLD = float(os.getenv("ANOMALY_CUSUM_THRESHOLD", "8.0"))
+    ANOMALY_WARMUP = int(os.getenv("ANOMALY_WARMUP", "100"))
+    ANOMALY_REPLAY_HALF_LIVES = float(os.getenv("ANOMALY_REPLAY_HALF_LIVES", "20"))
+    # Remaining useful life: half-life of a reading in the trend fit, effective
+    # readings needed for an estimate and the longest projection reported
+    RUL_HALF_LIFE_HOURS = float(os.getenv("RUL_HALF_LIFE_HOURS", "168"))
+    RUL_MIN_READINGS = float(os.getenv("RUL_MIN_READINGS", "10"))
+    RUL_HORIZON_DAYS = float(os.getenv("RUL_HORIZON_DAYS", "365"))
+    # Fleet scoring on a process pool (fewer than 2 workers scores in-process),
+    # rows per shard and the smallest batch worth sending to the pool
+    FLEET_SCORING_WORKERS = int(os.getenv("FLEET_SCORING_WORKERS", "0"))
+    FLEET_SCORING_SHARD_SIZE = int(os.getenv("FLEET_SCORING_SHARD_SIZE", "65536"))
+    FLEET_SCORING_MIN_ROWS = int(os.getenv("FLEET_SCORING_MIN_ROWS", "100000"))
+    # Machine predictions kept in the LRU prediction cache (0 disables it)
+    PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "10000"))
+
+    # Data file watching ("auto" uses inotify where available, "poll" or "off")
+    DATA_WATCH_MODE = os.getenv("DATA_WATCH_MODE", "auto")
+    DATA_WATCH_INTERVAL = float(os.getenv("DATA_WATCH_INTERVAL", "2"))
+
+    # Data Backend Configuration ("pandas" or "sqlite")
+    DATA_BACKEND = os.getenv("DATA_BACKEND", "pandas")
+    SQLITE_DB_FILE = "manufacturing_ai.db"
+    SQLITE_DB_PATH = os.getenv("SQLITE_DB_PATH", "")
+
     # Logging Configuration
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
     LOG_FILE = os.getenv("LOG_FILE", None)
@@ -65,6 +125,22 @@ class AppConfig:
         'pressure': {'low': 2.0, 'medium': 2.5, 'high': 3.0}
     }
     
+    # Sensor channels scored and charted, in display order; thresholds come from RISK_THRESHOLDS
+    SENSOR_CHANNELS = [
+        {'name': 'vibration', 'label': 'Vibration', 'unit': 'g', 'weight': 0.3,
+         'color': '#8b5cf6', 'alert': 'Vibration exceeded {high} g'},
+        {'name': 'temperature', 'label': 'Temperature', 'unit': '°C', 'weight': 0.25,
+         'color': '#ef4444', 'alert': 'Temperature rose above {high}°C'},
+        {'name': 'current', 'label': 'Current', 'unit': 'A', 'weight': 0.25,
+         'color': '#f59e0b', 'alert': 'Current consumption above {high} A'},
+        {'name': 'pressure', 'label': 'Pressure', 'unit': 'bar', 'weight': 0.2,
+         'color': '#10b981', 'alert': 'Pressure exceeded {high} bar'},
+    ]
+    # JSON list of extra channels (name, label, unit, thresholds, weight, color), e.g. spindle speed
+    SENSOR_CHANNELS_FILE = os.getenv("SENSOR_CHANNELS_FILE", "")
+    # JSON threshold / weight overrides and per-machine-type profiles, reloaded when the file changes
+    SCORING_CONFIG_FILE = os.getenv("SCORING_CONFIG_FILE", "")
+    
     @classmethod
     def get_superwise_config(cls) -> Dict[str, Any]:
         """Get Superwise AI configuration."""
@@ -74,12 +150,41 @@ class AppConfig:
             "timeout": cls.SUPERWISE_TIMEOUT
         }
     
+    @classmethod
+    def get_data_sites(cls, data_dir: str = None) -> Dict[str, str]:
+        """
+        Parse DATA_DIR into data directories by site ID.
+        
+        Args:
+            data_dir: Value to parse (default: DATA_DIR)
+            
+        Returns:
+            Site ID -> data directory, in the configured order
+        """
+        value = cls.DATA_DIR if data_dir is None else data_dir
+        if "=" not in value:
+            return {cls.DATA_SITE: value}
+        sites = {}
+        for entry in value.split(","):
+            if not entry.strip():
+                continue
+            site, separator, path = entry.partition("=")
+            site, path = site.strip(), path.strip()
+            if not separator or not site or not path:
+                raise ValueError(f"Expected site=path in DATA_DIR, got {entry!r}")
+            if site in sites:
+                raise ValueError(f"Site {site!r} is listed twice in DATA_DIR")
+            sites[site] = path
+        return sites
+    
     @classmethod
     def get_data_paths(cls) -> Dict[str, str]:
         """Get data file paths."""
         return {
             "data_dir": cls.DATA_DIR,
             "sensor_data": os.path.join(cls.DATA_DIR, cls.SENSOR_DATA_FILE),
+            "sensor_parquet": os.path.join(cls.DATA_DIR, cls.SENSOR_PARQUET_FILE),
+            "sensor_partitions": os.path.join(cls.DATA_DIR, cls.SENSOR_PARTITION_DIR),
             "maintenance_data": os.path.join(cls.DATA_DIR, cls.MAINTENANCE_DATA_FILE)
         }
     
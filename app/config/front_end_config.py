@@ -20,6 +20,7 @@ class FrontendConfig:
     # Service Configuration
     REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", "30"))
     CACHE_TTL = int(os.getenv("CACHE_TTL", "60"))
+    HISTORY_MAX_POINTS = int(os.getenv("HISTORY_MAX_POINTS", "500"))
     
     # Dashboard Configuration
     DASHBOARD_TITLE = "Manufacturing Predictive Maintenance"
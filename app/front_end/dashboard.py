@@ -23,18 +23,19 @@ logger = get_logger(__name__)
 # Add the parent directory to the path to import utils
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from utils.data_loader import DataLoader
+from utils.data_loader import get_data_loader
 from utils.predictor import MaintenancePredictor
 from utils.css_styles import get_dashboard_styles
 from services.machines_service import machines_service, ServiceException
 from machine_details import show_machine_details_content, show_machine_details_page
 from header import create_header
 
-# Initialize data loader and predictor
-data_loader = DataLoader()
+# Shared process-wide data loader and predictor
+data_loader = get_data_loader()
 predictor = MaintenancePredictor()
 
-@st.cache_data(ttl=frontend_config.CACHE_TTL)  # Cache for configured TTL
+# Watched data files and scoring reloads clear the cache, so it only expires on a timer without a watcher
+@st.cache_data(ttl=None if data_loader.watcher else frontend_config.CACHE_TTL)
 def get_service_data(method_name, *args, **kwargs):
     """Helper function to get data from service with error handling."""
     logger.debug(f"Calling service method: {method_name}")
@@ -52,6 +53,21 @@ def get_service_data(method_name, *args, **kwargs):
         st.error(f"Unexpected error: {str(e)}")
         return None
 
+def clear_service_data(changed_paths):
+    """Drop cached service results after the data files changed."""
+    logger.debug(f"Clearing cached service data after changes to {changed_paths}")
+    get_service_data.clear()
+
+def clear_scored_service_data(stale_profiles):
+    """Drop cached service results after a scoring configuration reload retuned profiles."""
+    logger.debug(f"Clearing cached service data after retuning {sorted(stale_profiles)}")
+    get_service_data.clear()
+
+if data_loader.watcher is not None:
+    data_loader.watcher.add_listener(clear_service_data)
+# Scoring configuration reloads do not touch the data files
+machines_service.predictor.scoring.add_listener(clear_scored_service_data)
+
 def get_machine_status_color(status):
     """Get color based on machine status."""
     return frontend_config.get_status_colors().get(status, "#757575")
@@ -12,7 +12,8 @@ import os
 
 # Add the parent directory to the path to import data_loader
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils.data_loader import DataLoader
+from utils.data_loader import get_data_loader
+from utils.channels import channel_registry
 from utils.logger_config import get_logger
 from config.front_end_config import frontend_config
 from services.machines_service import machines_service, ServiceException
@@ -21,8 +22,8 @@ from client.swe_client import SuperwiseRequest
 # Initialize logger
 logger = get_logger(__name__)
 
-# Initialize data loader
-data_loader = DataLoader()
+# Shared process-wide data loader
+data_loader = get_data_loader()
 
 def get_service_data(method_name, *args, **kwargs):
     """
@@ -54,6 +55,92 @@ def show_custom_loader(message="Loading Machine Details", submessage="Please wai
     </div>
     """, unsafe_allow_html=True)
 
+def add_range_band(fig, history, column, fill_color):
+    """Shade the per-bucket min/max range behind a downsampled sensor trace."""
+    if f"{column}_min" not in history.columns:
+        return
+    fig.add_trace(
+        go.Scatter(
+            x=history['timestamp'],
+            y=history[f"{column}_max"],
+            line=dict(width=0),
+            hoverinfo='skip',
+            showlegend=False
+        )
+    )
+    fig.add_trace(
+        go.Scatter(
+            x=history['timestamp'],
+            y=history[f"{column}_min"],
+            line=dict(width=0),
+            fill='tonexty',
+            fillcolor=fill_color,
+            hoverinfo='skip',
+            showlegend=False
+        )
+    )
+
+def channel_chart(history, channel):
+    """Build the history chart of one sensor channel."""
+    red, green, blue = (int(channel.color[i:i + 2], 16) for i in (1, 3, 5))
+    title = f"{channel.label} ({channel.unit})" if channel.unit else channel.label
+    fig = go.Figure()
+    add_range_band(fig, history, channel.name, f'rgba({red}, {green}, {blue}, 0.15)')
+    fig.add_trace(
+        go.Scatter(
+            x=history['timestamp'], 
+            y=history[channel.name], 
+            name=channel.label,
+            line=dict(color=channel.color, width=2),
+            mode='lines+markers'
+        )
+    )
+    fig.update_layout(
+        title=title,
+        xaxis_title="Time",
+        yaxis_title=title,
+        height=300,
+        margin=dict(t=40, b=20, l=20, r=20),
+        plot_bgcolor='white',
+        paper_bgcolor='white'
+    )
+    return fig
+
+def risk_chart(risk_history):
+    """Build the chart of a machine's precomputed risk score over time."""
+    fig = go.Figure()
+    if 'risk_score_max' in risk_history.columns:
+        # Highest reading of each bucket
+        fig.add_trace(
+            go.Scatter(
+                x=risk_history['timestamp'],
+                y=risk_history['risk_score_max'],
+                name="Peak risk",
+                line=dict(color='#ef4444', width=1, dash='dot'),
+                mode='lines'
+            )
+        )
+    fig.add_trace(
+        go.Scatter(
+            x=risk_history['timestamp'],
+            y=risk_history['risk_score'],
+            name="Risk score",
+            line=dict(color='#ef4444', width=2),
+            mode='lines'
+        )
+    )
+    fig.update_layout(
+        title="Risk score",
+        xaxis_title="Time",
+        yaxis_title="Risk score",
+        yaxis=dict(range=[0, 1]),
+        height=300,
+        margin=dict(t=40, b=20, l=20, r=20),
+        plot_bgcolor='white',
+        paper_bgcolor='white'
+    )
+    return fig
+
 def show_machine_details_content(selected_machine):
     """Show detailed view for a specific machine."""
     if 'superwise_response' in st.session_state:
@@ -68,8 +155,10 @@ def show_machine_details_content(selected_machine):
 
     st.subheader(f"Machine: {selected_machine}")
     
-    # Load historical data
-    history = data_loader.get_machine_history(selected_machine)
+    # Load historical data, bucketed server-side to a bounded number of points
+    history = data_loader.get_machine_history(
+        selected_machine, max_points=frontend_config.HISTORY_MAX_POINTS
+    )
     # Load maintenance data for the selected machine
     maintenance_data = data_loader.get_machine_maintenance_data(selected_machine)
     service_notes = maintenance_data.get('service_notes', '') if maintenance_data else ''
@@ -79,101 +168,28 @@ def show_machine_details_content(selected_machine):
 
     # Historical data visualization
     if not history.empty:
-        # Create 2x2 grid layout for the 4 separate graphs
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            # Vibration Chart
-            fig_vibration = go.Figure()
-            fig_vibration.add_trace(
-                go.Scatter(
-                    x=history['timestamp'], 
-                    y=history['vibration'], 
-                    name='Vibration',
-                    line=dict(color='#8b5cf6', width=2),
-                    mode='lines+markers'
-                )
-            )
-            fig_vibration.update_layout(
-                title="Vibration (g)",
-                xaxis_title="Time",
-                yaxis_title="Vibration (g)",
-                height=300,
-                margin=dict(t=40, b=20, l=20, r=20),
-                plot_bgcolor='white',
-                paper_bgcolor='white'
-            )
-            st.plotly_chart(fig_vibration, use_container_width=True)
-            
-            # Current Chart
-            fig_current = go.Figure()
-            fig_current.add_trace(
-                go.Scatter(
-                    x=history['timestamp'], 
-                    y=history['current'], 
-                    name='Current',
-                    line=dict(color='#f59e0b', width=2),
-                    mode='lines+markers'
-                )
-            )
-            fig_current.update_layout(
-                title="Current (A)",
-                xaxis_title="Time",
-                yaxis_title="Current (A)",
-                height=300,
-                margin=dict(t=40, b=20, l=20, r=20),
-                plot_bgcolor='white',
-                paper_bgcolor='white'
-            )
-            st.plotly_chart(fig_current, use_container_width=True)
-        
-        with col2:
-            # Temperature Chart
-            fig_temperature = go.Figure()
-            fig_temperature.add_trace(
-                go.Scatter(
-                    x=history['timestamp'], 
-                    y=history['temperature'], 
-                    name='Temperature',
-                    line=dict(color='#ef4444', width=2),
-                    mode='lines+markers'
-                )
-            )
-            fig_temperature.update_layout(
-                title="Temperature (°C)",
-                xaxis_title="Time",
-                yaxis_title="Temperature (°C)",
-                height=300,
-                margin=dict(t=40, b=20, l=20, r=20),
-                plot_bgcolor='white',
-                paper_bgcolor='white'
-            )
-            st.plotly_chart(fig_temperature, use_container_width=True)
-            
-            # Pressure Chart
-            fig_pressure = go.Figure()
-            fig_pressure.add_trace(
-                go.Scatter(
-                    x=history['timestamp'], 
-                    y=history['pressure'], 
-                    name='Pressure',
-                    line=dict(color='#10b981', width=2),
-                    mode='lines+markers'
-                )
-            )
-            fig_pressure.update_layout(
-                title="Pressure (bar)",
-                xaxis_title="Time",
-                yaxis_title="Pressure (bar)",
-                height=300,
-                margin=dict(t=40, b=20, l=20, r=20),
-                plot_bgcolor='white',
-                paper_bgcolor='white'
-            )
-            st.plotly_chart(fig_pressure, use_container_width=True)
+        # Two-column grid with one chart per registered sensor channel
+        columns = st.columns(2)
+        channels = [channel for channel in channel_registry if channel.name in history]
+        for position, channel in enumerate(channels):
+            with columns[position % 2]:
+                st.plotly_chart(channel_chart(history, channel), use_container_width=True)
     else:
         st.info("No historical data available for this machine.")
 
+    # Latest drift alarms from the streaming anomaly detector
+    for event in machine_details.get('anomalies', {}).get('events', [])[-3:]:
+        channel = channel_registry[event['channel']] if event['channel'] in channel_registry else None
+        label = channel.label if channel else event['channel']
+        st.warning(f"Drift alarm: {label} trending {event['direction']} "
+                   f"({event['z_score']:+.1f}σ) at {event['timestamp']}")
+
+    # Risk over time, precomputed for every reading
+    risk_history = pd.DataFrame(machine_details.get('risk_history', []))
+    if not risk_history.empty:
+        risk_history['timestamp'] = pd.to_datetime(risk_history['timestamp'])
+        st.plotly_chart(risk_chart(risk_history), use_container_width=True)
+
     # Superwise Integration Section
     st.markdown("### 🤖 Superwise AI Assistant")
 
@@ -14,6 +14,7 @@ import time
 # Import centralized logging and configuration
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from utils.logger_config import get_logger
+from utils.data_loader import get_data_loader
 from config.front_end_config import frontend_config
 from services.machines_service import machines_service, ServiceException
 from machine_details import show_machine_details_content, show_machine_details_page
@@ -21,7 +22,11 @@ from header import create_header
 
 logger = get_logger(__name__)
 
-@st.cache_data(ttl=frontend_config.CACHE_TTL)
+# Shared process-wide data loader
+data_loader = get_data_loader()
+
+# Watched data files and scoring reloads clear the cache, so it only expires on a timer without a watcher
+@st.cache_data(ttl=None if data_loader.watcher else frontend_config.CACHE_TTL)
 def get_service_data(method_name, *args, **kwargs):
     """Helper function to get data from service with error handling."""
     logger.debug(f"Calling service method: {method_name}")
@@ -39,6 +44,21 @@ def get_service_data(method_name, *args, **kwargs):
         st.error(f"Unexpected error: {str(e)}")
         return None
 
+def clear_service_data(changed_paths):
+    """Drop cached service results after the data files changed."""
+    logger.debug(f"Clearing cached service data after changes to {changed_paths}")
+    get_service_data.clear()
+
+def clear_scored_service_data(stale_profiles):
+    """Drop cached service results after a scoring configuration reload retuned profiles."""
+    logger.debug(f"Clearing cached service data after retuning {sorted(stale_profiles)}")
+    get_service_data.clear()
+
+if data_loader.watcher is not None:
+    data_loader.watcher.add_listener(clear_service_data)
+# Scoring configuration reloads do not touch the data files
+machines_service.predictor.scoring.add_listener(clear_scored_service_data)
+
 def get_machine_status_color(status):
     """Get color based on machine status."""
     return frontend_config.get_status_colors().get(status, "#757575")
@@ -6,7 +6,10 @@ import json
 import math
 import os
 import sys
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple
+
+import numpy as np
+import pandas as pd
 
 # Import centralized logging and configuration
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -18,7 +21,12 @@ logger = get_logger(__name__)
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils.predictor import MaintenancePredictor
-from utils.data_loader import DataLoader
+from utils.data_loader import get_data_loader
+from utils.sanitizer import to_json_records
+from utils.fleet_scoring import get_fleet_scorer
+from utils.prediction_cache import PredictionCache
+from utils.ring_buffer import WINDOW_CHANNELS, channel_trends
+from utils.channels import channel_registry
 from client.swe_client import superwise_client, SuperwiseRequest, MachineAnalysisRequest, SuperwiseResponse
 
 
@@ -36,12 +44,18 @@ class MachinesService:
     def __init__(self):
         """Initialize the service with required dependencies."""
         self.predictor = MaintenancePredictor()
-        self.data_loader = DataLoader()
+        self.data_loader = get_data_loader()
+        # Predictions per (machine, latest reading, scoring profile version); ingest and
+        # scoring config reloads drop the stale ones
+        self.prediction_cache = PredictionCache()
+        self.data_loader.add_ingest_listener(self.prediction_cache.invalidate)
+        self.predictor.scoring.add_listener(self.prediction_cache.invalidate_versions)
+        self.predictor.scoring.watch()
         logger.info("MachinesService initialized successfully")
     
     def sanitize_float(self, value):
         """Sanitize float values to ensure JSON compliance."""
-        if isinstance(value, (int, float)):
+        if isinstance(value, (int, float, np.integer, np.floating)):
             if math.isnan(value):
                 return 0.0
             elif math.isinf(value):
@@ -83,6 +97,12 @@ class MachinesService:
                     "database": "healthy",
                     "prediction_engine": "healthy",
                     "data_loader": "healthy"
+                },
+                "data_quality": self.data_loader.get_data_quality(),
+                "prediction_cache": self.prediction_cache.stats(),
+                "scoring_config": {
+                    "version": self.predictor.scoring.version,
+                    "machine_types": list(self.predictor.scoring.compiled.names[1:])
                 }
             }
             logger.info("System status retrieved successfully")
@@ -127,6 +147,7 @@ class MachinesService:
                 logger.debug("Falling back to individual machine analysis")
                 
                 # Fallback to individual analysis for each machine
+                fallback_ids = []
                 for machine_id in machine_ids:
                     try:
                         logger.debug(f"Attempting individual Superwise AI analysis for machine {machine_id}")
@@ -136,32 +157,36 @@ class MachinesService:
                         logger.info(f"Individual Superwise AI analysis successful for machine {machine_id}")
                     except Exception as individual_e:
                         logger.warning(f"Individual Superwise AI failed for machine {machine_id}: {str(individual_e)}")
-                        # Use local predictor as final fallback
-                        machine_data = latest_data[latest_data['machine_id'] == machine_id].iloc[0]
-                        sensor_dict = machine_data.to_dict()
-                        prediction = self.predictor.calculate_failure_risk(sensor_dict)
-                        risk_assessments[machine_id] = prediction['failure_risk']
-                        fallback_count += 1
-                        logger.info(f"Fallback analysis for machine {machine_id}: {risk_assessments[machine_id]}")
-            
-            # Build the final machines list
-            machines = []
-            for _, row in latest_data.iterrows():
-                machine_id = row['machine_id']
-                status = risk_assessments.get(machine_id, "Unknown")
+                        fallback_ids.append(machine_id)
                 
-                machine_data = {
-                    "machine_id": machine_id,
-                    "status": status,
-                    "last_reading": row['timestamp'].isoformat(),
-                    "vibration": self.sanitize_float(row['vibration']),
-                    "temperature": self.sanitize_float(row['temperature']),
-                    "current": self.sanitize_float(row['current']),
-                    "pressure": self.sanitize_float(row['pressure']),
-                    "operating_hours": self.sanitize_float(row['operating_hours'])
-                }
-                machines.append(machine_data)
-                logger.debug(f"Added machine data for {machine_id} with status {status}")
+                # Use local predictor as final fallback, scoring all remaining machines at once
+                if fallback_ids:
+                    fallback_data = latest_data[latest_data['machine_id'].astype(str).isin(fallback_ids)]
+                    # Very large fleets are sharded across the fleet scoring pool when enabled
+                    scorer = get_fleet_scorer()
+                    if scorer is not None and scorer.parallel(len(fallback_data)):
+                        scores = scorer.score(fallback_data, explain=False)
+                    else:
+                        scores = self.predictor.score_batch(fallback_data)
+                    risk_assessments.update(zip(scores['machine_id'].astype(str), scores['failure_risk']))
+                    fallback_count = len(fallback_ids)
+                    logger.info(f"Fallback analysis for {fallback_count} machines: "
+                                f"{scores['failure_risk'].value_counts().to_dict()}")
+            
+            # Build the final machines list from the already-sanitized readings in one pass
+            channel_columns = [name for name in channel_registry.names if name in latest_data]
+            machines_frame = latest_data[['machine_id', 'timestamp'] + channel_columns + ['operating_hours']] \
+                .rename(columns={'timestamp': 'last_reading'})
+            machines_frame.insert(1, 'site', latest_data['site'] if 'site' in latest_data else self.data_loader.site)
+            machines_frame.insert(2, 'status', [risk_assessments.get(machine_id, "Unknown") for machine_id in machine_ids])
+            # Trend-based remaining life, estimated for the whole fleet in one pass
+            remaining_life = self.data_loader.get_remaining_life()
+            remaining_days = dict(zip(remaining_life['machine_id'].astype(str), remaining_life['remaining_life_days']))
+            machines_frame['remaining_life_days'] = pd.Series([
+                None if pd.isna(remaining_days.get(machine_id, np.nan)) else remaining_days[machine_id]
+                for machine_id in machines_frame['machine_id'].astype(str)
+            ], index=machines_frame.index, dtype=object)
+            machines = to_json_records(machines_frame)
             
             logger.info(f"Successfully processed {len(machines)} machines - Superwise AI: {superwise_success_count}, Fallback: {fallback_count}")
             return {"machines": machines}
@@ -170,56 +195,96 @@ class MachinesService:
             logger.error(f"Failed to get machines: {str(e)}")
             raise ServiceException(f"Failed to get machines: {str(e)}", 500)
     
-    def get_machine_details(self, machine_id: str) -> Dict[str, Any]:
-        """Get detailed information for a specific machine."""
+    def get_machine_details(self, machine_id: str, start=None, end=None,
+                            max_points: int = None, resample: str = None) -> Dict[str, Any]:
+        """
+        Get detailed information for a specific machine.
+        
+        Args:
+            machine_id: Machine to describe
+            start: Optional inclusive lower bound of the returned history
+            end: Optional inclusive upper bound of the returned history
+            max_points: Maximum history points (default: HISTORY_MAX_POINTS)
+            resample: Optional explicit history bucket width such as ``"1h"``
+            
+        Returns:
+            Current status, cost savings, the (downsampled) history and the
+            machine's risk over time
+        """
         logger.info(f"Machine details service method accessed for machine: {machine_id}")
         try:
-            logger.debug(f"Loading machine history for {machine_id}")
-            # Get machine history
-            history = self.data_loader.get_machine_history(machine_id)
+            logger.debug(f"Loading recent readings for {machine_id}")
+            # Recent readings straight from the machine's ring buffer
+            timestamps, values = self.data_loader.get_recent_window(machine_id)
             
-            if history.empty:
+            if len(timestamps) == 0:
                 logger.warning(f"Machine {machine_id} not found")
                 raise ServiceException("Machine not found", 404)
             
-            logger.info(f"Found {len(history)} history points for machine {machine_id}")
+            history_points = self.data_loader.count_machine_readings(machine_id)
+            logger.info(f"Found {history_points} history points for machine {machine_id}")
             
-            # Get latest data and prediction
-            latest_data = history.iloc[-1].to_dict()
+            # Get latest data and prediction, in the precision the readings are stored in
+            latest_data = dict(zip(WINDOW_CHANNELS, values[-1]))
+            latest_data['machine_id'] = machine_id
+            latest_data['timestamp'] = pd.Timestamp(timestamps[-1])
+            trends = channel_trends(timestamps, values)
             logger.debug(f"Latest data for {machine_id}: {latest_data}")
             
-            logger.debug(f"Calculating failure risk for {machine_id}")
-            prediction = self.predictor.calculate_failure_risk(latest_data)
+            # An unchanged latest reading under the same scoring config reuses its prediction
+            cache_key = PredictionCache.fingerprint(machine_id, latest_data['timestamp'],
+                                                    self.predictor.scoring.machine_version(machine_id))
+            cached = self.prediction_cache.get(cache_key)
+            if cached is not None:
+                logger.debug(f"Using cached prediction for {machine_id}")
+                sanitized_prediction, sanitized_cost_savings, remaining_life = cached
+            else:
+                sanitized_prediction, sanitized_cost_savings, remaining_life = self._predict(machine_id, latest_data)
+                self.prediction_cache.put(cache_key, (sanitized_prediction, sanitized_cost_savings, remaining_life))
             
-            # Calculate cost savings
-            logger.debug(f"Calculating cost savings for {machine_id}")
-            cost_savings = self.predictor.calculate_cost_savings(prediction['predicted_days_to_failure'])
+            # Bucketed history for charting, aggregated server-side
+            if max_points is None and resample is None:
+                max_points = config.HISTORY_MAX_POINTS
+            chart_history = self.data_loader.get_machine_history(
+                machine_id, start=start, end=end, max_points=max_points, resample=resample
+            )
+            logger.debug(f"Returning {len(chart_history)} chart points for {machine_id}")
             
-            # Sanitize prediction values
-            sanitized_prediction = {
-                "machine_id": prediction.get("machine_id", machine_id),
-                "failure_risk": prediction.get("failure_risk", "Unknown"),
-                "risk_score": self.sanitize_float(prediction.get("risk_score", 0)),
-                "reason": prediction.get("reason", ""),
-                "predicted_days_to_failure": self.sanitize_float(prediction.get("predicted_days_to_failure", 0)),
-                "confidence": self.sanitize_float(prediction.get("confidence", 0)),
-                "recommendations": prediction.get("recommendations", [])
-            }
+            # Precomputed risk series; nothing is re-scored here
+            risk_history = self.data_loader.get_machine_risk_history(
+                machine_id, start=start, end=end, max_points=max_points or config.HISTORY_MAX_POINTS
+            )
+            risk_trend = self.data_loader.get_machine_risk_trend(machine_id, start=start, end=end)
             
-            # Sanitize cost savings values
-            sanitized_cost_savings = {
-                "savings": self.sanitize_float(cost_savings.get("savings", 0)),
-                "planned_maintenance_cost": self.sanitize_float(cost_savings.get("planned_maintenance_cost", 0)),
-                "unplanned_downtime_cost": self.sanitize_float(cost_savings.get("unplanned_downtime_cost", 0)),
-                "downtime_hours": self.sanitize_float(cost_savings.get("downtime_hours", 0))
-            }
+            # Drift detected by the streaming EWMA/CUSUM state, below the static thresholds too
+            anomaly_state = self.data_loader.get_machine_anomaly_state(machine_id) or {}
+            anomaly_events = self.data_loader.get_anomaly_events(machine_id)
             
             result = {
                 "machine_id": machine_id,
                 "current_status": sanitized_prediction,
                 "cost_savings": sanitized_cost_savings,
-                "history_points": len(history),
-                "latest_reading": latest_data['timestamp'].isoformat()
+                "history_points": history_points,
+                "latest_reading": latest_data['timestamp'].isoformat(),
+                "recent_trends": {
+                    channel: self.sanitize_float(slope) for channel, slope in zip(WINDOW_CHANNELS, trends.tolist())
+                },
+                "history": self._history_records(chart_history),
+                "risk_history": self._history_records(risk_history),
+                "risk_trend": None if risk_trend is None else self.sanitize_float(risk_trend),
+                "remaining_life": remaining_life,
+                "anomalies": {
+                    "channels": {
+                        channel: {
+                            "z_score": self.sanitize_float(state['z_score']),
+                            "drift": self.sanitize_float(state['drift']),
+                            "alarms": state['alarms'],
+                            "last_alarm": state['last_alarm'].isoformat() if state['last_alarm'] is not None else None
+                        }
+                        for channel, state in anomaly_state.items()
+                    },
+                    "events": self._history_records(anomaly_events)
+                }
             }
             
             logger.info(f"Successfully retrieved details for machine {machine_id}")
@@ -231,6 +296,50 @@ class MachinesService:
             logger.error(f"Failed to get machine details for {machine_id}: {str(e)}")
             raise ServiceException(f"Failed to get machine details: {str(e)}", 500)
     
+    def _predict(self, machine_id: str, latest_data: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any], Any]:
+        """
+        Score a machine's latest reading and price its predicted failure.
+        
+        Returns:
+            Tuple of (sanitized prediction, sanitized cost savings, remaining-life estimate)
+        """
+        logger.debug(f"Calculating failure risk for {machine_id}")
+        prediction = self.predictor.calculate_failure_risk(latest_data)
+        
+        # A channel trending towards its high threshold can fail sooner than the risk score implies
+        remaining_life = self.data_loader.get_machine_remaining_life(machine_id)
+        trend_days = remaining_life['remaining_life_days'] if remaining_life else None
+        if trend_days is not None and trend_days < prediction['predicted_days_to_failure']:
+            prediction['predicted_days_to_failure'] = max(0, int(trend_days))
+        
+        # Calculate cost savings
+        logger.debug(f"Calculating cost savings for {machine_id}")
+        cost_savings = self.predictor.calculate_cost_savings(prediction['predicted_days_to_failure'])
+        
+        # Sanitize prediction values
+        sanitized_prediction = {
+            "machine_id": prediction.get("machine_id", machine_id),
+            "failure_risk": prediction.get("failure_risk", "Unknown"),
+            "risk_score": self.sanitize_float(prediction.get("risk_score", 0)),
+            "reason": prediction.get("reason", ""),
+            "predicted_days_to_failure": self.sanitize_float(prediction.get("predicted_days_to_failure", 0)),
+            "confidence": self.sanitize_float(prediction.get("confidence", 0)),
+            "recommendations": prediction.get("recommendations", [])
+        }
+        
+        # Sanitize cost savings values
+        sanitized_cost_savings = {
+            "savings": self.sanitize_float(cost_savings.get("savings", 0)),
+            "planned_maintenance_cost": self.sanitize_float(cost_savings.get("planned_maintenance_cost", 0)),
+            "unplanned_downtime_cost": self.sanitize_float(cost_savings.get("unplanned_downtime_cost", 0)),
+            "downtime_hours": self.sanitize_float(cost_savings.get("downtime_hours", 0))
+        }
+        return sanitized_prediction, sanitized_cost_savings, remaining_life
+    
+    def _history_records(self, history) -> List[Dict[str, Any]]:
+        """Convert a history frame into JSON-compliant records."""
+        return to_json_records(history)
+    
     def ask_superwise_ai(self, request: SuperwiseRequest) -> SuperwiseResponse:
         """
         Ask a question to Superwise AI.
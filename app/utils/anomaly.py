@@ -0,0 +1,177 @@
+"""
+Streaming anomaly detection on every machine's sensor channels.
+
+Each (machine, channel) pair keeps a constant-size state: an exponentially
+weighted mean and variance of its readings and a two-sided CUSUM of the
+standardized deviations from that mean. A reading updates the state in O(1)
+and is never revisited, so slow drifts that stay under the static
+``RISK_THRESHOLDS`` raise an alarm without rescanning any history.
+
+State lives in ``(machines x channels)`` arrays (see ``MachineChannelState``).
+The EWMA forgets older readings geometrically, so seeding from a stored
+history replays only each machine's recent tail (``replay_readings``);
+reading and alarm counts then cover that tail.
+"""
+import math
+import os
+import sys
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from logger_config import get_logger
+from channels import ChannelRegistry
+from machine_state import MachineChannelState, NO_TIMESTAMP
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.app_config import config
+logger = get_logger(__name__)
+
+# Standard deviations are floored at this fraction of the mean, so a channel
+# that has been constant does not turn every later change into an alarm
+RELATIVE_STD_FLOOR = 1e-3
+# Most recent alarms kept for display
+EVENT_LOG_SIZE = 1000
+
+
+class StreamingAnomalyDetector(MachineChannelState):
+    """EWMA baseline and CUSUM drift detector per machine and sensor channel."""
+
+    FIELDS = {
+        'count': (0, np.int64),
+        'mean': (0.0, np.float64),
+        'var': (0.0, np.float64),
+        'z': (np.nan, np.float64),
+        'cusum_high': (0.0, np.float64),
+        'cusum_low': (0.0, np.float64),
+        'alarms': (0, np.int64),
+        'last_alarm': (NO_TIMESTAMP, np.int64),
+    }
+
+    def __init__(self, channels: ChannelRegistry = None, alpha: float = None, slack: float = None,
+                 threshold: float = None, warmup: int = None):
+        """
+        Create a detector with no machines.
+
+        Args:
+            channels: Channels to watch (default: the channel registry)
+            alpha: EWMA smoothing factor (default: ANOMALY_EWMA_ALPHA)
+            slack: CUSUM slack in standard deviations (default: ANOMALY_CUSUM_SLACK)
+            threshold: CUSUM alarm threshold in standard deviations (default: ANOMALY_CUSUM_THRESHOLD)
+            warmup: Readings per channel before alarms are raised (default: ANOMALY_WARMUP)
+        """
+        super().__init__(channels)
+        self.alpha = alpha or config.ANOMALY_EWMA_ALPHA
+        self.slack = config.ANOMALY_CUSUM_SLACK if slack is None else slack
+        self.threshold = threshold or config.ANOMALY_CUSUM_THRESHOLD
+        self.warmup = config.ANOMALY_WARMUP if warmup is None else warmup
+        self.events = deque(maxlen=EVENT_LOG_SIZE)
+
+    def update(self, readings: pd.DataFrame) -> pd.DataFrame:
+        """
+        Fold a batch of readings into the state (see ``MachineChannelState.update``).
+
+        Returns:
+            Alarms raised by the batch: ``machine_id``, ``timestamp``,
+            ``channel``, ``direction`` (``high`` / ``low``), ``z_score`` and
+            ``cusum``
+        """
+        return _events_frame(super().update(readings))
+
+    def replay_readings(self) -> Optional[int]:
+        """
+        Readings per machine that still move the state: the plain-mean phase
+        and warmup, then ANOMALY_REPLAY_HALF_LIVES half-lives of the EWMA.
+        """
+        if config.ANOMALY_REPLAY_HALF_LIVES <= 0:
+            return None
+        half_life = math.log(0.5) / math.log(1.0 - self.alpha) if self.alpha < 1 else 1.0
+        return int(max(self.warmup, 1.0 / self.alpha) + math.ceil(config.ANOMALY_REPLAY_HALF_LIVES * half_life))
+
+    def _update_layer(self, machines: np.ndarray, timestamps: np.ndarray, previous: np.ndarray,
+                      values: np.ndarray) -> List[Dict]:
+        count = self.count[machines]
+        mean = self.mean[machines]
+        var = self.var[machines]
+        valid = ~np.isnan(values)
+        deviation = values - mean
+        std = np.maximum(np.sqrt(var), RELATIVE_STD_FLOOR * np.abs(mean))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z = np.where(std > 0, deviation / std, 0.0)
+        scored = valid & (count >= max(self.warmup, 1))
+        high = np.where(scored, np.maximum(0.0, self.cusum_high[machines] + z - self.slack), self.cusum_high[machines])
+        low = np.where(scored, np.maximum(0.0, self.cusum_low[machines] - z - self.slack), self.cusum_low[machines])
+        alarm_high = scored & (high > self.threshold)
+        alarm_low = scored & (low > self.threshold)
+
+        events = []
+        for row, column in zip(*np.nonzero(alarm_high | alarm_low)):
+            is_high = bool(alarm_high[row, column])
+            events.append({
+                'machine_id': self._machine_ids[machines[row]],
+                'timestamp': timestamps[row],
+                'channel': self.channels.names[column],
+                'direction': 'high' if is_high else 'low',
+                'z_score': float(z[row, column]),
+                'cusum': float(high[row, column] if is_high else low[row, column]),
+            })
+        alarm = alarm_high | alarm_low
+        self.alarms[machines] += alarm
+        self.last_alarm[machines] = np.where(alarm, timestamps[:, None], self.last_alarm[machines])
+        # A raised alarm restarts the accumulation
+        high[alarm] = 0.0
+        low[alarm] = 0.0
+        self.cusum_high[machines] = high
+        self.cusum_low[machines] = low
+        self.z[machines] = np.where(scored, z, self.z[machines])
+
+        # Plain mean/variance until there are 1 / alpha readings, then EWMA
+        weight = np.maximum(self.alpha, 1.0 / (count + 1))
+        step = weight * np.where(valid, deviation, 0.0)
+        self.mean[machines] = mean + step
+        self.var[machines] = np.where(valid, (1.0 - weight) * (var + np.where(valid, deviation, 0.0) * step), var)
+        self.count[machines] = count + valid
+        self.events.extend(events)
+        return events
+
+    def machine_state(self, machine_id: str) -> Optional[Dict[str, Dict[str, Any]]]:
+        """
+        Get a machine's detector state by channel.
+
+        Returns:
+            Channel name -> ``mean``, ``std``, ``z_score`` (of the last scored
+            reading), ``cusum_high``, ``cusum_low``, ``drift`` (the larger
+            CUSUM as a fraction of the alarm threshold), ``alarms`` and
+            ``last_alarm``; None for an unknown machine
+        """
+        position = self.position(machine_id)
+        if position is None:
+            return None
+        state = {}
+        for column, name in enumerate(self.channels.names):
+            last_alarm = self.last_alarm[position, column]
+            state[name] = {
+                'readings': int(self.count[position, column]),
+                'mean': float(self.mean[position, column]),
+                'std': float(np.sqrt(self.var[position, column])),
+                'z_score': float(self.z[position, column]),
+                'cusum_high': float(self.cusum_high[position, column]),
+                'cusum_low': float(self.cusum_low[position, column]),
+                'drift': float(max(self.cusum_high[position, column], self.cusum_low[position, column]) / self.threshold),
+                'alarms': int(self.alarms[position, column]),
+                'last_alarm': None if last_alarm == NO_TIMESTAMP else pd.Timestamp(last_alarm),
+            }
+        return state
+
+    def recent_events(self, machine_id: str = None) -> pd.DataFrame:
+        """Get the most recent alarms, optionally of one machine, oldest first."""
+        events = [event for event in self.events if machine_id is None or event['machine_id'] == machine_id]
+        return _events_frame(events)
+
+
+def _events_frame(events: List[Dict]) -> pd.DataFrame:
+    frame = pd.DataFrame(events, columns=['machine_id', 'timestamp', 'channel', 'direction', 'z_score', 'cusum'])
+    frame['timestamp'] = pd.to_datetime(frame['timestamp'])
+    return frame
@@ -0,0 +1,163 @@
+"""
+Registry of sensor channels and their dense matrix layout.
+
+Each channel carries its display name, unit, risk thresholds, scoring weight
+and chart color. Readings are scored and charted by iterating the registry,
+and are handed to the scorer as a dense ``(rows x channels)`` float32 matrix
+in registry order, so a new channel (spindle speed, acoustic emission, ...)
+only needs a definition in ``SENSOR_CHANNELS_FILE``.
+"""
+import json
+import os
+import sys
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.app_config import config
+
+DEFAULT_CHART_COLOR = '#64748b'
+
+
+class SensorChannel(NamedTuple):
+    """Definition of one sensor channel."""
+
+    name: str
+    label: str
+    unit: str
+    # Upper bounds of the low / medium / high risk bands
+    thresholds: Tuple[float, float, float]
+    weight: float
+    color: str = DEFAULT_CHART_COLOR
+    # Reason shown when the reading is above the high threshold
+    alert: str = ''
+
+    def alert_text(self, high: float = None) -> str:
+        """Describe a reading above the high threshold (default: the channel's own)."""
+        template = self.alert or f"{self.label} above {{high}} {self.unit}"
+        return template.format(high=self.thresholds[2] if high is None else high)
+
+
+def channel_from_config(definition: Dict, thresholds: Dict = None) -> SensorChannel:
+    """
+    Build a channel from a configuration entry.
+
+    Args:
+        definition: ``name`` plus optional ``label``, ``unit``, ``thresholds``
+            (``low`` / ``medium`` / ``high``), ``weight``, ``color`` and ``alert``
+        thresholds: Thresholds used when the entry has none (e.g. RISK_THRESHOLDS)
+    """
+    name = definition['name']
+    bands = definition.get('thresholds') or (thresholds or {}).get(name)
+    if not bands:
+        raise ValueError(f"Sensor channel {name!r} has no risk thresholds")
+    return SensorChannel(
+        name=name,
+        label=definition.get('label', name.replace('_', ' ').capitalize()),
+        unit=definition.get('unit', ''),
+        thresholds=(bands['low'], bands['medium'], bands['high']),
+        weight=float(definition.get('weight', 0.0)),
+        color=definition.get('color', DEFAULT_CHART_COLOR),
+        alert=definition.get('alert', ''),
+    )
+
+
+class ChannelRegistry:
+    """Ordered set of sensor channels; the order is the matrix column order."""
+
+    def __init__(self, channels: List[SensorChannel] = None):
+        self._channels: Dict[str, SensorChannel] = {}
+        # Incremented on every change, so results derived from the thresholds
+        # and weights can be keyed on the version they were computed with
+        self.version = 0
+        for channel in channels or []:
+            self.register(channel)
+
+    def register(self, channel: SensorChannel) -> None:
+        """Add a channel, or replace the channel with the same name in place."""
+        self._channels[channel.name] = channel
+        self._refresh()
+        self.version += 1
+
+    def _refresh(self) -> None:
+        channels = list(self._channels.values())
+        self.names: List[str] = [channel.name for channel in channels]
+        self.index: Dict[str, int] = {name: position for position, name in enumerate(self.names)}
+        self.thresholds = np.array([channel.thresholds for channel in channels], dtype=np.float64).reshape(-1, 3)
+        self.weights = np.array([channel.weight for channel in channels], dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self._channels)
+
+    def __iter__(self) -> Iterator[SensorChannel]:
+        return iter(self._channels.values())
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._channels
+
+    def __getitem__(self, name: str) -> SensorChannel:
+        return self._channels[name]
+
+    def matrix(self, readings: pd.DataFrame, dtype=np.float32, missing: float = np.nan,
+               out: np.ndarray = None) -> np.ndarray:
+        """
+        Lay readings out as a dense ``(rows x channels)`` matrix.
+
+        Channels missing from ``readings`` are filled with ``missing``.
+
+        Args:
+            out: Optional preallocated ``(rows x channels)`` array to fill
+                (e.g. shared memory); its dtype overrides ``dtype``
+        """
+        if out is None:
+            out = np.empty((len(readings), len(self)), dtype=dtype)
+        for position, name in enumerate(self.names):
+            if name in readings:
+                out[:, position] = readings[name].to_numpy(dtype=out.dtype, na_value=np.nan)
+            else:
+                out[:, position] = missing
+        return out
+
+    def precision(self, readings) -> type:
+        """
+        Float type to score readings in: float32 when every channel present in
+        ``readings`` (a frame, or a dict of scalars) is stored as float32, so
+        they band like the stored history; otherwise float64.
+        """
+        if isinstance(readings, pd.DataFrame):
+            present = [readings[name].dtype for name in self.names if name in readings]
+        else:
+            present = [np.asarray(readings[name]).dtype for name in self.names if name in readings]
+        return np.float32 if present and all(dtype == np.float32 for dtype in present) else np.float64
+
+    def row(self, values: Dict[str, float], default: Optional[float] = 0.0) -> np.ndarray:
+        """Lay one reading (a dict) out as a ``(1 x channels)`` matrix in its ``precision``."""
+        return np.array([[values.get(name, default) for name in self.names]], dtype=self.precision(values))
+
+
+def load_channel_registry(path: str = None) -> ChannelRegistry:
+    """
+    Build the registry from ``SENSOR_CHANNELS`` and the optional channel file.
+
+    Args:
+        path: JSON list of channel definitions (default: SENSOR_CHANNELS_FILE);
+            an entry named like a built-in channel replaces it
+
+    Returns:
+        The channel registry
+    """
+    registry = ChannelRegistry(
+        channel_from_config(definition, config.RISK_THRESHOLDS) for definition in config.SENSOR_CHANNELS
+    )
+    path = config.SENSOR_CHANNELS_FILE if path is None else path
+    if path:
+        with open(path, 'r', encoding='utf-8') as handle:
+            for definition in json.load(handle):
+                registry.register(channel_from_config(definition, config.RISK_THRESHOLDS))
+    return registry
+
+
+# Process-wide channel registry
+channel_registry = load_channel_registry()
@@ -1,9 +1,12 @@
 """
 Data loading utilities for sensor data and maintenance records.
 """
+import numpy as np
 import pandas as pd
 import os
-from typing import Dict, List, Optional, Any
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Any, Set, Tuple
 
 # Import centralized logging and configuration
 import os
@@ -12,51 +15,620 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from logger_config import get_logger
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config.app_config import config
+from storage import SensorStorage, create_sensor_storage
+from machine_index import MachineIndex
+from downsampling import SENSOR_COLUMNS, downsample_history, fit_width
+from rollups import RollupStore
+from latest_readings import LatestReadings
+from maintenance_store import MaintenanceStore
+from file_formats import read_records
+from file_watcher import DataFileWatcher
+from sanitizer import DataSanitizer
+from ingest import ReadingIngestor, series_anomalies
+from ring_buffer import RecentWindowStore, WINDOW_CHANNELS
+from risk_history import RiskHistory
+from utils.fleet_scoring import get_fleet_scorer
+from anomaly import StreamingAnomalyDetector
+from rul import RemainingLifeEstimator
+from machine_state import MachineChannelState
+from federation import SITE_SEPARATOR
 logger = get_logger(__name__)
 
 
 class DataLoader:
     """Handles loading and processing of sensor data and maintenance records."""
     
-    def __init__(self, data_dir: str = None):
-        self.data_dir = data_dir or config.DATA_DIR
+    def __init__(self, data_dir: str = None, storage: SensorStorage = None, incremental: bool = None,
+                 site: str = None, federated: bool = False):
+        if data_dir is None:
+            sites = config.get_data_sites()
+            if len(sites) > 1:
+                raise ValueError("DATA_DIR lists several sites; use create_data_loader() to load them")
+            (default_site, data_dir), = sites.items()
+            site = site or default_site
+        self.data_dir = data_dir
+        # Site the data directory belongs to
+        self.site = site or config.DATA_SITE
+        # Scoring profiles match fleet-wide IDs, which are qualified with the site when federated
+        self.site_prefix = self.site + SITE_SEPARATOR if federated else ""
+        self.storage = storage or create_sensor_storage(self.data_dir)
+        self.incremental = config.SENSOR_INCREMENTAL_INGEST if incremental is None else incremental
+        if self.incremental and not self.storage.supports_tail:
+            logger.warning(f"{type(self.storage).__name__} does not support incremental ingest; disabling it")
+            self.incremental = False
         self.sensor_data = None
         self.maintenance_data = None
-        logger.info(f"DataLoader initialized with data directory: {self.data_dir}")
+        # Cleans readings once at load time and counts what it fixed
+        self.sanitizer = DataSanitizer()
+        # Deduplicates readings and applies the late-arrival window
+        self.ingestor = ReadingIngestor()
+        self._machine_index = None
+        self._maintenance_store = None
+        # Guards lazy loading and cache updates when the loader is shared across threads
+        self._lock = threading.RLock()
+        # Rollup tiers and the index they were built from, created on first use
+        self._rollups = None
+        self._rollup_index = None
+        # Latest reading per machine and the index it was built from
+        self._latest = None
+        self._latest_index = None
+        # Ring buffers over each machine's most recent readings and the index they follow
+        self.recent_window_size = config.RECENT_WINDOW_SIZE
+        self._recent = None
+        self._recent_index = None
+        # Risk score of every reading, backfilled on first use
+        self._risk_history = None
+        # Streaming EWMA/CUSUM anomaly state, fed every ingested reading once, and the
+        # machines replayed into it through predicate pushdown (no index)
+        self._anomalies = None
+        self._anomaly_index = None
+        self._anomaly_machines: Set[str] = set()
+        # Per-channel trend statistics for remaining useful life, fed the same way
+        self._remaining_life = None
+        self._remaining_life_index = None
+        self._remaining_life_machines: Set[str] = set()
+        # Byte offset of the first sensor row not yet ingested (incremental mode)
+        self._sensor_offset = 0
+        # Machines whose history read through predicate pushdown is in the data-quality counters
+        self._pushdown_counted: Set[str] = set()
+        # Complete histories of recently used machines read through predicate pushdown
+        # (least recently used first) and their risk histories, dropped on ingest
+        self._pushdown_indexes: "OrderedDict[str, MachineIndex]" = OrderedDict()
+        self._pushdown_risk: Dict[str, RiskHistory] = {}
+        # Incremented whenever a data file change reaches the caches
+        self.data_version = 0
+        # Called with the machine IDs whose readings changed (None: possibly all)
+        self._ingest_listeners: List[Callable[[Optional[List[str]]], None]] = []
+        self.add_ingest_listener(self._drop_pushdown_histories)
+        self.watcher: Optional[DataFileWatcher] = None
+        logger.info(f"DataLoader initialized with data directory: {self.data_dir} (site {self.site}, "
+                    f"{type(self.storage).__name__}, incremental={self.incremental})")
     
     def load_sensor_data(self) -> pd.DataFrame:
-        """Load synthetic sensor data from CSV."""
-        logger.debug("Loading sensor data")
-        if self.sensor_data is None:
-            file_path = os.path.join(self.data_dir, "synthetic_sensor_data.csv")
-            logger.debug(f"Loading sensor data from: {file_path}")
-            self.sensor_data = pd.read_csv(file_path)
-            self.sensor_data['timestamp'] = pd.to_datetime(self.sensor_data['timestamp'])
-            logger.info(f"Loaded {len(self.sensor_data)} sensor data records")
+        """Load synthetic sensor data from the configured storage backend."""
+        with self._lock:
+            logger.debug("Loading sensor data")
+            if self.sensor_data is None:
+                logger.debug(f"Loading sensor data from: {self.storage.path}")
+                if self.incremental:
+                    self._sensor_offset = self.storage.complete_offset(initial=True)
+                    self.sensor_data = self.storage.read_until(self._sensor_offset)
+                else:
+                    self.sensor_data = self.storage.read()
+                self.sanitizer.reset()
+                self.ingestor.reset()
+                self.sensor_data = self.ingestor.deduplicate(self.sanitizer.sanitize(self.sensor_data))
+                logger.info(f"Loaded {len(self.sensor_data)} sensor data records")
+                self._get_machine_index()
+                self._notify_ingest(None)
+            elif self.incremental:
+                self.refresh_sensor_data()
+            else:
+                logger.debug("Using cached sensor data")
+            return self.sensor_data
+    
+    def refresh_sensor_data(self) -> int:
+        """
+        Ingest sensor rows appended to the file since the last read.
+        
+        Only the new bytes are parsed; the rows are deduplicated, checked
+        against the late-arrival window and merged into each machine's sorted
+        series. A file that shrank is reloaded in full.
+        
+        Returns:
+            Number of newly ingested rows
+        """
+        with self._lock:
+            if self.sensor_data is None:
+                self.load_sensor_data()
+                return len(self.sensor_data)
+            if not self.storage.supports_tail:
+                return 0
+        
+            new_rows, offset = self.storage.read_appended(self._sensor_offset)
+            if new_rows is None:
+                self.sensor_data = None
+                self._machine_index = None
+                self.load_sensor_data()
+                return len(self.sensor_data)
+        
+            self._sensor_offset = offset
+            if new_rows.empty:
+                return 0
+            previous_index = self._get_machine_index()
+            new_rows = self.ingestor.admit(self.sanitizer.sanitize(new_rows), previous_index.newest_timestamps())
+            if new_rows.empty:
+                return 0
+            self._machine_index = previous_index.extend(new_rows)
+            self.sensor_data = self._machine_index.data
+            self.ingestor.record_replaced(self._machine_index.replaced)
+            # Replaced rows were already folded into the rollups, which are then rebuilt on next use
+            if self._rollups is not None and self._rollup_index is previous_index and not self._machine_index.replaced:
+                self._rollups.update(new_rows)
+                self._rollup_index = self._machine_index
+            if self._latest is not None and self._latest_index is previous_index:
+                self._latest.update(new_rows)
+                self._latest_index = self._machine_index
+            if self._recent is not None and self._recent_index is previous_index:
+                self._recent.update(new_rows, self._machine_index)
+                self._recent_index = self._machine_index
+            if self._risk_history is not None and self._risk_history.index is previous_index:
+                self._risk_history.extend(self._machine_index)
+            if self._anomalies is not None and self._anomaly_index is previous_index:
+                # Late rows are older than their machine's state and are skipped
+                self._anomalies.update(new_rows)
+                self._anomaly_index = self._machine_index
+            if self._remaining_life is not None and self._remaining_life_index is previous_index:
+                self._remaining_life.update(new_rows)
+                self._remaining_life_index = self._machine_index
+            self._notify_ingest(new_rows['machine_id'].astype(str).unique().tolist())
+            logger.info(f"Ingested {len(new_rows)} appended sensor records")
+            return len(new_rows)
+    
+    def add_ingest_listener(self, listener: Callable[[Optional[List[str]]], None]) -> None:
+        """Register a callback receiving the IDs of machines with new readings, or None after a full (re)load."""
+        with self._lock:
+            if listener not in self._ingest_listeners:
+                self._ingest_listeners.append(listener)
+    
+    def _notify_ingest(self, machine_ids: Optional[List[str]]) -> None:
+        for listener in list(self._ingest_listeners):
+            try:
+                listener(machine_ids)
+            except Exception as e:
+                logger.error(f"Ingest listener failed: {str(e)}")
+    
+    def _drop_pushdown_histories(self, machine_ids: Optional[List[str]]) -> None:
+        """Forget cached pushdown histories of machines with new readings (all of them for None)."""
+        with self._lock:
+            if machine_ids is None:
+                self._pushdown_indexes.clear()
+                self._pushdown_risk.clear()
+            for machine_id in machine_ids or []:
+                self._pushdown_indexes.pop(machine_id, None)
+                self._pushdown_risk.pop(machine_id, None)
+    
+    def _pushdown_index(self, machine_id: str, read: bool = True) -> Optional[MachineIndex]:
+        """
+        Get a machine's complete history read through predicate pushdown, as an index.
+        
+        The last PUSHDOWN_CACHE_MACHINES machines used stay cached until their
+        readings change, so one page view reads a machine's history once.
+        
+        Args:
+            machine_id: Machine to look up
+            read: Read an uncached history (else return None for it)
+        """
+        with self._lock:
+            index = self._pushdown_indexes.get(machine_id)
+            if index is not None:
+                self._pushdown_indexes.move_to_end(machine_id)
+                return index
+            if not read:
+                return None
+            index = MachineIndex(self._read_pushdown(machine_id), presorted=True)
+            self._pushdown_indexes[machine_id] = index
+            while len(self._pushdown_indexes) > max(config.PUSHDOWN_CACHE_MACHINES, 1):
+                evicted, _ = self._pushdown_indexes.popitem(last=False)
+                self._pushdown_risk.pop(evicted, None)
+            return index
+    
+    def _get_machine_index(self) -> MachineIndex:
+        """Get the index of the cached sensor data, rebuilding it if the data changed."""
+        with self._lock:
+            if self._machine_index is None or self._machine_index.data is not self.sensor_data:
+                logger.debug("Building per-machine sensor index")
+                self._machine_index = MachineIndex(self.sensor_data)
+                # Keep a single sorted copy of the readings
+                self.sensor_data = self._machine_index.data
+                logger.info(f"Indexed {len(self._machine_index.offsets)} machines")
+            return self._machine_index
+    
+    def _get_rollups(self) -> Optional[RollupStore]:
+        """Get the rollup tiers, building them on first use or after the data changed."""
+        with self._lock:
+            if not config.ROLLUP_TIERS:
+                return None
+            index = self._get_machine_index()
+            if self._rollups is None or self._rollup_index is not index:
+                logger.debug("Building sensor rollup tiers")
+                self._rollups = RollupStore()
+                self._rollups.update(index.data)
+                self._rollup_index = index
+            return self._rollups
+    
+    def _get_latest_readings(self) -> LatestReadings:
+        """Get the latest-reading table, building it from the index if the data changed."""
+        with self._lock:
+            index = self._get_machine_index()
+            if self._latest is None or self._latest_index is not index:
+                columns = ['machine_id'] + [column for column in index.data.columns if column != 'machine_id']
+                self._latest = LatestReadings(columns)
+                self._latest.update(index.last_rows())
+                self._latest_index = index
+            return self._latest
+    
+    def _get_recent_windows(self) -> RecentWindowStore:
+        """Get the recent-window ring buffers, filling them from the index if the data changed."""
+        with self._lock:
+            index = self._get_machine_index()
+            if self._recent is None or self._recent_index is not index:
+                logger.debug("Filling recent-window ring buffers")
+                self._recent = RecentWindowStore(self.recent_window_size)
+                self._recent.load(index)
+                self._recent_index = index
+            return self._recent
+    
+    def _get_risk_history(self) -> RiskHistory:
+        """Get the risk history, backfilling it from the index if the data changed."""
+        with self._lock:
+            index = self._get_machine_index()
+            if self._risk_history is None or self._risk_history.index is not index:
+                logger.debug("Backfilling risk history")
+                self._risk_history = RiskHistory(scorer=get_fleet_scorer(), site_prefix=self.site_prefix)
+                self._risk_history.backfill(index)
+            else:
+                # Rows of retuned scoring profiles are re-scored
+                self._risk_history.refresh()
+            return self._risk_history
+    
+    def _get_anomaly_detector(self, machine_ids: List[str] = None) -> StreamingAnomalyDetector:
+        """
+        Get the anomaly detector, replaying the history into it if the data changed.
+        
+        Through predicate pushdown, only the histories of ``machine_ids``
+        (default: every machine) are replayed, one machine at a time.
+        """
+        if self.sensor_data is None and self.storage.supports_pushdown:
+            with self._lock:
+                if self._anomalies is None or self._anomaly_index is not None:
+                    self._anomalies = StreamingAnomalyDetector()
+                    self._anomaly_index = None
+                    self._anomaly_machines = set()
+                self._replay_pushdown(self._anomalies, self._anomaly_machines, machine_ids)
+                return self._anomalies
+        self.load_sensor_data()
+        with self._lock:
+            index = self._get_machine_index()
+            if self._anomalies is None or self._anomaly_index is not index:
+                logger.debug("Replaying sensor history into the anomaly detector")
+                self._anomalies = StreamingAnomalyDetector()
+                self._anomalies.replay(index.data)
+                self._anomaly_index = index
+            return self._anomalies
+    
+    def _get_remaining_life_estimator(self, machine_ids: List[str] = None) -> RemainingLifeEstimator:
+        """
+        Get the remaining-life estimator, replaying the history into it if the data changed.
+        
+        Through predicate pushdown, only the histories of ``machine_ids``
+        (default: every machine) are replayed, one machine at a time.
+        """
+        if self.sensor_data is None and self.storage.supports_pushdown:
+            with self._lock:
+                if self._remaining_life is None or self._remaining_life_index is not None:
+                    self._remaining_life = RemainingLifeEstimator(site_prefix=self.site_prefix)
+                    self._remaining_life_index = None
+                    self._remaining_life_machines = set()
+                self._replay_pushdown(self._remaining_life, self._remaining_life_machines, machine_ids)
+                return self._remaining_life
+        self.load_sensor_data()
+        with self._lock:
+            index = self._get_machine_index()
+            if self._remaining_life is None or self._remaining_life_index is not index:
+                logger.debug("Replaying sensor history into the remaining-life estimator")
+                self._remaining_life = RemainingLifeEstimator(site_prefix=self.site_prefix)
+                self._remaining_life.replay(index.data)
+                self._remaining_life_index = index
+            return self._remaining_life
+    
+    def _replay_pushdown(self, state: MachineChannelState, replayed: Set[str], machine_ids: List[str] = None) -> None:
+        """
+        Replay the pushdown-read histories of machines not yet in a streaming state.
+        
+        Args:
+            state: Streaming state to seed
+            replayed: Machines already replayed into ``state``; updated in place
+            machine_ids: Machines needed (default: every machine with a reading)
+        """
+        if machine_ids is None:
+            machine_ids = self._read_pushdown()['machine_id'].astype(str).unique().tolist()
+        for machine_id in machine_ids:
+            if machine_id not in replayed:
+                state.replay(self._pushdown_index(machine_id).data)
+                replayed.add(machine_id)
+    
+    def _rollup_history(self, index: MachineIndex, machine_id: str, start, end,
+                        max_points: int, resample: str) -> Optional[pd.DataFrame]:
+        """Answer a downsampled history query from the rollup tiers when one fits."""
+        rollups = self._get_rollups()
+        if rollups is None:
+            return None
+        if resample:
+            width = pd.Timedelta(resample)
         else:
-            logger.debug("Using cached sensor data")
-        return self.sensor_data
+            lower, upper = index.row_range(machine_id, start, end)
+            if upper - lower <= max_points:
+                return None
+            first = pd.Timestamp(index.timestamps[lower])
+            last = pd.Timestamp(index.timestamps[upper - 1])
+            finer = [tier for tier in rollups.tiers if tier <= (last - first) / max_points]
+            if not finer:
+                return None
+            width = fit_width(first, last, max_points, finer[-1])
+        return rollups.query(machine_id, width, start, end)
     
     def load_maintenance_data(self) -> pd.DataFrame:
-        """Load maintenance records from CSV."""
-        if self.maintenance_data is None:
-            file_path = os.path.join(self.data_dir, "synthetic_maintenance_records.csv")
-            self.maintenance_data = pd.read_csv(file_path)
-            self.maintenance_data['last_service_date'] = pd.to_datetime(self.maintenance_data['last_service_date'])
-            self.maintenance_data['next_service_due'] = pd.to_datetime(self.maintenance_data['next_service_due'])
-        return self.maintenance_data
+        """Load maintenance records from the CSV, TXT or JSON export."""
+        with self._lock:
+            if self.maintenance_data is None:
+                self.maintenance_data = read_records(self.maintenance_path)
+                self.maintenance_data['last_service_date'] = pd.to_datetime(self.maintenance_data['last_service_date'])
+                self.maintenance_data['next_service_due'] = pd.to_datetime(self.maintenance_data['next_service_due'])
+            return self.maintenance_data
+    
+    def _get_maintenance_store(self) -> MaintenanceStore:
+        """Get the maintenance store, building it if the records changed."""
+        with self._lock:
+            maintenance_data = self.load_maintenance_data()
+            if self._maintenance_store is None or self._maintenance_store.source is not maintenance_data:
+                logger.debug("Building maintenance record store")
+                self._maintenance_store = MaintenanceStore(maintenance_data)
+            return self._maintenance_store
+    
+    @property
+    def maintenance_path(self) -> str:
+        """Path of the maintenance records export."""
+        return os.path.join(self.data_dir, config.MAINTENANCE_DATA_FILE)
+    
+    def watched_paths(self) -> List[str]:
+        """Data files whose changes must reach the caches."""
+        return [self.storage.path, self.maintenance_path]
+    
+    def handle_file_changes(self, paths: List[str]) -> None:
+        """
+        Bring the caches up to date after data files changed.
+        
+        Appends to a tailable sensor file are ingested incrementally; any other
+        sensor change drops the sensor caches, which are rebuilt on next use.
+        Maintenance changes drop the maintenance records and their store.
+        
+        Args:
+            paths: Changed files, as reported by the watcher
+        """
+        paths = {os.path.abspath(path) for path in paths}
+        with self._lock:
+            if os.path.abspath(self.storage.path) in paths:
+                if self.incremental and self.sensor_data is not None:
+                    self.refresh_sensor_data()
+                else:
+                    self.sensor_data = None
+                    self._machine_index = None
+                    if self.storage.supports_pushdown:
+                        # Pushdown reads count the changed file afresh
+                        self.sanitizer.reset()
+                        self.ingestor.reset()
+                        self._pushdown_counted.clear()
+                        self._anomalies = None
+                        self._remaining_life = None
+                    self._notify_ingest(None)
+            if os.path.abspath(self.maintenance_path) in paths:
+                self.maintenance_data = None
+            self.data_version += 1
+        logger.info(f"Data caches updated for changed files (version {self.data_version})")
+    
+    def get_data_quality(self) -> Dict[str, Dict[str, int]]:
+        """
+        Get data-quality counters.
+        
+        Returns:
+            Per-column counts of missing, infinite and out-of-range values, plus
+            ``ingest`` (duplicates, out-of-order and late rows) and ``series``
+            (operating-hours regressions and repeated readings) counts
+        """
+        report = self.sanitizer.quality_report()
+        report['ingest'] = self.ingestor.counters()
+        with self._lock:
+            sensor_data = self._machine_index.data if self._machine_index is not None else None
+        report['series'] = series_anomalies(sensor_data, SENSOR_COLUMNS)
+        return report
+    
+    def _read_pushdown(self, machine_id: str = None, start=None, end=None) -> pd.DataFrame:
+        """
+        Read readings through predicate pushdown, cleaned like loaded data.
+        
+        The rows pass through the sanitizer and the ingest dedup under the
+        loader's lock. A machine's complete history is added to the
+        data-quality counters the first time it is read; narrower and repeated
+        reads would count the same rows again, so they are not recorded.
+        
+        Args:
+            machine_id: Machine to read; None reads each machine's latest reading
+            start: Optional inclusive lower bound on ``timestamp``
+            end: Optional inclusive upper bound on ``timestamp``
+            
+        Returns:
+            The machine's time-ordered readings, or the latest reading per machine
+        """
+        with self._lock:
+            if machine_id is None:
+                readings = self.storage.read_latest()
+                record = False
+            else:
+                readings = self.storage.read(machine_ids=[machine_id], start=start, end=end)
+                record = start is None and end is None and machine_id not in self._pushdown_counted
+                if record:
+                    self._pushdown_counted.add(machine_id)
+            readings = self.ingestor.deduplicate(self.sanitizer.sanitize(readings, record=record), record=record)
+        if machine_id is None:
+            return readings
+        return readings.sort_values('timestamp', kind='stable').reset_index(drop=True)
     
     def get_latest_sensor_data(self) -> pd.DataFrame:
         """Get the most recent sensor readings for each machine."""
-        sensor_data = self.load_sensor_data()
-        latest_data = sensor_data.groupby('machine_id').last().reset_index()
-        return latest_data
+        if self.sensor_data is None and self.storage.supports_pushdown:
+            # Only the row groups holding each machine's last reading are read
+            return self._read_pushdown()
+        self.load_sensor_data()
+        return self._get_latest_readings().to_frame()
+    
+    
+    def get_recent_window(self, machine_id: str, count: int = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get a machine's most recent readings without building a frame.
+        
+        Args:
+            machine_id: Machine to look up
+            count: Optional number of readings (default and maximum: RECENT_WINDOW_SIZE)
+            
+        Returns:
+            Tuple of (timestamps, values) read-only arrays, oldest first; the
+            ``values`` columns follow ``WINDOW_CHANNELS``. Both are empty for an
+            unknown machine. The views follow later ingests, so copy them
+            to keep a snapshot.
+        """
+        if self.sensor_data is None and self.storage.supports_pushdown:
+            store = RecentWindowStore(self.recent_window_size)
+            history = self._pushdown_index(machine_id).data
+            store.update(history.tail(store.capacity), None)
+            return store.window(machine_id, count)
+        self.load_sensor_data()
+        with self._lock:
+            return self._get_recent_windows().window(machine_id, count)
+    
+    def count_machine_readings(self, machine_id: str) -> int:
+        """Get the number of stored readings of a machine."""
+        if self.sensor_data is None and self.storage.supports_pushdown:
+            return len(self._pushdown_index(machine_id))
+        self.load_sensor_data()
+        start, end = self._get_machine_index().row_range(machine_id)
+        return end - start
     
+    def get_machine_history(self, machine_id: str, start=None, end=None,
+                            max_points: int = None, resample: str = None) -> pd.DataFrame:
+        """
+        Get historical data for a specific machine.
+        
+        Args:
+            machine_id: Machine to look up
+            start: Optional inclusive lower bound on ``timestamp``
+            end: Optional inclusive upper bound on ``timestamp``
+            max_points: Optional maximum number of points; longer histories are
+                bucketed into min/max/mean per time bucket
+            resample: Optional explicit bucket width such as ``"1h"``
+            
+        Bucketed queries are answered from the coarsest rollup tier that divides
+        the bucket width; those align ``start`` / ``end`` to whole tier buckets.
+            
+        Returns:
+            Time-ordered readings, or bucketed aggregates when downsampling applies
+        """
+        if self.sensor_data is None and self.storage.supports_pushdown:
+            # A cached complete history answers any range; otherwise only the range is read
+            index = self._pushdown_index(machine_id, read=False)
+            history = self._read_pushdown(machine_id, start, end) if index is None else \
+                index.history(machine_id, start, end)
+        else:
+            self.load_sensor_data()
+            index = self._get_machine_index()
+            if max_points or resample:
+                rolled_up = self._rollup_history(index, machine_id, start, end, max_points, resample)
+                if rolled_up is not None:
+                    return rolled_up
+            history = index.history(machine_id, start, end)
+        if max_points or resample:
+            history = downsample_history(history, max_points=max_points, resample=resample)
+        return history
+    
+    def get_machine_risk_history(self, machine_id: str, start=None, end=None,
+                                 max_points: int = None) -> pd.DataFrame:
+        """
+        Get a machine's precomputed risk over time.
+        
+        Args:
+            machine_id: Machine to look up
+            start: Optional inclusive lower bound on ``timestamp``
+            end: Optional inclusive upper bound on ``timestamp``
+            max_points: Optional maximum number of points (bucketed mean/max risk)
+            
+        Returns:
+            ``timestamp``, ``risk_score`` and ``failure_risk`` per reading or bucket
+        """
+        with self._lock:
+            return self._machine_risk_history(machine_id).series(machine_id, start, end, max_points)
     
-    def get_machine_history(self, machine_id: str) -> pd.DataFrame:
-        """Get historical data for a specific machine."""
-        sensor_data = self.load_sensor_data()
-        return sensor_data[sensor_data['machine_id'] == machine_id].sort_values('timestamp')
+    def get_machine_risk_trend(self, machine_id: str, start=None, end=None) -> Optional[float]:
+        """Get the least-squares slope of a machine's risk score per day, or None."""
+        with self._lock:
+            return self._machine_risk_history(machine_id).trend(machine_id, start, end)
+    
+    def _machine_risk_history(self, machine_id: str) -> RiskHistory:
+        """Get a risk history covering a machine's readings."""
+        if self.sensor_data is None and self.storage.supports_pushdown:
+            # Score only this machine's readings rather than loading everything, once until they change
+            index = self._pushdown_index(machine_id)
+            risk_history = self._pushdown_risk.get(machine_id)
+            if risk_history is None or risk_history.index is not index:
+                risk_history = RiskHistory(site_prefix=self.site_prefix)
+                risk_history.backfill(index)
+                self._pushdown_risk[machine_id] = risk_history
+            else:
+                risk_history.refresh()
+            return risk_history
+        self.load_sensor_data()
+        return self._get_risk_history()
+    
+    def get_machine_anomaly_state(self, machine_id: str) -> Optional[Dict[str, Dict[str, Any]]]:
+        """
+        Get a machine's streaming anomaly state by sensor channel.
+        
+        Returns:
+            See ``StreamingAnomalyDetector.machine_state``; None for an unknown machine
+        """
+        return self._get_anomaly_detector([machine_id]).machine_state(machine_id)
+    
+    def get_anomaly_events(self, machine_id: str = None) -> pd.DataFrame:
+        """Get the most recent drift alarms, optionally of one machine, oldest first."""
+        machine_ids = None if machine_id is None else [machine_id]
+        return self._get_anomaly_detector(machine_ids).recent_events(machine_id)
+    
+    def get_remaining_life(self, machine_ids: List[str] = None) -> pd.DataFrame:
+        """
+        Get trend-based remaining useful life of many machines.
+        
+        Args:
+            machine_ids: Machines to estimate (default: all)
+            
+        Returns:
+            See ``RemainingLifeEstimator.estimates``
+        """
+        with self._lock:
+            return self._get_remaining_life_estimator(machine_ids).estimates(machine_ids)
+    
+    def get_machine_remaining_life(self, machine_id: str) -> Optional[Dict[str, Any]]:
+        """Get a machine's trend-based remaining useful life with per-channel detail, or None."""
+        with self._lock:
+            return self._get_remaining_life_estimator([machine_id]).machine_estimate(machine_id)
     
     def get_maintenance_schedule(self) -> pd.DataFrame:
         """Get upcoming maintenance schedule."""
@@ -64,29 +636,96 @@ class DataLoader:
         return maintenance_data.sort_values('next_service_due')
     
     def get_machines_overdue(self) -> List[str]:
-        """Get list of machines that are overdue for maintenance."""
+        """Get machines whose latest maintenance record is past due, most overdue first."""
         from datetime import datetime
-        maintenance_data = self.load_maintenance_data()
+        return self._get_maintenance_store().due_before(datetime.now())
+    
+    def get_machines_due_within(self, days: int) -> List[str]:
+        """Get machines whose next service falls within the next ``days`` days, earliest first."""
+        from datetime import datetime, timedelta
         today = datetime.now()
-        overdue = maintenance_data[maintenance_data['next_service_due'] < today]
-        return overdue['machine_id'].tolist()
+        return self._get_maintenance_store().due_between(today, today + timedelta(days=days))
+    
+    def get_machine_maintenance_history(self, machine_id: str) -> pd.DataFrame:
+        """Get all maintenance records of a machine in service-date order."""
+        return self._get_maintenance_store().history(machine_id)
     
     def get_machine_maintenance_data(self, machine_id: str) -> Optional[Dict[str, Any]]:
         """Get maintenance data for a specific machine."""
-        maintenance_data = self.load_maintenance_data()
-        machine_maintenance = maintenance_data[maintenance_data['machine_id'] == machine_id]
+        # Get the most recent maintenance record
+        latest_maintenance = self._get_maintenance_store().latest(machine_id)
         
-        if machine_maintenance.empty:
+        if latest_maintenance is None:
             logger.warning(f"No maintenance data found for machine {machine_id}")
             return None
         
-        # Get the most recent maintenance record
-        latest_maintenance = machine_maintenance.iloc[-1].to_dict()
-        
         return {
             "machine_id": machine_id,
             "last_service_date": latest_maintenance['last_service_date'],
             "service_notes": latest_maintenance['service_notes'],
             "next_service_due": latest_maintenance['next_service_due'],
             "service_cost": latest_maintenance['service_cost']
-        }
\ No newline at end of file
+        }
+
+def create_data_loader(data_dir: str = None, site: str = None, federated: bool = False) -> DataLoader:
+    """
+    Create the DataLoader for the configured data backend.
+    
+    Args:
+        data_dir: Optional data directory, or several sites as
+            ``"site=path,site=path"`` (default: from configuration)
+        site: Optional site ID of a single data directory
+        federated: The directory is one site of a ``FederatedDataLoader``
+        
+    Returns:
+        In-memory DataLoader, or SQLiteDataLoader when DATA_BACKEND is
+        ``sqlite``; a FederatedDataLoader over one of those per site when
+        several sites are configured
+    """
+    sites = config.get_data_sites(data_dir)
+    if len(sites) > 1:
+        from federation import FederatedDataLoader
+        return FederatedDataLoader(sites)
+    (default_site, data_dir), = sites.items()
+    site = site or default_site
+    backend = config.DATA_BACKEND.lower()
+    if backend == 'sqlite':
+        from sqlite_loader import SQLiteDataLoader
+        return SQLiteDataLoader(data_dir, site=site, federated=federated)
+    if backend != 'pandas':
+        raise ValueError(f"Unknown data backend: {config.DATA_BACKEND}")
+    return DataLoader(data_dir, site=site, federated=federated)
+
+
+# Process-wide registry of shared loaders, keyed by (backend, data directory)
+_shared_loaders: Dict[tuple, DataLoader] = {}
+_shared_loaders_lock = threading.Lock()
+
+
+def get_data_loader(data_dir: str = None) -> DataLoader:
+    """
+    Get the process-wide shared DataLoader.
+    
+    Every consumer in the process (service layer and front-end pages) receives
+    the same thread-safe instance, so the data is loaded and cached once per
+    process instead of once per module. Unless DATA_WATCH_MODE is ``off``, a
+    DataFileWatcher keeps its caches in step with the data files.
+    
+    Args:
+        data_dir: Optional data directory (default: from configuration)
+        
+    Returns:
+        Shared DataLoader for the configured backend and directory
+    """
+    key = (config.DATA_BACKEND.lower(), data_dir or config.DATA_DIR)
+    with _shared_loaders_lock:
+        loader = _shared_loaders.get(key)
+        if loader is None:
+            loader = create_data_loader(data_dir)
+            _shared_loaders[key] = loader
+            logger.info(f"Registered shared DataLoader for {key}")
+            watcher = DataFileWatcher(loader.watched_paths())
+            watcher.add_listener(loader.handle_file_changes)
+            if watcher.start():
+                loader.watcher = watcher
+        return loader
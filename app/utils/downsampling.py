@@ -0,0 +1,104 @@
+"""
+Server-side downsampling of sensor history for charting.
+
+Readings are grouped into fixed-width time buckets and reduced to the
+min/max/mean of every sensor channel, so a chart receives at most a bounded
+number of points however long the requested range is.
+"""
+import os
+import sys
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from channels import channel_registry
+
+# Columns reduced to min/max/mean per bucket: every registered sensor channel
+SENSOR_COLUMNS = list(channel_registry.names)
+
+
+def bucket_width(history: pd.DataFrame, max_points: int = None, resample: str = None) -> Optional[pd.Timedelta]:
+    """
+    Choose the bucket width for a history frame.
+
+    Args:
+        history: Time-ordered readings for one machine
+        max_points: Target maximum number of points
+        resample: Explicit bucket width such as ``"5min"`` or ``"1h"``
+
+    Returns:
+        Bucket width, or ``None`` when the history needs no reduction
+    """
+    if resample:
+        return pd.Timedelta(resample)
+    if not max_points or len(history) <= max_points:
+        return None
+    return fit_width(history['timestamp'].iloc[0], history['timestamp'].iloc[-1], max_points)
+
+
+def fit_width(first, last, max_points: int, unit: pd.Timedelta = pd.Timedelta(seconds=1)) -> pd.Timedelta:
+    """
+    Smallest multiple of ``unit`` whose epoch-aligned buckets cover ``[first, last]`` in ``max_points``.
+
+    Args:
+        first: Oldest timestamp
+        last: Newest timestamp
+        max_points: Maximum number of buckets
+        unit: Granularity of the width (default: one second)
+
+    Returns:
+        Bucket width
+    """
+    first, last = pd.Timestamp(first), pd.Timestamp(last)
+    width = unit * max(1, int(-(-(last - first) // (unit * max_points))))
+    # Aligning to the epoch can straddle one more bucket than the span needs
+    while last.floor(width) - first.floor(width) >= width * max_points:
+        width += unit
+    return width
+
+
+def downsample_history(history: pd.DataFrame, max_points: int = None, resample: str = None) -> pd.DataFrame:
+    """
+    Reduce a machine's history to fixed-width time buckets.
+
+    Args:
+        history: Time-ordered readings for one machine
+        max_points: Target maximum number of points
+        resample: Explicit bucket width; takes precedence over ``max_points``
+
+    Returns:
+        The history unchanged when no reduction is needed, otherwise one row per
+        non-empty bucket with the bucket start as ``timestamp``, the mean of each
+        sensor channel under its own name, ``<channel>_min`` / ``<channel>_max``,
+        the last ``operating_hours`` and the bucket's reading ``count``.
+    """
+    if history.empty:
+        return history
+    width = bucket_width(history, max_points, resample)
+    if width is None:
+        return history
+
+    timestamps = history['timestamp'].to_numpy().astype('datetime64[ns]').view('int64')
+    width_ns = width.value
+    # Buckets align to the epoch, like the rollup tiers, so every path buckets alike
+    buckets = timestamps // width_ns
+
+    channels = [column for column in SENSOR_COLUMNS if column in history.columns]
+    grouped = history[channels].groupby(buckets, sort=True)
+    means = grouped.mean()
+    result = pd.DataFrame({'timestamp': pd.to_datetime(means.index.to_numpy() * width_ns)})
+    if 'machine_id' in history.columns:
+        result.insert(1, 'machine_id', history['machine_id'].iloc[0])
+
+    minimums = grouped.min()
+    maximums = grouped.max()
+    for column in channels:
+        result[column] = means[column].to_numpy()
+        result[f'{column}_min'] = minimums[column].to_numpy()
+        result[f'{column}_max'] = maximums[column].to_numpy()
+    if 'operating_hours' in history.columns:
+        result['operating_hours'] = history['operating_hours'].groupby(buckets, sort=True).last().to_numpy()
+    result['count'] = grouped.size().to_numpy()
+    return result
@@ -0,0 +1,331 @@
+"""
+Federation of several sites' data directories into one fleet.
+
+Each site (plant) keeps its own data directory and gets its own DataLoader.
+``FederatedDataLoader`` runs the per-site work on a thread pool, so loading
+the fleet takes as long as the slowest site rather than the sum of all sites,
+and presents the results as one fleet: frames gain a ``site`` column and
+machine IDs are qualified as ``<site>:<machine_id>`` so machines with the same
+ID at different plants stay distinct. Unqualified IDs are routed through a map
+of machines to sites that the sites' ingest listeners keep current.
+"""
+import functools
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from logger_config import get_logger
+from ring_buffer import WINDOW_CHANNELS
+from storage import concat_readings
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.app_config import config
+logger = get_logger(__name__)
+
+# Separates the site from the machine ID in fleet-wide machine IDs
+SITE_SEPARATOR = ":"
+
+
+def qualify_machine_id(site: str, machine_id: str) -> str:
+    """Get the fleet-wide ID of a site's machine."""
+    return f"{site}{SITE_SEPARATOR}{machine_id}"
+
+
+def _qualify_frame(site: str, frame: pd.DataFrame) -> pd.DataFrame:
+    """Copy a site's frame with a ``site`` column and fleet-wide machine IDs."""
+    frame = frame.copy()
+    if 'machine_id' in frame:
+        machine_ids = frame['machine_id']
+        if isinstance(machine_ids.dtype, pd.CategoricalDtype):
+            # Renames the categories only, not every row
+            frame['machine_id'] = machine_ids.cat.rename_categories(
+                lambda machine_id: qualify_machine_id(site, machine_id))
+        else:
+            frame['machine_id'] = (site + SITE_SEPARATOR) + machine_ids.astype(str)
+    frame.insert(0, 'site', site)
+    return frame
+
+
+def _not_found_frame() -> pd.DataFrame:
+    """Result of a frame lookup for a machine no site has."""
+    return pd.DataFrame(columns=['site', 'machine_id'])
+
+
+def _notify_site_ingest(listener: Callable[[Optional[List[str]]], None], site: str,
+                        machine_ids: Optional[List[str]]) -> None:
+    if machine_ids is None:
+        listener(None)
+    else:
+        listener([qualify_machine_id(site, machine_id) for machine_id in machine_ids] + list(machine_ids))
+
+
+class FederatedDataLoader:
+    """DataLoader interface over several sites, loaded in parallel."""
+
+    def __init__(self, sites: Dict[str, str], workers: int = None):
+        """
+        Create one loader per site, in parallel.
+
+        Args:
+            sites: Site ID -> data directory
+            workers: Threads used for per-site work (default: DATA_LOAD_WORKERS,
+                or one per site)
+        """
+        from data_loader import create_data_loader
+
+        self.sites = list(sites)
+        self.site = None
+        workers = workers or config.DATA_LOAD_WORKERS or len(self.sites)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='site-loader')
+        self.loaders = dict(zip(self.sites, self._executor.map(
+            lambda site: create_data_loader(sites[site], site=site, federated=True), self.sites)))
+        self._lock = threading.Lock()
+        self.data_version = 0
+        self.watcher = None
+        # Site-local machine ID -> sites with readings of it; None until first
+        # needed and after a site's full (re)load
+        self._machine_sites: Optional[Dict[str, List[str]]] = None
+        self._machine_sites_generation = 0
+        for site, loader in self.loaders.items():
+            loader.add_ingest_listener(functools.partial(self._site_ingested, site))
+        logger.info(f"FederatedDataLoader initialized with {len(self.sites)} sites "
+                    f"({workers} workers): {', '.join(self.sites)}")
+
+    def _map(self, function: Callable[[Any], Any]) -> Dict[str, Any]:
+        """Call ``function`` with every site's loader in parallel."""
+        return dict(zip(self.sites, self._executor.map(lambda site: function(self.loaders[site]), self.sites)))
+
+    def _concat(self, frames: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+        return concat_readings([_qualify_frame(site, frame) for site, frame in frames.items()])
+
+    def _site_ingested(self, site: str, machine_ids: Optional[List[str]]) -> None:
+        """Keep the machine -> site map current with a site's ingest."""
+        with self._lock:
+            self._machine_sites_generation += 1
+            if machine_ids is None:
+                self._machine_sites = None
+            elif self._machine_sites is not None:
+                for machine_id in map(str, machine_ids):
+                    sites = self._machine_sites.setdefault(machine_id, [])
+                    if site not in sites:
+                        sites.append(site)
+
+    def _get_machine_sites(self) -> Dict[str, List[str]]:
+        """Get the machine -> site map, building it from every site's latest readings when needed."""
+        # A build that first loads a site sees its own ingest, so it is tried twice
+        for _ in range(2):
+            with self._lock:
+                if self._machine_sites is not None:
+                    return self._machine_sites
+                generation = self._machine_sites_generation
+            # Built outside the lock: loading a site notifies its ingest listeners
+            machine_sites: Dict[str, List[str]] = {}
+            for site, latest in self._map(lambda loader: loader.get_latest_sensor_data()).items():
+                for machine_id in latest['machine_id'].astype(str).unique().tolist():
+                    machine_sites.setdefault(machine_id, []).append(site)
+            with self._lock:
+                # An ingest during the build may be missing from it; keep it only for this lookup
+                if self._machine_sites_generation == generation:
+                    self._machine_sites = machine_sites
+                    break
+        return machine_sites
+
+    def _route(self, machine_id: str) -> Optional[Tuple[str, str]]:
+        """
+        Find the site of a machine.
+
+        Args:
+            machine_id: Fleet-wide ``<site>:<machine_id>``, or a machine ID
+                that exists at a single site
+
+        Returns:
+            (site, machine ID at that site), or None when no site has the machine
+        """
+        site, separator, local_id = machine_id.partition(SITE_SEPARATOR)
+        if separator and site in self.loaders:
+            return site, local_id
+        owners = self._get_machine_sites().get(machine_id, [])
+        if len(owners) > 1:
+            raise ValueError(f"Machine {machine_id} exists at several sites; use one of "
+                             f"{[qualify_machine_id(site, machine_id) for site in owners]}")
+        return (owners[0], machine_id) if owners else None
+
+    def load_sensor_data(self) -> pd.DataFrame:
+        """Load every site's sensor data in parallel."""
+        return self._concat(self._map(lambda loader: loader.load_sensor_data()))
+
+    def refresh_sensor_data(self) -> int:
+        """Ingest appended sensor rows at every site; returns the total."""
+        return sum(self._map(lambda loader: loader.refresh_sensor_data()).values())
+
+    def load_maintenance_data(self) -> pd.DataFrame:
+        """Load every site's maintenance records in parallel."""
+        return self._concat(self._map(lambda loader: loader.load_maintenance_data()))
+
+    def watched_paths(self) -> List[str]:
+        """Data files of every site."""
+        return [path for site in self.sites for path in self.loaders[site].watched_paths()]
+
+    def handle_file_changes(self, paths: List[str]) -> None:
+        """Pass changed data files on to the sites they belong to."""
+        paths = {os.path.abspath(path) for path in paths}
+        for site in self.sites:
+            loader = self.loaders[site]
+            changed = [path for path in loader.watched_paths() if os.path.abspath(path) in paths]
+            if changed:
+                loader.handle_file_changes(changed)
+        with self._lock:
+            self.data_version += 1
+
+    def add_ingest_listener(self, listener: Callable[[Optional[List[str]]], None]) -> None:
+        """
+        Register a callback with every site's loader.
+
+        The callback receives both the fleet-wide and the site-local IDs of
+        machines with new readings, since either may be used to look a
+        machine up; None after a site's full (re)load.
+        """
+        for site, loader in self.loaders.items():
+            loader.add_ingest_listener(functools.partial(_notify_site_ingest, listener, site))
+
+    def get_data_quality(self) -> Dict[str, Dict[str, Any]]:
+        """Get every site's data-quality counters, by site."""
+        return self._map(lambda loader: loader.get_data_quality())
+
+    def get_latest_sensor_data(self) -> pd.DataFrame:
+        """Get the most recent sensor readings of every machine at every site."""
+        return self._concat(self._map(lambda loader: loader.get_latest_sensor_data()))
+
+    def get_recent_window(self, machine_id: str, count: int = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Get a machine's most recent readings from its site."""
+        route = self._route(machine_id)
+        if route is None:
+            return np.empty(0, dtype='datetime64[ns]'), np.empty((0, len(WINDOW_CHANNELS)))
+        site, local_id = route
+        return self.loaders[site].get_recent_window(local_id, count)
+
+    def count_machine_readings(self, machine_id: str) -> int:
+        """Get the number of stored readings of a machine."""
+        route = self._route(machine_id)
+        if route is None:
+            return 0
+        site, local_id = route
+        return self.loaders[site].count_machine_readings(local_id)
+
+    def get_machine_history(self, machine_id: str, start=None, end=None,
+                            max_points: int = None, resample: str = None) -> pd.DataFrame:
+        """Get historical data for a machine from its site."""
+        route = self._route(machine_id)
+        if route is None:
+            return _not_found_frame()
+        site, local_id = route
+        history = self.loaders[site].get_machine_history(local_id, start=start, end=end,
+                                                         max_points=max_points, resample=resample)
+        return _qualify_frame(site, history)
+
+    def get_machine_risk_history(self, machine_id: str, start=None, end=None,
+                                 max_points: int = None) -> pd.DataFrame:
+        """Get a machine's risk over time from its site."""
+        route = self._route(machine_id)
+        if route is None:
+            return _not_found_frame()
+        site, local_id = route
+        return _qualify_frame(site, self.loaders[site].get_machine_risk_history(local_id, start=start, end=end,
+                                                                                max_points=max_points))
+
+    def get_machine_risk_trend(self, machine_id: str, start=None, end=None) -> Optional[float]:
+        """Get the slope of a machine's risk score per day from its site."""
+        route = self._route(machine_id)
+        if route is None:
+            return None
+        site, local_id = route
+        return self.loaders[site].get_machine_risk_trend(local_id, start=start, end=end)
+
+    def get_machine_anomaly_state(self, machine_id: str) -> Optional[Dict[str, Dict[str, Any]]]:
+        """Get a machine's streaming anomaly state from its site."""
+        route = self._route(machine_id)
+        if route is None:
+            return None
+        site, local_id = route
+        return self.loaders[site].get_machine_anomaly_state(local_id)
+
+    def get_anomaly_events(self, machine_id: str = None) -> pd.DataFrame:
+        """Get the most recent drift alarms of one machine or of every site."""
+        if machine_id is not None:
+            route = self._route(machine_id)
+            if route is None:
+                return _not_found_frame()
+            site, local_id = route
+            return _qualify_frame(site, self.loaders[site].get_anomaly_events(local_id))
+        events = self._concat(self._map(lambda loader: loader.get_anomaly_events()))
+        return events.sort_values('timestamp', kind='stable').reset_index(drop=True)
+
+    def get_remaining_life(self, machine_ids: List[str] = None) -> pd.DataFrame:
+        """Get trend-based remaining useful life of machines at every site."""
+        if machine_ids is None:
+            return self._concat(self._map(lambda loader: loader.get_remaining_life()))
+        by_site: Dict[str, List[str]] = {}
+        for machine_id in machine_ids:
+            route = self._route(machine_id)
+            if route is not None:
+                by_site.setdefault(route[0], []).append(route[1])
+        if not by_site:
+            return _not_found_frame()
+        return self._concat({site: self.loaders[site].get_remaining_life(local_ids)
+                             for site, local_ids in by_site.items()})
+
+    def get_machine_remaining_life(self, machine_id: str) -> Optional[Dict[str, Any]]:
+        """Get a machine's trend-based remaining useful life from its site."""
+        route = self._route(machine_id)
+        if route is None:
+            return None
+        site, local_id = route
+        return self.loaders[site].get_machine_remaining_life(local_id)
+
+    def get_maintenance_schedule(self) -> pd.DataFrame:
+        """Get the fleet's upcoming maintenance schedule."""
+        schedule = self._concat(self._map(lambda loader: loader.get_maintenance_schedule()))
+        return schedule.sort_values('next_service_due', kind='stable').reset_index(drop=True)
+
+    def _by_due_date(self, machine_ids: Dict[str, List[str]]) -> List[str]:
+        """Qualify per-site machine lists and order them by next service due."""
+        due = []
+        for site, site_machine_ids in machine_ids.items():
+            for machine_id in site_machine_ids:
+                maintenance = self.loaders[site].get_machine_maintenance_data(machine_id) or {}
+                next_due = pd.Timestamp(maintenance.get('next_service_due'))
+                due.append((pd.Timestamp.max if pd.isna(next_due) else next_due, qualify_machine_id(site, machine_id)))
+        due.sort()
+        return [machine_id for _, machine_id in due]
+
+    def get_machines_overdue(self) -> List[str]:
+        """Get machines overdue for maintenance at every site, earliest due first."""
+        return self._by_due_date(self._map(lambda loader: loader.get_machines_overdue()))
+
+    def get_machines_due_within(self, days: int) -> List[str]:
+        """Get machines due for maintenance within ``days`` at every site, earliest due first."""
+        return self._by_due_date(self._map(lambda loader: loader.get_machines_due_within(days)))
+
+    def get_machine_maintenance_history(self, machine_id: str) -> pd.DataFrame:
+        """Get a machine's maintenance records from its site."""
+        route = self._route(machine_id)
+        if route is None:
+            return _not_found_frame()
+        site, local_id = route
+        return _qualify_frame(site, self.loaders[site].get_machine_maintenance_history(local_id))
+
+    def get_machine_maintenance_data(self, machine_id: str) -> Optional[Dict[str, Any]]:
+        """Get a machine's latest maintenance record from its site."""
+        route = self._route(machine_id)
+        if route is None:
+            return None
+        site, local_id = route
+        maintenance = self.loaders[site].get_machine_maintenance_data(local_id)
+        if maintenance is None:
+            return None
+        return dict(maintenance, machine_id=qualify_machine_id(site, local_id), site=site)
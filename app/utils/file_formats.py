@@ -0,0 +1,154 @@
+"""
+Format detection and streaming readers for the flat data exports.
+
+The same records are shipped as ``.csv``, ``.txt`` (delimited text) and
+``.json`` (an array of objects, or one object per line). JSON files are parsed
+record by record from a bounded text buffer and collected into per-column
+buffers that are flushed to a typed frame every chunk, so the full list of
+dicts is never held in memory.
+"""
+import json
+import os
+from typing import Callable, Dict, Iterator, List, Optional
+
+import pandas as pd
+
+# Delimiters tried when sniffing a text export
+DELIMITERS = [',', '\t', ';', '|']
+# Characters allowed between top-level JSON records
+_JSON_SEPARATORS = ' \t\r\n,'
+# Records collected per column buffer before being converted to a frame
+JSON_RECORDS_PER_CHUNK = 65536
+
+
+def detect_format(path: str) -> str:
+    """
+    Detect the format of a data file.
+
+    Args:
+        path: File to inspect
+
+    Returns:
+        ``json`` or ``csv`` (delimited text, including ``.txt`` exports)
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.json', '.jsonl', '.ndjson'):
+        return 'json'
+    if extension in ('.csv', '.txt', '.tsv'):
+        return 'csv'
+    # Unknown extension: look at the first non-blank character
+    with open(path, 'r', encoding='utf-8') as handle:
+        for line in handle:
+            stripped = line.lstrip()
+            if stripped:
+                return 'json' if stripped[0] in '[{' else 'csv'
+    return 'csv'
+
+
+def detect_delimiter(path: str) -> str:
+    """Pick the delimiter that splits the header line of a text export into the most fields."""
+    if os.path.splitext(path)[1].lower() == '.tsv':
+        return '\t'
+    with open(path, 'r', encoding='utf-8') as handle:
+        header = handle.readline()
+    return max(DELIMITERS, key=header.count) if any(d in header for d in DELIMITERS) else ','
+
+
+def iter_json_records(handle, buffer_size: int = 1 << 16) -> Iterator[Dict]:
+    """
+    Stream the objects of a JSON array (or of JSON Lines) from a text handle.
+
+    Only ``buffer_size`` characters plus the record being decoded are held
+    at a time.
+
+    Args:
+        handle: Text-mode file object positioned at the start of the document
+        buffer_size: Characters read per refill
+
+    Yields:
+        One decoded record at a time
+    """
+    decoder = json.JSONDecoder()
+    buffer = handle.read(buffer_size)
+    position = 0
+    eof = not buffer
+    opened = False
+    while True:
+        while position < len(buffer) and buffer[position] in _JSON_SEPARATORS:
+            position += 1
+        if position == len(buffer):
+            if eof:
+                return
+            buffer, position = handle.read(buffer_size), 0
+            eof = not buffer
+            continue
+
+        character = buffer[position]
+        if character == '[' and not opened:
+            opened = True
+            position += 1
+            continue
+        if character == ']' and opened:
+            return
+
+        try:
+            record, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            # The record is cut off by the end of the buffer
+            more = handle.read(buffer_size)
+            if not more:
+                raise
+            buffer, position = buffer[position:] + more, 0
+            continue
+        if not isinstance(record, dict):
+            raise ValueError(f"Expected JSON objects, got {type(record).__name__}")
+        yield record
+
+
+def read_json_chunks(path: str, usecols: Optional[List[str]] = None,
+                     chunk_size: Optional[int] = None,
+                     convert: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None) -> List[pd.DataFrame]:
+    """
+    Stream a JSON export into typed frames.
+
+    Args:
+        path: JSON file to read
+        usecols: Optional fields to keep (default: the fields of the first record)
+        chunk_size: Records per column buffer (default: ``JSON_RECORDS_PER_CHUNK``)
+        convert: Optional function applied to every chunk, e.g. to compact dtypes
+
+    Returns:
+        List of chunk frames, to be concatenated by the caller
+    """
+    chunk_size = chunk_size or JSON_RECORDS_PER_CHUNK
+    convert = convert or (lambda chunk: chunk)
+    frames = []
+    names = list(usecols) if usecols else None
+    buffers: Dict[str, list] = {name: [] for name in names} if names else {}
+    with open(path, 'r', encoding='utf-8') as handle:
+        for record in iter_json_records(handle):
+            if names is None:
+                names = list(record)
+                buffers = {name: [] for name in names}
+            for name in names:
+                buffers[name].append(record.get(name))
+            if len(buffers[names[0]]) >= chunk_size:
+                frames.append(convert(pd.DataFrame(buffers, columns=names)))
+                buffers = {name: [] for name in names}
+    if names and (buffers[names[0]] or not frames):
+        frames.append(convert(pd.DataFrame(buffers, columns=names)))
+    if not frames:
+        frames.append(convert(pd.DataFrame(columns=names or [])))
+    return frames
+
+
+def read_records(path: str) -> pd.DataFrame:
+    """
+    Read a small flat export (e.g. maintenance records) in any supported format.
+
+    Returns:
+        The records with pandas' default type inference
+    """
+    if detect_format(path) == 'json':
+        return pd.concat(read_json_chunks(path), ignore_index=True)
+    return pd.read_csv(path, sep=detect_delimiter(path))
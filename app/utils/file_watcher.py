@@ -0,0 +1,263 @@
+"""
+Change detection for the data files in ``DATA_DIR``.
+
+The watcher keeps the mtime, size and a content fingerprint of every watched
+file and reports a file as changed only when one of them moved and the
+fingerprint differs, so a touched or rewritten-but-identical file does not
+invalidate any cache. The fingerprint covers the size and both ends of the
+file. For files longer than both ends, the whole content is also hashed when
+first seen and whenever the mtime moves but the fingerprint does not, so a
+same-size edit in the middle is still seen. On Linux the data directory is
+watched with inotify; elsewhere (or when inotify is unavailable) the files are
+polled. A watched directory, such as a partitioned sensor tree, is summarized
+from the paths, sizes and mtimes of its files and is re-checked every interval.
+"""
+import ctypes
+import ctypes.util
+import hashlib
+import os
+import select
+import struct
+import sys
+import threading
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from logger_config import get_logger
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.app_config import config
+logger = get_logger(__name__)
+
+# Bytes hashed from each end of a file for its fingerprint
+FINGERPRINT_BLOCK_SIZE = 64 * 1024
+
+# inotify event masks (see inotify(7))
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+_INOTIFY_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+
+class FileState(NamedTuple):
+    """Observed state of a watched file."""
+
+    mtime_ns: int
+    size: int
+    fingerprint: str
+    # Hash of the whole content, taken only when the fingerprint could not tell
+    digest: Optional[str] = None
+
+
+def file_fingerprint(path: str, size: int) -> str:
+    """
+    Fingerprint a file from its size and its first and last blocks.
+
+    Appends and rewrites change the tail or the head, so the whole file does
+    not have to be hashed on every check.
+    """
+    digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(path, 'rb') as handle:
+        digest.update(handle.read(FINGERPRINT_BLOCK_SIZE))
+        if size > FINGERPRINT_BLOCK_SIZE:
+            handle.seek(max(FINGERPRINT_BLOCK_SIZE, size - FINGERPRINT_BLOCK_SIZE))
+            digest.update(handle.read(FINGERPRINT_BLOCK_SIZE))
+    return digest.hexdigest()
+
+
+def file_digest(path: str) -> str:
+    """Hash the whole content of a file."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as handle:
+        for block in iter(lambda: handle.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def directory_state(path: str) -> Tuple[int, int, str]:
+    """
+    Summarize a directory tree (e.g. partitioned sensor data) as one file state.
+
+    Returns:
+        (newest mtime, total size, fingerprint of every file's path, size and mtime)
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    newest = 0
+    total = 0
+    for root, directories, files in os.walk(path):
+        directories.sort()
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            stat = os.stat(file_path)
+            newest = max(newest, stat.st_mtime_ns)
+            total += stat.st_size
+            digest.update(f"{os.path.relpath(file_path, path)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+    return newest, total, digest.hexdigest()
+
+
+def _load_inotify():
+    """Get libc's inotify functions, or None when they are unavailable."""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class DataFileWatcher:
+    """Watches data files and notifies listeners when their content changes."""
+
+    def __init__(self, paths: List[str], interval: float = None, mode: str = None):
+        """
+        Create a watcher.
+
+        Args:
+            paths: Files to watch
+            interval: Seconds between polls, and the longest wait between
+                inotify checks (default: from configuration)
+            mode: ``auto`` (inotify when available), ``poll`` or ``off``
+                (default: from configuration)
+        """
+        self.paths = [os.path.abspath(path) for path in paths]
+        self.interval = config.DATA_WATCH_INTERVAL if interval is None else interval
+        self.mode = (mode or config.DATA_WATCH_MODE).lower()
+        self._states: Dict[str, Optional[FileState]] = {path: self._stat(path, None) for path in self.paths}
+        self._listeners: List[Callable[[List[str]], None]] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._inotify_fd: Optional[int] = None
+
+    def add_listener(self, listener: Callable[[List[str]], None]) -> None:
+        """Register a callback receiving the list of changed paths."""
+        with self._lock:
+            if listener not in self._listeners:
+                self._listeners.append(listener)
+
+    @staticmethod
+    def _stat(path: str, previous: Optional[FileState]) -> Optional[FileState]:
+        try:
+            if os.path.isdir(path):
+                return FileState(*directory_state(path))
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        if previous is not None and (stat.st_mtime_ns, stat.st_size) == previous[:2]:
+            return previous
+        fingerprint = file_fingerprint(path, stat.st_size)
+        digest = None
+        if stat.st_size > 2 * FINGERPRINT_BLOCK_SIZE and \
+                (previous is None or (stat.st_size, fingerprint) == previous[1:3]):
+            # Same size, head and tail: only the whole content shows a mid-file edit
+            digest = file_digest(path)
+        return FileState(stat.st_mtime_ns, stat.st_size, fingerprint, digest)
+
+    def check(self) -> List[str]:
+        """
+        Compare the watched files with their last observed state.
+
+        Listeners are called once with every changed path.
+
+        Returns:
+            Paths whose content changed (or that appeared or disappeared)
+        """
+        changed = []
+        with self._lock:
+            for path in self.paths:
+                previous = self._states[path]
+                current = self._stat(path, previous)
+                self._states[path] = current
+                if previous is None or current is None:
+                    if previous != current:
+                        changed.append(path)
+                elif current.fingerprint != previous.fingerprint or \
+                        (current.digest is not None and current.digest != previous.digest):
+                    # With no earlier digest to compare (the file last changed size), count it as changed
+                    changed.append(path)
+            listeners = list(self._listeners)
+        if changed:
+            logger.info(f"Data files changed: {changed}")
+            for listener in listeners:
+                try:
+                    listener(changed)
+                except Exception as e:
+                    logger.error(f"Data file listener failed: {str(e)}")
+        return changed
+
+    def _open_inotify(self) -> Optional[int]:
+        """Watch the directories of the data files with inotify."""
+        libc = _load_inotify()
+        if libc is None:
+            return None
+        fd = libc.inotify_init1(IN_NONBLOCK)
+        if fd < 0:
+            return None
+        for directory in sorted({os.path.dirname(path) for path in self.paths}):
+            if libc.inotify_add_watch(fd, directory.encode(), _INOTIFY_MASK) < 0:
+                os.close(fd)
+                return None
+        return fd
+
+    def _drain_inotify(self) -> bool:
+        """Read pending inotify events; True when one concerns a watched file."""
+        names = {os.path.basename(path).encode() for path in self.paths}
+        relevant = False
+        while True:
+            try:
+                data = os.read(self._inotify_fd, 64 * 1024)
+            except BlockingIOError:
+                return relevant
+            offset = 0
+            while offset + 16 <= len(data):
+                _, _, _, name_length = struct.unpack_from('iIII', data, offset)
+                name = data[offset + 16:offset + 16 + name_length].rstrip(b'\0')
+                relevant = relevant or name in names
+                offset += 16 + name_length
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            if self._inotify_fd is not None:
+                readable, _, _ = select.select([self._inotify_fd], [], [], self.interval)
+                # Timeouts still check, in case events were missed (e.g. network filesystems)
+                if readable and not self._drain_inotify():
+                    continue
+            else:
+                self._stop.wait(self.interval)
+            if not self._stop.is_set():
+                self.check()
+
+    def start(self) -> bool:
+        """
+        Start watching in a daemon thread.
+
+        Returns:
+            False when watching is disabled by the mode
+        """
+        if self.mode == 'off':
+            return False
+        if self._thread is not None:
+            return True
+        if self.mode == 'auto':
+            self._inotify_fd = self._open_inotify()
+        method = 'inotify' if self._inotify_fd is not None else f'polling every {self.interval}s'
+        logger.info(f"Watching {len(self.paths)} data files using {method}")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='data-file-watcher', daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self) -> None:
+        """Stop the watcher thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+        if self._inotify_fd is not None:
+            os.close(self._inotify_fd)
+            self._inotify_fd = None
@@ -0,0 +1,236 @@
+"""
+Fleet scoring across a process pool over shared memory.
+
+Vectorized scoring still runs on one core. For fleets of 100k+ machines,
+``FleetScorer`` splits the channel matrix into fixed row shards and scores
+them on a ``ProcessPoolExecutor``. The matrix and the result arrays live in
+``multiprocessing.shared_memory`` blocks that the workers attach to, so shards
+are never pickled: a task is only the block names and a row range. Every
+shard writes its own rows of the result arrays, so the merged result is the
+same as scoring in one process, whatever order the shards finish in. Each
+task carries the scoring snapshot it must use, so a configuration reload
+reaches the workers with the next batch.
+
+The pool only pays off with spare cores and enough rows to split: it runs at
+most one worker per core, and batches that fit in one shard, fall below
+FLEET_SCORING_MIN_ROWS or land on a single-core host are scored in-process.
+Reasons and recommendations are built in the calling process after the
+merge (see ``benchmarks/bench_fleet_scoring.py``).
+
+Import this module as ``utils.fleet_scoring`` only, so the process holds a
+single ``get_fleet_scorer`` pool.
+"""
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Callable, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from logger_config import get_logger
+from channels import ChannelRegistry
+from predictor import MaintenancePredictor
+from scoring_config import CompiledScoring
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.app_config import config
+logger = get_logger(__name__)
+
+# (block name, shape, dtype) of an array in shared memory
+ArraySpec = Tuple[str, Tuple[int, ...], str]
+
+
+def _create_shared(shape: Tuple[int, ...], dtype) -> Tuple[shared_memory.SharedMemory, np.ndarray, ArraySpec]:
+    """Allocate an array in a new shared memory block."""
+    dtype = np.dtype(dtype)
+    block = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * dtype.itemsize))
+    return block, np.ndarray(shape, dtype=dtype, buffer=block.buf), (block.name, shape, dtype.str)
+
+
+def _attach_shared(spec: ArraySpec) -> Tuple[shared_memory.SharedMemory, np.ndarray]:
+    """Attach to an array created by another process."""
+    name, shape, dtype = spec
+    # Pool workers share the creating process's resource tracker, so attaching
+    # does not hand the block to a tracker that would unlink it on exit
+    block = shared_memory.SharedMemory(name=name)
+    return block, np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+
+
+# Scorer of the current worker process
+_worker_predictor: Optional[MaintenancePredictor] = None
+
+
+def _init_worker(channels: ChannelRegistry) -> None:
+    global _worker_predictor
+    _worker_predictor = MaintenancePredictor(channels)
+
+
+def _score_into(inputs: List[np.ndarray], outputs: List[np.ndarray], start: int, end: int,
+                scoring: CompiledScoring) -> None:
+    matrix, *profiles = inputs
+    profiles = profiles[0][start:end] if profiles else None
+    for output, result in zip(outputs, _worker_predictor.assess(matrix[start:end], profiles, scoring)):
+        output[start:end] = result
+
+
+def _score_shard(input_specs: List[ArraySpec], output_specs: List[ArraySpec], start: int, end: int,
+                 scoring: CompiledScoring) -> Tuple[int, int]:
+    """Score rows ``[start, end)`` of the shared matrix (and profiles) into the shared outputs."""
+    attached = [_attach_shared(spec) for spec in input_specs + output_specs]
+    try:
+        _score_into([array for _, array in attached[:len(input_specs)]],
+                    [array for _, array in attached[len(input_specs):]], start, end, scoring)
+    finally:
+        # The array views must be gone before their blocks can close
+        blocks = [block for block, _ in attached]
+        del attached
+        for block in blocks:
+            block.close()
+    return start, end
+
+
+class FleetScorer:
+    """Scores large fleets on a pool of worker processes."""
+
+    def __init__(self, predictor: MaintenancePredictor = None, workers: int = None,
+                 shard_size: int = None, min_rows: int = None):
+        """
+        Create a scorer; the worker processes start on first parallel use.
+
+        Args:
+            predictor: Scorer whose channels the workers use (default: a new MaintenancePredictor)
+            workers: Worker processes, at most one per core (default: FLEET_SCORING_WORKERS,
+                or one per core)
+            shard_size: Rows per task (default: FLEET_SCORING_SHARD_SIZE)
+            min_rows: Smaller batches are scored in-process (default: FLEET_SCORING_MIN_ROWS)
+        """
+        self.predictor = predictor or MaintenancePredictor()
+        cores = os.cpu_count() or 1
+        # More workers than cores only adds process switching and IPC
+        self.workers = min(workers or config.FLEET_SCORING_WORKERS or cores, cores)
+        self.shard_size = shard_size or config.FLEET_SCORING_SHARD_SIZE
+        self.min_rows = config.FLEET_SCORING_MIN_ROWS if min_rows is None else min_rows
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                                     initargs=(self.predictor.channels,))
+                logger.info(f"Started fleet scoring pool with {self.workers} workers")
+            return self._executor
+
+    def parallel(self, rows: int) -> bool:
+        """
+        Whether a batch of ``rows`` goes to the worker pool.
+
+        Only with two or more workers (so two or more cores), at least
+        ``min_rows`` rows and more rows than one shard holds; anything else
+        is faster in-process.
+        """
+        return self.workers > 1 and rows >= max(self.min_rows, 1) and rows > self.shard_size
+
+    def assess(self, matrix: np.ndarray, profiles: np.ndarray = None,
+               scoring: CompiledScoring = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Score a ``(rows x channels)`` matrix like ``MaintenancePredictor.assess``.
+
+        The matrix is scored in its own dtype and copied into shared memory once.
+
+        Returns:
+            Tuple of (overall risk, level index, alert flags), in row order
+        """
+        scoring = scoring or self.predictor.scoring.compiled
+        matrix = np.asarray(matrix).reshape(-1, len(self.predictor.channels))
+        if not self.parallel(len(matrix)):
+            return self.predictor.assess(matrix, profiles, scoring)
+        return self._assess_shared(lambda shared: np.copyto(shared, matrix), matrix.shape, matrix.dtype,
+                                   profiles, scoring)
+
+    def _assess_shared(self, fill: Callable[[np.ndarray], Any], shape: Tuple[int, int], dtype,
+                       profiles: Optional[np.ndarray], scoring: CompiledScoring) -> Tuple[np.ndarray, ...]:
+        """Score on the pool a matrix that ``fill`` writes straight into shared memory."""
+        rows, channels = shape
+        shapes = [(shape, dtype)] + ([] if profiles is None else [((rows,), np.intp)]) + \
+            [((rows,), np.float64), ((rows,), np.intp), ((rows, channels), np.bool_)]
+        inputs = 1 if profiles is None else 2
+        allocated = []
+        try:
+            for array_shape, array_dtype in shapes:
+                allocated.append(_create_shared(array_shape, array_dtype))
+            fill(allocated[0][1])
+            if profiles is not None:
+                allocated[1][1][:] = profiles
+            specs = [spec for _, _, spec in allocated]
+            input_specs, output_specs = specs[:inputs], specs[inputs:]
+            pool = self._pool()
+            futures = [pool.submit(_score_shard, input_specs, output_specs, start, min(start + self.shard_size, rows),
+                                   scoring)
+                       for start in range(0, rows, self.shard_size)]
+            for future in futures:
+                future.result()
+            results = tuple(array.copy() for _, array, _ in allocated[inputs:])
+        finally:
+            blocks = [block for block, _, _ in allocated]
+            del allocated
+            for block in blocks:
+                block.close()
+                block.unlink()
+        logger.debug(f"Scored {rows} rows in {len(futures)} shards on {self.workers} workers")
+        return results
+
+    def score(self, readings: Union[pd.DataFrame, np.ndarray], explain: bool = True) -> pd.DataFrame:
+        """
+        Score many readings like ``MaintenancePredictor.score_batch``.
+
+        Args:
+            readings: Frame with the channel columns, or a channel matrix
+            explain: Also add ``reason`` and ``recommendations`` (default: True)
+        """
+        scoring = self.predictor.scoring.compiled
+        profiles = self.predictor.machine_profiles(readings, scoring)
+        channels = self.predictor.channels
+        if not isinstance(readings, pd.DataFrame):
+            results = self.assess(readings, profiles, scoring)
+        elif self.parallel(len(readings)):
+            # The frame's channels are laid out straight into the shared matrix
+            results = self._assess_shared(
+                lambda shared: channels.matrix(readings, missing=0.0, out=shared),
+                (len(readings), len(channels)), np.float64, profiles, scoring
+            )
+        else:
+            results = self.predictor.assess(channels.matrix(readings, dtype=np.float64, missing=0.0),
+                                            profiles, scoring)
+        return self.predictor.scores_frame(readings, *results, explain=explain, profiles=profiles, scoring=scoring)
+
+    def close(self) -> None:
+        """Stop the worker processes."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+
+_shared_scorer: Optional[FleetScorer] = None
+_shared_scorer_lock = threading.Lock()
+
+
+def get_fleet_scorer() -> Optional[FleetScorer]:
+    """
+    Get the process-wide fleet scorer.
+
+    Returns:
+        The shared FleetScorer, or None when FLEET_SCORING_WORKERS is below 2
+    """
+    global _shared_scorer
+    if config.FLEET_SCORING_WORKERS < 2:
+        return None
+    with _shared_scorer_lock:
+        if _shared_scorer is None:
+            _shared_scorer = FleetScorer()
+        return _shared_scorer
+
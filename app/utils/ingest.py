@@ -0,0 +1,136 @@
+"""
+Ingest stage for sensor readings: deduplication and late-arrival handling.
+
+Every batch is deduplicated on (machine_id, timestamp), keeping the last
+arrival. Rows older than a machine's newest reading are accepted as
+out-of-order rows as long as they fall inside the late-arrival window, and
+dropped beyond it. The admitted rows are merged into each machine's sorted
+series by ``MachineIndex.extend``, so queries never re-sort or regroup.
+"""
+import os
+import sys
+import threading
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from logger_config import get_logger
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.app_config import config
+logger = get_logger(__name__)
+
+INGEST_COUNTERS = ['received', 'duplicates', 'out_of_order', 'late_dropped', 'replaced']
+KEY_COLUMNS = ['machine_id', 'timestamp']
+
+
+class ReadingIngestor:
+    """Deduplicates incoming readings and enforces the late-arrival window."""
+
+    def __init__(self, late_window: str = None):
+        """
+        Create the ingest stage.
+
+        Args:
+            late_window: How far behind a machine's newest reading a row may
+                arrive, e.g. ``"1h"``; empty accepts any delay (default: from
+                configuration)
+        """
+        window = config.SENSOR_LATE_ARRIVAL_WINDOW if late_window is None else late_window
+        self.late_window = pd.Timedelta(window) if window else None
+        self._counters = dict.fromkeys(INGEST_COUNTERS, 0)
+        self._lock = threading.Lock()
+
+    def _count(self, **counts: int) -> None:
+        with self._lock:
+            for name, count in counts.items():
+                self._counters[name] += int(count)
+
+    def deduplicate(self, readings: pd.DataFrame, record: bool = True) -> pd.DataFrame:
+        """
+        Drop repeated (machine_id, timestamp) rows, keeping the last arrival.
+
+        Args:
+            readings: Readings in arrival order
+            record: Whether to add the rows to the counters; transient reads
+                of already-counted data pass False
+        """
+        if readings.empty:
+            return readings
+        duplicated = readings.duplicated(KEY_COLUMNS, keep='last').to_numpy()
+        if record:
+            self._count(received=len(readings), duplicates=duplicated.sum())
+        if not duplicated.any():
+            return readings
+        logger.debug(f"Dropped {int(duplicated.sum())} duplicate sensor readings")
+        return readings[~duplicated].reset_index(drop=True)
+
+    def admit(self, new_rows: pd.DataFrame, newest: Dict[str, pd.Timestamp]) -> pd.DataFrame:
+        """
+        Filter a batch of newly arrived rows.
+
+        Args:
+            new_rows: Rows read since the last ingest
+            newest: Each machine's newest ingested timestamp
+
+        Returns:
+            The deduplicated rows that are not too late
+        """
+        rows = self.deduplicate(new_rows)
+        if rows.empty or not newest:
+            return rows
+        high_water = pd.to_datetime(rows['machine_id'].astype(str).map(newest)).to_numpy()
+        timestamps = rows['timestamp'].to_numpy()
+        known = ~np.isnat(high_water)
+        out_of_order = known & (timestamps < high_water)
+        late = np.zeros(len(rows), dtype=bool)
+        if self.late_window is not None:
+            late = known & (timestamps < high_water - self.late_window.to_timedelta64())
+        self._count(out_of_order=(out_of_order & ~late).sum(), late_dropped=late.sum())
+        if late.any():
+            logger.warning(f"Dropped {int(late.sum())} sensor readings older than the "
+                           f"{self.late_window} late-arrival window")
+            rows = rows[~late].reset_index(drop=True)
+        return rows
+
+    def record_replaced(self, count: int) -> None:
+        """Count stored rows replaced by a later arrival with the same key."""
+        self._count(replaced=count)
+
+    def counters(self) -> Dict[str, int]:
+        """Get the ingest counters."""
+        with self._lock:
+            return dict(self._counters)
+
+    def reset(self) -> None:
+        """Clear the counters, e.g. before a full reload."""
+        with self._lock:
+            self._counters = dict.fromkeys(INGEST_COUNTERS, 0)
+
+
+def series_anomalies(sensor_data: pd.DataFrame, value_columns=None) -> Dict[str, int]:
+    """
+    Count suspicious patterns in readings sorted by (machine_id, timestamp).
+
+    Args:
+        sensor_data: Readings sorted by machine and time
+        value_columns: Columns compared for repeated readings
+
+    Returns:
+        ``operating_hours_regressions`` (hours lower than the machine's
+        previous reading) and ``repeated_readings`` (the same values as an
+        earlier reading of the machine at another time)
+    """
+    anomalies = {'operating_hours_regressions': 0, 'repeated_readings': 0}
+    if sensor_data is None or sensor_data.empty:
+        return anomalies
+    machine_ids = sensor_data['machine_id'].to_numpy()
+    same_machine = machine_ids[1:] == machine_ids[:-1]
+    if 'operating_hours' in sensor_data:
+        hours = sensor_data['operating_hours'].to_numpy(dtype=np.float64)
+        anomalies['operating_hours_regressions'] = int((same_machine & (hours[1:] < hours[:-1])).sum())
+    columns = [column for column in (value_columns or []) if column in sensor_data]
+    if columns:
+        anomalies['repeated_readings'] = int(sensor_data.duplicated(['machine_id'] + columns).sum())
+    return anomalies
@@ -0,0 +1,76 @@
+"""
+Incrementally maintained latest reading per machine.
+
+Each ingested reading is compared with the machine's current latest timestamp
+and replaces it only when it is not older, so the fleet overview never has to
+group the full sensor history and late, out-of-order rows cannot overwrite a
+newer reading.
+"""
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+
+class LatestReadings:
+    """Latest-reading-per-machine table updated in O(1) per reading."""
+
+    def __init__(self, columns: List[str]):
+        """
+        Create an empty table.
+
+        Args:
+            columns: Reading columns; must include ``machine_id`` and ``timestamp``
+        """
+        self.columns = list(columns)
+        self._machine_position = self.columns.index('machine_id')
+        self._timestamp_position = self.columns.index('timestamp')
+        self._rows: Dict[str, Tuple] = {}
+        self._frame: Optional[pd.DataFrame] = None
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def update_row(self, machine_id: str, row: Tuple) -> bool:
+        """
+        Offer one reading to the table.
+
+        Args:
+            machine_id: Machine the reading belongs to
+            row: Values in ``columns`` order
+
+        Returns:
+            True when the reading became the machine's latest
+        """
+        current = self._rows.get(machine_id)
+        if current is not None and row[self._timestamp_position] < current[self._timestamp_position]:
+            return False
+        # Equal timestamps: the later arrival wins, matching file order
+        self._rows[machine_id] = row
+        self._frame = None
+        return True
+
+    def update(self, readings: pd.DataFrame) -> int:
+        """
+        Offer a batch of readings to the table.
+
+        The batch is first reduced to its newest row per machine, so the
+        per-row work is one comparison per machine in the batch.
+
+        Returns:
+            Number of machines whose latest reading changed
+        """
+        if readings.empty:
+            return 0
+        newest = readings.sort_values('timestamp', kind='stable') \
+            .drop_duplicates('machine_id', keep='last')
+        changed = 0
+        for row in newest[self.columns].itertuples(index=False, name=None):
+            changed += self.update_row(row[self._machine_position], row)
+        return changed
+
+    def to_frame(self) -> pd.DataFrame:
+        """Get the table as a DataFrame sorted by machine_id."""
+        if self._frame is None:
+            rows = [self._rows[machine_id] for machine_id in sorted(self._rows)]
+            self._frame = pd.DataFrame.from_records(rows, columns=self.columns)
+        return self._frame.copy()
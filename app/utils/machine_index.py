@@ -0,0 +1,176 @@
+"""
+Per-machine index over sensor readings.
+
+Readings are kept sorted by (machine_id, timestamp) and each machine maps to the
+contiguous row range holding its history, so history lookups are a dictionary
+lookup plus an optional binary search on the time bounds instead of a scan.
+"""
+import os
+import sys
+from bisect import bisect_right
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from storage import concat_readings
+from channels import channel_registry
+
+
+class MachineIndex:
+    """Sorted sensor frame with per-machine offset ranges."""
+
+    def __init__(self, sensor_data: pd.DataFrame, presorted: bool = False):
+        """
+        Build the index.
+
+        Args:
+            sensor_data: Sensor readings in any order
+            presorted: Whether ``sensor_data`` is already sorted by
+                (machine_id, timestamp) with a default index
+        """
+        if presorted:
+            self.data = sensor_data
+        else:
+            # lexsort over several keys is stable, so duplicates keep file order
+            self.data = sensor_data.sort_values(['machine_id', 'timestamp']).reset_index(drop=True)
+        # Stored rows replaced by the extend() that built this index
+        self.replaced = 0
+        # Dense (rows x channels) float32 readings, built on first use
+        self._matrix = None
+        # Set by extend(): the sorted new rows and the merge permutation
+        self.appended = None
+        self._merge_order = None
+        self.timestamps = self.data['timestamp'].to_numpy()
+        self.offsets: Dict[str, Tuple[int, int]] = {}
+
+        machine_ids = self.data['machine_id'].to_numpy()
+        if len(machine_ids) == 0:
+            return
+        boundaries = np.flatnonzero(machine_ids[1:] != machine_ids[:-1]) + 1
+        starts = np.concatenate(([0], boundaries))
+        ends = np.concatenate((boundaries, [len(machine_ids)]))
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            self.offsets[machine_ids[start]] = (start, end)
+
+    def extend(self, new_rows: pd.DataFrame) -> 'MachineIndex':
+        """
+        Build the index for the current readings plus ``new_rows``.
+
+        Only the new rows are sorted; each is placed into its machine's series
+        with a binary search and the two sorted sequences are merged in one
+        pass. A new row with the same (machine_id, timestamp) as a stored one
+        replaces it, so the later arrival wins.
+        """
+        if new_rows.empty:
+            return self
+        new_rows = new_rows.sort_values(['machine_id', 'timestamp']).reset_index(drop=True)
+        new_ids = new_rows['machine_id'].astype(str).to_numpy()
+        new_timestamps = new_rows['timestamp'].to_numpy()
+        machines = list(self.offsets)
+
+        # Insertion point of every new row among the stored rows
+        positions = np.empty(len(new_rows), dtype=np.int64)
+        replaced = []
+        boundaries = np.flatnonzero(new_ids[1:] != new_ids[:-1]) + 1
+        for lower, upper in zip(np.concatenate(([0], boundaries)).tolist(),
+                                np.concatenate((boundaries, [len(new_ids)])).tolist()):
+            machine_id = new_ids[lower]
+            if machine_id in self.offsets:
+                start, end = self.offsets[machine_id]
+                series = self.timestamps[start:end]
+                after = start + np.searchsorted(series, new_timestamps[lower:upper], side='right')
+                before = start + np.searchsorted(series, new_timestamps[lower:upper], side='left')
+                positions[lower:upper] = after
+                for first, last in zip(before[before < after].tolist(), after[before < after].tolist()):
+                    replaced.extend(range(first, last))
+            else:
+                following = bisect_right(machines, machine_id)
+                positions[lower:upper] = self.offsets[machines[following]][0] if following < len(machines) else len(self.data)
+
+        stored = len(self.data)
+        stored_slots = np.arange(stored) + np.searchsorted(positions, np.arange(stored), side='right')
+        new_slots = positions + np.arange(len(new_rows))
+        order = np.empty(stored + len(new_rows), dtype=np.int64)
+        order[stored_slots] = np.arange(stored)
+        order[new_slots] = stored + np.arange(len(new_rows))
+        if replaced:
+            keep = np.ones(len(order), dtype=bool)
+            keep[stored_slots[sorted(set(replaced))]] = False
+            order = order[keep]
+
+        merged = concat_readings([self.data, new_rows]).take(order).reset_index(drop=True)
+        index = MachineIndex(merged, presorted=True)
+        index.replaced = len(set(replaced))
+        index.appended = new_rows
+        index._merge_order = order
+        if self._matrix is not None:
+            index._matrix = index.merge_rows(self._matrix, channel_registry.matrix(new_rows))
+        return index
+
+    def merge_rows(self, stored: np.ndarray, appended: np.ndarray) -> np.ndarray:
+        """
+        Carry per-row arrays through the ``extend()`` that built this index.
+
+        Args:
+            stored: Values aligned with the rows of the index that was extended
+            appended: Values aligned with ``appended``
+
+        Returns:
+            The values aligned with this index's rows
+        """
+        return np.concatenate([stored, appended])[self._merge_order]
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    @property
+    def machine_ids(self) -> List[str]:
+        """Indexed machine IDs in sorted order."""
+        return list(self.offsets)
+
+    def channel_matrix(self) -> np.ndarray:
+        """
+        Get the readings as a dense ``(rows x channels)`` float32 matrix.
+
+        Columns follow ``channel_registry``; rows follow ``data``, so
+        ``row_range`` slices also apply to the matrix.
+        """
+        if self._matrix is None:
+            self._matrix = channel_registry.matrix(self.data)
+        return self._matrix
+
+    def row_range(self, machine_id: str, start=None, end=None) -> Tuple[int, int]:
+        """
+        Get the row range of a machine's readings.
+
+        Args:
+            machine_id: Machine to look up
+            start: Optional inclusive lower bound on ``timestamp``
+            end: Optional inclusive upper bound on ``timestamp``
+
+        Returns:
+            Half-open ``(first_row, last_row)`` range into ``data``
+        """
+        lower, upper = self.offsets.get(machine_id, (0, 0))
+        if upper > lower and start is not None:
+            lower += int(np.searchsorted(self.timestamps[lower:upper],
+                                         pd.Timestamp(start).to_datetime64(), side='left'))
+        if upper > lower and end is not None:
+            upper = lower + int(np.searchsorted(self.timestamps[lower:upper],
+                                                pd.Timestamp(end).to_datetime64(), side='right'))
+        return lower, max(lower, upper)
+
+    def newest_timestamps(self) -> Dict[str, pd.Timestamp]:
+        """Get every machine's newest reading time."""
+        return {machine_id: pd.Timestamp(self.timestamps[end - 1]) for machine_id, (_, end) in self.offsets.items()}
+
+    def last_rows(self) -> pd.DataFrame:
+        """Get the last reading of every machine (latest timestamp, last in file order on ties)."""
+        return self.data.iloc[[end - 1 for _, end in self.offsets.values()]]
+
+    def history(self, machine_id: str, start=None, end=None) -> pd.DataFrame:
+        """Get a machine's readings in time order as a contiguous slice."""
+        lower, upper = self.row_range(machine_id, start, end)
+        return self.data.iloc[lower:upper]
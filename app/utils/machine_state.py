@@ -0,0 +1,162 @@
+"""
+Constant-size streaming state per machine and sensor channel.
+
+Online estimators (drift detection, remaining useful life) keep a few numbers
+per (machine, channel) in ``(machines x channels)`` arrays and fold every
+reading in once. ``MachineChannelState`` owns the machine-to-row mapping,
+array growth and batch application: a batch is applied in layers, where
+layer ``k`` holds the ``k``-th reading of every machine in the batch, so each
+layer is one vectorized update over distinct machines. Estimators whose state
+has a closed form over a batch fold it in at once instead, and ones that
+forget their history seed from a bounded tail of it (``replay``).
+"""
+import os
+import sys
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from channels import ChannelRegistry, channel_registry
+
+NO_TIMESTAMP = np.iinfo(np.int64).min
+
+
+class MachineChannelState:
+    """Base class for per-machine, per-channel streaming state."""
+
+    # State array name -> initial value and dtype, one column per channel
+    FIELDS: Dict[str, tuple] = {}
+
+    def __init__(self, channels: ChannelRegistry = None):
+        self.channels = channels or channel_registry
+        self._positions: Dict[str, int] = {}
+        self._machine_ids: List[str] = []
+        self._allocate(0, 16)
+        # Readings not newer than their machine's last reading
+        self.skipped = 0
+
+    def _allocate(self, used: int, capacity: int) -> None:
+        """Grow the state arrays to ``capacity`` machines, keeping the first ``used`` rows."""
+        shapes = {name: (capacity, len(self.channels)) for name in self.FIELDS}
+        shapes['last_timestamp'] = (capacity,)
+        fields = dict(self.FIELDS, last_timestamp=(NO_TIMESTAMP, np.int64))
+        for name, (fill, dtype) in fields.items():
+            array = np.full(shapes[name], fill, dtype=dtype)
+            if used:
+                array[:used] = getattr(self, name)[:used]
+            setattr(self, name, array)
+
+    def _machine_positions(self, machine_ids: np.ndarray) -> np.ndarray:
+        """Map machine IDs to state rows, adding rows for new machines."""
+        codes, uniques = pd.factorize(machine_ids)
+        positions = np.empty(len(uniques), dtype=np.intp)
+        for code, machine_id in enumerate(uniques.astype(str)):
+            position = self._positions.get(machine_id)
+            if position is None:
+                position = len(self._machine_ids)
+                if position == len(self.last_timestamp):
+                    self._allocate(position, 2 * position)
+                self._positions[machine_id] = position
+                self._machine_ids.append(machine_id)
+            positions[code] = position
+        return positions[codes]
+
+    def update(self, readings: pd.DataFrame) -> List[Any]:
+        """
+        Fold a batch of readings into the state.
+
+        Readings may span many machines and need not be sorted; each machine's
+        readings are applied in time order, and readings not newer than the
+        machine's last reading are skipped.
+
+        Returns:
+            Whatever ``_apply`` reported
+        """
+        if readings is None or readings.empty:
+            return []
+        readings = readings.sort_values('timestamp', kind='stable')
+        machines = self._machine_positions(readings['machine_id'].to_numpy())
+        timestamps = readings['timestamp'].to_numpy().astype('datetime64[ns]').view(np.int64)
+        values = self.channels.matrix(readings, dtype=np.float64)
+        # A reading counts if it is newer than its machine's state and its
+        # previous reading in the batch (duplicate timestamps keep the first)
+        by_machine = np.argsort(machines, kind='stable')
+        sorted_machines = machines[by_machine]
+        previous = self.last_timestamp[sorted_machines]
+        same = np.zeros(len(by_machine), dtype=bool)
+        same[1:] = sorted_machines[1:] == sorted_machines[:-1]
+        previous[1:] = np.where(same[1:], np.maximum(previous[1:], timestamps[by_machine][:-1]), previous[1:])
+        newer = np.empty(len(machines), dtype=bool)
+        newer[by_machine] = timestamps[by_machine] > previous
+        if not newer.all():
+            self.skipped += int((~newer).sum())
+            machines, timestamps, values = machines[newer], timestamps[newer], values[newer]
+            if not len(machines):
+                return []
+        return self._apply(machines, timestamps, values)
+
+    def replay(self, history: pd.DataFrame) -> List[Any]:
+        """
+        Seed the state from a whole history (see ``update``).
+
+        Only each machine's last ``replay_readings`` readings are folded in
+        when the estimator sets that bound; older ones no longer move its state.
+        """
+        limit = self.replay_readings()
+        if limit and history is not None and not history.empty:
+            history = history.sort_values('timestamp', kind='stable')
+            history = history.groupby('machine_id', observed=True, sort=False).tail(limit)
+        return self.update(history)
+
+    def replay_readings(self) -> Optional[int]:
+        """Readings per machine a replayed history needs (None: all of them)."""
+        return None
+
+    def _apply(self, machines: np.ndarray, timestamps: np.ndarray, values: np.ndarray) -> List[Any]:
+        """
+        Apply time-ordered readings, each newer than its machine's previous one.
+
+        The default applies them in layers through ``_update_layer``;
+        estimators with a closed form over a whole batch override this.
+
+        Returns:
+            Whatever ``_update_layer`` reported for every layer, concatenated
+        """
+        # k-th reading of its machine in this batch
+        occurrence = pd.Series(machines).groupby(machines).cumcount().to_numpy()
+        order = np.argsort(occurrence, kind='stable')
+        results = []
+        for layer in np.split(order, np.flatnonzero(np.diff(occurrence[order])) + 1):
+            layer_machines, layer_timestamps = machines[layer], timestamps[layer]
+            previous = self.last_timestamp[layer_machines]
+            self.last_timestamp[layer_machines] = layer_timestamps
+            results.extend(self._update_layer(layer_machines, layer_timestamps, previous, values[layer]))
+        return results
+
+    def _update_layer(self, machines: np.ndarray, timestamps: np.ndarray, previous: np.ndarray,
+                      values: np.ndarray) -> List[Any]:
+        """
+        Apply one new reading to each of ``machines`` (distinct state rows).
+
+        Args:
+            machines: State rows
+            timestamps: Reading times as int64 nanoseconds
+            previous: Each machine's previous reading time (``NO_TIMESTAMP`` if none)
+            values: ``(machines x channels)`` readings, NaN where missing
+        """
+        raise NotImplementedError
+
+    def position(self, machine_id: str) -> Optional[int]:
+        """State row of a machine, or None for an unknown machine."""
+        return self._positions.get(machine_id)
+
+    def machine_ids(self) -> List[str]:
+        """Machines with state, in state-row order."""
+        return list(self._machine_ids)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the state arrays."""
+        return sum(getattr(self, name).nbytes for name in list(self.FIELDS) + ['last_timestamp'])
@@ -0,0 +1,86 @@
+"""
+Hash-indexed store of maintenance records.
+
+Records are grouped by machine_id once, with each machine's service history
+kept in service-date order, so per-machine lookups are a dictionary access.
+The next service due date of every machine's latest record is kept in a sorted
+list, so overdue and upcoming queries are a bisect instead of a full scan.
+"""
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+
+class MaintenanceStore:
+    """Per-machine maintenance history with a sorted next-service-due index."""
+
+    def __init__(self, records: pd.DataFrame):
+        """
+        Build the store.
+
+        Args:
+            records: Maintenance records with ``machine_id``, ``last_service_date``
+                and ``next_service_due`` columns
+        """
+        self.source = records
+        self.columns = list(records.columns)
+        self._history: Dict[str, pd.DataFrame] = {}
+        self._latest: Dict[str, Dict[str, Any]] = {}
+        # Sorted (next_service_due, machine_id) of every machine's latest record
+        self._due: List[Tuple[pd.Timestamp, str]] = []
+        self.extend(records)
+
+    def __len__(self) -> int:
+        return len(self._history)
+
+    def extend(self, records: pd.DataFrame) -> None:
+        """Add maintenance records; only the machines they mention are re-indexed."""
+        if records.empty:
+            return
+        for machine_id, machine_records in records.groupby('machine_id', sort=False):
+            existing = self._history.get(machine_id)
+            if existing is not None:
+                machine_records = pd.concat([existing, machine_records], ignore_index=True)
+            # Stable sort keeps file order among records serviced on the same date;
+            # records without a service date sort first so they never count as latest
+            machine_records = machine_records.sort_values('last_service_date', kind='stable',
+                                                          na_position='first').reset_index(drop=True)
+            self._history[machine_id] = machine_records
+            self._set_latest(machine_id, machine_records.iloc[-1].to_dict())
+
+    def _set_latest(self, machine_id: str, record: Dict[str, Any]) -> None:
+        previous = self._latest.get(machine_id)
+        if previous is not None and not pd.isna(previous['next_service_due']):
+            key = (previous['next_service_due'], machine_id)
+            del self._due[bisect_left(self._due, key)]
+        self._latest[machine_id] = record
+        if not pd.isna(record['next_service_due']):
+            insort(self._due, (record['next_service_due'], machine_id))
+
+    def latest(self, machine_id: str) -> Optional[Dict[str, Any]]:
+        """Get a machine's most recent maintenance record."""
+        record = self._latest.get(machine_id)
+        return dict(record) if record is not None else None
+
+    def history(self, machine_id: str) -> pd.DataFrame:
+        """Get a machine's maintenance records in service-date order."""
+        history = self._history.get(machine_id)
+        if history is None:
+            return pd.DataFrame(columns=self.columns)
+        return history.copy()
+
+    def due_before(self, when) -> List[str]:
+        """Machines whose next service is due strictly before ``when``, earliest first."""
+        upper = bisect_left(self._due, (pd.Timestamp(when), ''))
+        return [machine_id for _, machine_id in self._due[:upper]]
+
+    def due_between(self, start, end) -> List[str]:
+        """Machines whose next service is due in ``[start, end]``, earliest first."""
+        lower = bisect_left(self._due, (pd.Timestamp(start), ''))
+        upper = bisect_right(self._due, (pd.Timestamp(end), chr(0x10FFFF)))
+        return [machine_id for _, machine_id in self._due[lower:upper]]
+
+    def machine_ids(self) -> List[str]:
+        """Machines with at least one maintenance record."""
+        return list(self._history)
@@ -0,0 +1,160 @@
+"""
+Bounded LRU cache of per-machine predictions.
+
+A prediction depends only on a machine's latest reading and the scoring
+configuration, so it is cached under the reading's fingerprint
+``(machine_id, latest timestamp, scoring config version)``. A new reading or
+a configuration change produces a new key. Ingest also drops a machine's
+entries explicitly, which covers a reading replaced at the same timestamp, and
+a scoring config reload drops only the entries of the retuned profiles.
+A repeated view of an unchanged machine costs one dict lookup and a copy of
+the prediction's containers. Entries are deep-copied once when cached; a hit
+copies only the dicts and lists, which callers can mutate, and shares the
+immutable scalars in them. A caller mutating a prediction it got or cached
+never changes what later callers see.
+"""
+import copy
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.app_config import config
+
+
+def _copy_containers(value: Any) -> Any:
+    """Copy the dicts, lists and tuples of a prediction, sharing the scalars they hold."""
+    if isinstance(value, dict):
+        return {key: _copy_containers(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy_containers(item) for item in value]
+    if isinstance(value, tuple):
+        return tuple(_copy_containers(item) for item in value)
+    return value
+
+
+class PredictionCache:
+    """Thread-safe LRU mapping of reading fingerprints to predictions."""
+
+    def __init__(self, max_entries: int = None):
+        """
+        Create an empty cache.
+
+        Args:
+            max_entries: Least recently used entries beyond this are evicted
+                (default: PREDICTION_CACHE_SIZE; 0 disables caching)
+        """
+        self.max_entries = config.PREDICTION_CACHE_SIZE if max_entries is None else max_entries
+        self._entries: "OrderedDict[Tuple, Any]" = OrderedDict()
+        # Machine ID -> its keys, so ingest can drop a machine's entries without a scan
+        self._machine_keys: Dict[str, set] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def fingerprint(machine_id: str, timestamp, config_version: Hashable) -> Tuple:
+        """Key of a machine's prediction for its reading at ``timestamp``."""
+        return (str(machine_id), str(timestamp), config_version)
+
+    def get(self, key: Tuple, default: Any = None) -> Any:
+        """
+        Get a copy of a cached prediction, or ``default`` on a miss.
+
+        Predictions hold dicts, lists, tuples and immutable scalars, so copying
+        the containers is enough to keep the cached entry unchanged.
+        """
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            value = self._entries[key]
+        # Stored values are never mutated, so they can be copied outside the lock
+        return _copy_containers(value)
+
+    def put(self, key: Tuple, value: Any) -> None:
+        """Cache a copy of a prediction, evicting the least recently used entries beyond the limit."""
+        if self.max_entries <= 0:
+            return
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            self._machine_keys.setdefault(key[0], set()).add(key)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._forget(evicted)
+                self.evictions += 1
+
+    def _forget(self, key: Tuple) -> None:
+        keys = self._machine_keys.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._machine_keys[key[0]]
+
+    def invalidate(self, machine_ids: Optional[Iterable[str]] = None) -> int:
+        """
+        Drop the entries of some machines, or of every machine.
+
+        Args:
+            machine_ids: Machines whose readings changed; None drops everything
+
+        Returns:
+            Number of entries dropped
+        """
+        with self._lock:
+            if machine_ids is None:
+                dropped = len(self._entries)
+                self._entries.clear()
+                self._machine_keys.clear()
+            else:
+                dropped = 0
+                for machine_id in set(map(str, machine_ids)):
+                    for key in self._machine_keys.pop(machine_id, ()):
+                        del self._entries[key]
+                        dropped += 1
+            self.invalidations += dropped
+            return dropped
+
+    def invalidate_versions(self, versions: Iterable[Hashable]) -> int:
+        """
+        Drop the entries computed with stale scoring config versions.
+
+        Args:
+            versions: Config versions (the last key element) that are no longer current
+
+        Returns:
+            Number of entries dropped
+        """
+        versions = set(versions)
+        with self._lock:
+            stale = [key for key in self._entries if key[2] in versions]
+            for key in stale:
+                del self._entries[key]
+                self._forget(key)
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the hit / miss / eviction / invalidation counters, size and hit rate."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+            }
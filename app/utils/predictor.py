@@ -2,7 +2,8 @@
 Predictive maintenance logic and failure prediction algorithms.
 """
 import numpy as np
-from typing import Dict, Any, List
+import pandas as pd
+from typing import Dict, Any, List, Optional, Tuple, Union
 from datetime import datetime, timedelta
 
 # Import centralized logging and configuration
@@ -10,18 +11,223 @@ import os
 import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from logger_config import get_logger
+from channels import ChannelRegistry, channel_registry
+from scoring_config import CompiledScoring, ScoringConfig, scoring_for
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config.app_config import config
 logger = get_logger(__name__)
 
 
+# Per-channel risk for readings in the low / medium / high / above-high bands
+RISK_LEVELS = np.array([0.2, 0.5, 0.8, 1.0])
+# Overall risk levels, lowest first, and the overall risk each one starts at
+RISK_LEVEL_NAMES = np.array(["Low", "Medium", "High"], dtype=object)
+RISK_LEVEL_BOUNDS = np.array([0.5, 0.8])
+# Channel risk from which a channel is named in the prediction reason
+ALERT_RISK = 0.8
+
+
 class MaintenancePredictor:
     """Handles predictive maintenance calculations and failure predictions."""
     
-    def __init__(self):
-        # Use thresholds from configuration
+    def __init__(self, channels: ChannelRegistry = None, scoring: ScoringConfig = None):
+        # Channel definitions from the channel registry
+        self.channels = channels or channel_registry
+        # Compiled thresholds and weights, with per-machine-type profiles
+        self.scoring = scoring or scoring_for(self.channels)
         self.thresholds = config.RISK_THRESHOLDS
-        logger.info("MaintenancePredictor initialized with configuration thresholds")
+        logger.info(f"MaintenancePredictor initialized with {len(self.channels)} sensor channels")
+    
+    def channel_risks(self, readings: np.ndarray, profiles: np.ndarray = None,
+                      scoring: CompiledScoring = None) -> np.ndarray:
+        """
+        Score every reading of every channel at once.
+        
+        Args:
+            readings: ``(rows x channels)`` matrix in channel registry order
+            profiles: Optional scoring profile per row (default: the default profile)
+            scoring: Scoring snapshot to use (default: the current one)
+            
+        Returns:
+            ``(rows x channels)`` risk levels; missing readings score as above-high
+        """
+        scoring = scoring or self.scoring.compiled
+        thresholds = scoring.thresholds
+        if np.issubdtype(readings.dtype, np.floating) and readings.dtype != thresholds.dtype:
+            # Compare in the readings' precision: float32(2.2) is above float64 2.2,
+            # which would put a reading stored as float32 one band too high
+            thresholds = thresholds.astype(readings.dtype)
+        bands = np.empty(readings.shape, dtype=np.intp)
+        groups = [(slice(None), 0)] if profiles is None else \
+            [(profiles == profile, profile) for profile in np.unique(profiles).tolist()]
+        for rows, profile in groups:
+            for position in range(len(self.channels)):
+                # right=True: a reading equal to a threshold belongs to the lower band
+                bands[rows, position] = np.digitize(readings[rows, position], thresholds[profile, position],
+                                                    right=True)
+        return RISK_LEVELS[bands]
+    
+    def overall_risk(self, channel_risks: np.ndarray, profiles: np.ndarray = None,
+                     scoring: CompiledScoring = None) -> np.ndarray:
+        """
+        Weighted overall risk per row.
+        
+        Weights that do not sum to one (e.g. after adding a channel) are normalized.
+        """
+        scoring = scoring or self.scoring.compiled
+        overall = np.zeros(len(channel_risks))
+        if profiles is None:
+            weights = scoring.weights[0]
+            for position, weight in enumerate(weights.tolist()):
+                overall = overall + channel_risks[:, position] * weight
+            total = float(weights.sum())
+            if total > 0 and not np.isclose(total, 1.0):
+                overall = overall / total
+            return overall
+        weights = scoring.weights[profiles]
+        for position in range(weights.shape[1]):
+            overall = overall + channel_risks[:, position] * weights[:, position]
+        totals = scoring.weights.sum(axis=1)[profiles]
+        return np.divide(overall, totals, out=overall, where=(totals > 0) & ~np.isclose(totals, 1.0))
+    
+    def score_levels(self, matrix: np.ndarray, profiles: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score a ``(rows x channels)`` matrix down to risk score and level.
+        
+        Returns:
+            Tuple of (overall risk, level index into ``RISK_LEVEL_NAMES``);
+            the overall risk is unrounded
+        """
+        overall, levels, _ = self.assess(matrix, profiles)
+        return overall, levels
+    
+    def assess(self, matrix: np.ndarray, profiles: np.ndarray = None,
+               scoring: CompiledScoring = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Score a ``(rows x channels)`` matrix and flag the channels behind each reason.
+        
+        Args:
+            matrix: ``(rows x channels)`` readings in channel registry order
+            profiles: Optional scoring profile per row (see ``CompiledScoring.profiles``)
+            scoring: Scoring snapshot to use (default: the current one)
+            
+        Returns:
+            Tuple of (unrounded overall risk, level index into
+            ``RISK_LEVEL_NAMES``, ``(rows x channels)`` alert flags)
+        """
+        scoring = scoring or self.scoring.compiled
+        risks = self.channel_risks(matrix, profiles, scoring)
+        overall = self.overall_risk(risks, profiles, scoring)
+        # 0 = Low, 1 = Medium, 2 = High; bounds are inclusive like the scalar path
+        return overall, np.digitize(overall, RISK_LEVEL_BOUNDS), risks >= ALERT_RISK
+    
+    def explain(self, levels: np.ndarray, alerts: np.ndarray, profiles: np.ndarray = None,
+                scoring: CompiledScoring = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Reasons and recommendations for many scored readings.
+        
+        Each distinct alert pattern, profile and level is turned into text once.
+        
+        Args:
+            levels: Level index per row (from ``assess``)
+            alerts: Alert flags per row and channel (from ``assess``)
+            profiles: Scoring profile per row, if ``assess`` was given one
+            scoring: Scoring snapshot the rows were scored with (default: the current one)
+            
+        Returns:
+            Tuple of (reason per row, recommendation list per row) object arrays
+        """
+        scoring = scoring or self.scoring.compiled
+        alerts = alerts.reshape(len(alerts), -1)
+        profiles = np.zeros(len(alerts), dtype=np.int64) if profiles is None else profiles.astype(np.int64)
+        profile_count = len(scoring.names)
+        if alerts.shape[1] + profile_count.bit_length() < 63:
+            # One integer code per alert pattern and profile; much faster to deduplicate than rows
+            codes = alerts.astype(np.int64) @ (np.int64(1) << np.arange(alerts.shape[1], dtype=np.int64))
+            codes, inverse = np.unique(codes * profile_count + profiles, return_inverse=True)
+            patterns = ((codes // profile_count)[:, None] >> np.arange(alerts.shape[1])) & 1
+            pattern_profiles = codes % profile_count
+        else:
+            keys, inverse = np.unique(np.column_stack([alerts, profiles]), axis=0, return_inverse=True)
+            patterns, pattern_profiles = keys[:, :-1], keys[:, -1]
+        texts = np.array([
+            self._generate_reason(np.where(pattern, 1.0, 0.0), int(profile), scoring)
+            for pattern, profile in zip(patterns, pattern_profiles)
+        ], dtype=object)
+        recommendations = np.empty(len(RISK_LEVEL_NAMES), dtype=object)
+        for level, name in enumerate(RISK_LEVEL_NAMES.tolist()):
+            recommendations[level] = self._generate_recommendations(name, {})
+        return texts[inverse.reshape(-1)], recommendations[levels]
+    
+    @staticmethod
+    def round_scores(overall: np.ndarray) -> np.ndarray:
+        """
+        Round overall risks to two decimals exactly like ``round()``.
+        
+        Overall risk takes few distinct values (combinations of the channel
+        levels), so only those are rounded; ``np.round`` disagrees with
+        ``round()`` on values such as 0.335.
+        """
+        distinct, inverse = np.unique(overall, return_inverse=True)
+        return np.array([round(value, 2) for value in distinct.tolist()])[inverse.reshape(-1)]
+    
+    def score_batch(self, readings: Union[pd.DataFrame, np.ndarray], explain: bool = False) -> pd.DataFrame:
+        """
+        Score many readings at once.
+        
+        Gives the same risk score, level, days to failure and confidence as
+        ``calculate_failure_risk`` for every row, computed as whole-array
+        operations.
+        
+        Args:
+            readings: Frame with the channel columns (a missing channel reads
+                as 0, like a missing dict key), or a ``(rows x channels)``
+                matrix in channel registry order
+            explain: Also add ``reason`` and ``recommendations``
+                
+        Returns:
+            One row per reading with ``risk_score``, ``failure_risk``,
+            ``predicted_days_to_failure`` and ``confidence`` (plus
+            ``machine_id`` when the frame has one)
+        """
+        scoring = self.scoring.compiled
+        profiles = self.machine_profiles(readings, scoring)
+        if isinstance(readings, pd.DataFrame):
+            matrix = self.channels.matrix(readings, dtype=self.channels.precision(readings), missing=0.0)
+        else:
+            matrix = np.asarray(readings, dtype=np.float64).reshape(-1, len(self.channels))
+        return self.scores_frame(readings, *self.assess(matrix, profiles, scoring), explain=explain,
+                                 profiles=profiles, scoring=scoring)
+    
+    @staticmethod
+    def machine_profiles(readings: Union[pd.DataFrame, np.ndarray], scoring: CompiledScoring) -> Optional[np.ndarray]:
+        """Scoring profile per row of a frame with ``machine_id`` (None: default profile for every row)."""
+        if isinstance(readings, pd.DataFrame) and 'machine_id' in readings:
+            return scoring.profiles(readings['machine_id'])
+        return None
+    
+    def scores_frame(self, readings: Union[pd.DataFrame, np.ndarray], overall: np.ndarray, levels: np.ndarray,
+                     alerts: np.ndarray, explain: bool = False, profiles: np.ndarray = None,
+                     scoring: CompiledScoring = None) -> pd.DataFrame:
+        """Build the ``score_batch`` frame from ``assess`` results."""
+        scale = np.array([90, 30, 10])[levels]
+        floor = np.array([30, 5, 1])[levels]
+        days = np.maximum(floor, np.trunc(scale * (1 - overall)).astype(np.int64))
+        confidence = np.clip(np.trunc(overall * 100).astype(np.int64), 60, 95)
+        
+        scores = pd.DataFrame({
+            "failure_risk": RISK_LEVEL_NAMES[levels],
+            "risk_score": self.round_scores(overall),
+            "predicted_days_to_failure": days,
+            "confidence": confidence,
+        })
+        if explain:
+            scores["reason"], scores["recommendations"] = self.explain(levels, alerts, profiles, scoring)
+        if isinstance(readings, pd.DataFrame):
+            scores.index = readings.index
+            if 'machine_id' in readings:
+                scores.insert(0, 'machine_id', readings['machine_id'])
+        return scores
     
     def calculate_failure_risk(self, sensor_data: Dict[str, float]) -> Dict[str, Any]:
         """
@@ -34,26 +240,12 @@ class MaintenancePredictor:
             Dictionary with risk assessment and prediction
         """
         machine_id = sensor_data.get('machine_id', 'Unknown')
-        vibration = sensor_data.get('vibration', 0)
-        temperature = sensor_data.get('temperature', 0)
-        current = sensor_data.get('current', 0)
-        pressure = sensor_data.get('pressure', 0)
-        operating_hours = sensor_data.get('operating_hours', 0)
-        
-        # Calculate individual risk scores
-        vibration_risk = self._calculate_parameter_risk(vibration, 'vibration')
-        temperature_risk = self._calculate_parameter_risk(temperature, 'temperature')
-        current_risk = self._calculate_parameter_risk(current, 'current')
-        pressure_risk = self._calculate_parameter_risk(pressure, 'pressure')
-        
-        # Calculate overall risk score (weighted average)
-        weights = {'vibration': 0.3, 'temperature': 0.25, 'current': 0.25, 'pressure': 0.2}
-        overall_risk = (
-            vibration_risk * weights['vibration'] +
-            temperature_risk * weights['temperature'] +
-            current_risk * weights['current'] +
-            pressure_risk * weights['pressure']
-        )
+        
+        # Score every registered channel as a one-row matrix, with the machine's profile
+        scoring = self.scoring.compiled
+        profiles = scoring.profiles([machine_id])
+        risks = self.channel_risks(self.channels.row(sensor_data), profiles, scoring)
+        overall_risk = float(self.overall_risk(risks, profiles, scoring)[0])
         
         # Determine risk level
         if overall_risk >= 0.8:
@@ -67,10 +259,7 @@ class MaintenancePredictor:
             days_to_failure = max(30, int(90 * (1 - overall_risk)))
         
         # Generate reason for prediction
-        reason = self._generate_reason(
-            vibration, temperature, current, pressure,
-            vibration_risk, temperature_risk, current_risk, pressure_risk
-        )
+        reason = self._generate_reason(risks[0], 0 if profiles is None else int(profiles[0]), scoring)
         
         return {
             "machine_id": machine_id,
@@ -82,33 +271,14 @@ class MaintenancePredictor:
             "recommendations": self._generate_recommendations(risk_level, sensor_data)
         }
     
-    def _calculate_parameter_risk(self, value: float, parameter: str) -> float:
-        """Calculate risk score for a single parameter."""
-        thresholds = self.thresholds[parameter]
-        
-        if value <= thresholds['low']:
-            return 0.2
-        elif value <= thresholds['medium']:
-            return 0.5
-        elif value <= thresholds['high']:
-            return 0.8
-        else:
-            return 1.0
-    
-    def _generate_reason(self, vibration: float, temperature: float, 
-                        current: float, pressure: float,
-                        v_risk: float, t_risk: float, c_risk: float, p_risk: float) -> str:
+    def _generate_reason(self, channel_risks: np.ndarray, profile: int = 0, scoring: CompiledScoring = None) -> str:
         """Generate human-readable reason for the prediction."""
-        reasons = []
-        
-        if v_risk >= 0.8:
-            reasons.append(f"Vibration exceeded {self.thresholds['vibration']['high']} g")
-        if t_risk >= 0.8:
-            reasons.append(f"Temperature rose above {self.thresholds['temperature']['high']}°C")
-        if c_risk >= 0.8:
-            reasons.append(f"Current consumption above {self.thresholds['current']['high']} A")
-        if p_risk >= 0.8:
-            reasons.append(f"Pressure exceeded {self.thresholds['pressure']['high']} bar")
+        highs = (scoring or self.scoring.compiled).thresholds[profile, :, 2].tolist()
+        reasons = [
+            # A retuned high threshold is quoted instead of the channel's own
+            channel.alert_text(None if high == channel.thresholds[2] else high)
+            for channel, high, risk in zip(self.channels, highs, channel_risks.tolist()) if risk >= ALERT_RISK
+        ]
         
         if not reasons:
             return "All parameters within normal operating ranges"
@@ -0,0 +1,209 @@
+"""
+Fixed-capacity ring buffers holding each machine's most recent readings.
+
+Every machine gets preallocated timestamp and value arrays of twice the
+capacity, and each reading is written twice (at ``i`` and ``i + capacity``).
+The last ``n`` readings are therefore always one contiguous slice, so the
+recent-window path (live tiles, trend features, risk scoring) reads NumPy
+views without copying, filtering or allocating. Values keep float32 when
+the loader stored them that way, so the latest reading scores exactly like
+the stored history. Memory is fixed at ``machines x 2 x capacity x
+(channels x 4 or 8 + 8)`` bytes no matter how much history is on disk.
+"""
+import os
+import sys
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from downsampling import SENSOR_COLUMNS
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.app_config import config
+
+# Channels held in the recent window, in column order
+WINDOW_CHANNELS = SENSOR_COLUMNS + ['operating_hours']
+
+
+class MachineRingBuffer:
+    """Last ``capacity`` readings of one machine as contiguous arrays."""
+
+    def __init__(self, capacity: int, channel_count: int, dtype=np.float64):
+        self.capacity = capacity
+        self._timestamps = np.zeros(2 * capacity, dtype='datetime64[ns]')
+        self._values = np.full((2 * capacity, channel_count), np.nan, dtype=dtype)
+        # Next write position in [0, capacity) and number of readings held
+        self._head = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, timestamps: np.ndarray, values: np.ndarray) -> None:
+        """
+        Append readings in time order.
+
+        Args:
+            timestamps: ``datetime64[ns]`` array of length k
+            values: ``(k, channels)`` array
+        """
+        count = len(timestamps)
+        if count == 0:
+            return
+        if count > self.capacity:
+            # Only the newest readings can survive
+            timestamps = timestamps[-self.capacity:]
+            values = values[-self.capacity:]
+            count = self.capacity
+        positions = (self._head + np.arange(count)) % self.capacity
+        for offset in (0, self.capacity):
+            self._timestamps[positions + offset] = timestamps
+            self._values[positions + offset] = values
+        self._head = (self._head + count) % self.capacity
+        self._size = min(self.capacity, self._size + count)
+
+    def clear(self) -> None:
+        """Drop every reading."""
+        self._head = 0
+        self._size = 0
+
+    def window(self, count: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the last ``count`` readings as read-only views.
+
+        Returns:
+            Tuple of (timestamps, values) views, oldest first
+        """
+        count = self._size if count is None else max(0, min(count, self._size))
+        end = self._head + self.capacity
+        timestamps = self._timestamps[end - count:end]
+        values = self._values[end - count:end]
+        timestamps.flags.writeable = False
+        values.flags.writeable = False
+        return timestamps, values
+
+    @property
+    def newest(self) -> Optional[np.datetime64]:
+        """Timestamp of the newest reading held."""
+        if not self._size:
+            return None
+        return self._timestamps[self._head + self.capacity - 1]
+
+
+class RecentWindowStore:
+    """Per-machine ring buffers over the most recent readings."""
+
+    def __init__(self, capacity: int = None, channels: List[str] = None):
+        """
+        Create an empty store.
+
+        Args:
+            capacity: Readings kept per machine (default: from configuration)
+            channels: Value columns kept (default: the sensor channels and operating hours)
+        """
+        self.capacity = capacity or config.RECENT_WINDOW_SIZE
+        self.channels = list(channels or WINDOW_CHANNELS)
+        self._buffers: Dict[str, MachineRingBuffer] = {}
+
+    def _arrays(self, readings: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        timestamps = readings['timestamp'].to_numpy().astype('datetime64[ns]')
+        # float32 when every floating-point column is (integer operating hours fit exactly)
+        floating = [readings[channel].dtype for channel in self.channels
+                    if channel in readings and pd.api.types.is_float_dtype(readings[channel].dtype)]
+        dtype = np.float32 if floating and all(dtype == np.float32 for dtype in floating) else np.float64
+        values = np.column_stack([
+            readings[channel].to_numpy(dtype=dtype, na_value=np.nan) if channel in readings
+            else np.full(len(readings), np.nan, dtype=dtype)
+            for channel in self.channels
+        ])
+        return timestamps, values
+
+    def _buffer(self, machine_id: str, dtype=np.float64) -> MachineRingBuffer:
+        buffer = self._buffers.get(machine_id)
+        if buffer is None:
+            buffer = self._buffers[machine_id] = MachineRingBuffer(self.capacity, len(self.channels), dtype)
+        return buffer
+
+    def load(self, index) -> None:
+        """Fill every buffer with the tail of each machine's sorted series in a ``MachineIndex``."""
+        self._buffers = {}
+        for machine_id in index.offsets:
+            self.reload(machine_id, index)
+
+    def reload(self, machine_id: str, index) -> None:
+        """Refill one machine's buffer from a ``MachineIndex``."""
+        start, end = index.offsets[machine_id]
+        timestamps, values = self._arrays(index.data.iloc[max(start, end - self.capacity):end])
+        buffer = self._buffer(machine_id, values.dtype)
+        buffer.clear()
+        buffer.append(timestamps, values)
+
+    def update(self, new_rows: pd.DataFrame, index) -> None:
+        """
+        Add newly ingested readings.
+
+        Rows newer than a machine's buffer are appended in place; a batch with
+        late or replacing rows refills that machine from the sorted ``index``.
+        """
+        if new_rows.empty:
+            return
+        for machine_id, readings in new_rows.groupby(new_rows['machine_id'].astype(str), sort=False):
+            timestamps, values = self._arrays(readings.sort_values('timestamp', kind='stable'))
+            buffer = self._buffer(machine_id, values.dtype)
+            newest = buffer.newest
+            if newest is None or timestamps[0] > newest:
+                buffer.append(timestamps, values)
+            else:
+                self.reload(machine_id, index)
+
+    def window(self, machine_id: str, count: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get a machine's most recent readings as read-only views.
+
+        Returns:
+            Tuple of (timestamps, values); ``values`` columns follow ``channels``.
+            Both are empty for an unknown machine.
+        """
+        buffer = self._buffers.get(machine_id)
+        if buffer is None:
+            return np.empty(0, dtype='datetime64[ns]'), np.empty((0, len(self.channels)))
+        return buffer.window(count)
+
+    def machine_ids(self) -> List[str]:
+        """Machines with a buffer."""
+        return list(self._buffers)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the buffers."""
+        return sum(buffer._timestamps.nbytes + buffer._values.nbytes for buffer in self._buffers.values())
+
+
+def channel_trends(timestamps: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """
+    Least-squares slope of every channel over a window, per hour.
+
+    Missing values are skipped per channel; channels with fewer than two
+    readings get NaN.
+
+    Args:
+        timestamps: ``datetime64[ns]`` window timestamps
+        values: ``(n, channels)`` window values
+
+    Returns:
+        Slope per channel in units per hour
+    """
+    if len(timestamps) < 2:
+        return np.full(values.shape[1], np.nan)
+    hours = (timestamps - timestamps[0]).astype('timedelta64[s]').astype(np.float64)[:, None] / 3600.0
+    present = ~np.isnan(values)
+    counts = present.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_hours = np.where(present, hours, 0.0).sum(axis=0) / counts
+        mean_values = np.where(present, values, 0.0).sum(axis=0) / counts
+        centered_hours = np.where(present, hours - mean_hours, 0.0)
+        centered_values = np.where(present, values - mean_values, 0.0)
+        slopes = (centered_hours * centered_values).sum(axis=0) / (centered_hours ** 2).sum(axis=0)
+    slopes[counts < 2] = np.nan
+    return slopes
@@ -0,0 +1,227 @@
+"""
+Precomputed risk time series for every stored reading.
+
+The backfill scores the full history once, chunk by chunk, straight from the
+index's dense channel matrix, and keeps a risk score and level per row aligned
+with the ``MachineIndex``. Appended readings are scored on their own and merged
+with the same permutation as the index, so risk-over-time charts and trend
+queries never re-score the history.
+
+Every reading is scored under its machine's scoring profile, and the profile
+fingerprint it was scored with is kept per row. After a scoring config reload
+``refresh`` re-scores only the rows whose machine's profile changed.
+"""
+import os
+import sys
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from logger_config import get_logger
+from predictor import MaintenancePredictor, RISK_LEVEL_NAMES
+from scoring_config import CompiledScoring
+from downsampling import bucket_width
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.app_config import config
+logger = get_logger(__name__)
+
+
+class RiskHistory:
+    """Risk score and level of every reading of a ``MachineIndex``."""
+
+    def __init__(self, predictor: MaintenancePredictor = None, chunk_size: int = None, scorer=None,
+                 site_prefix: str = ""):
+        """
+        Create an empty risk history.
+
+        Args:
+            predictor: Scorer (default: a new MaintenancePredictor)
+            chunk_size: Rows scored per chunk (default: RISK_BACKFILL_CHUNK_SIZE)
+            scorer: Optional ``FleetScorer`` that scores large backfills on a process pool
+            site_prefix: Turns the index's machine IDs into the IDs scoring
+                profiles match (``<site>:`` for a federated site)
+        """
+        self.predictor = predictor or MaintenancePredictor()
+        self.chunk_size = chunk_size or config.RISK_BACKFILL_CHUNK_SIZE
+        self.scorer = scorer
+        self.site_prefix = site_prefix
+        self.index = None
+        self.scores = np.empty(0, dtype=np.float64)
+        self.levels = np.empty(0, dtype=np.int8)
+        # Per row: code of the profile fingerprint it was scored with
+        self.profile_codes = np.empty(0, dtype=np.int32)
+        self._fingerprints: Dict[str, int] = {}
+        # Version of the scoring snapshot the rows are current with
+        self.scoring_version = None
+
+    def score(self, matrix: np.ndarray, columns, profiles: np.ndarray = None,
+              scoring: CompiledScoring = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score a channel matrix in chunks; channels absent from ``columns`` read as 0.
+
+        Args:
+            matrix: ``(rows x channels)`` readings
+            columns: Columns present in the source readings
+            profiles: Optional scoring profile per row
+            scoring: Scoring snapshot to use (default: the current one)
+        """
+        scoring = scoring or self.predictor.scoring.compiled
+        absent = [position for position, name in enumerate(self.predictor.channels.names) if name not in columns]
+        if self.scorer is not None and self.scorer.parallel(len(matrix)):
+            # The pool shards the matrix itself; shard results land in row order
+            if absent:
+                matrix = matrix.copy()
+                matrix[:, absent] = 0.0
+            overall, levels, _ = self.scorer.assess(matrix, profiles, scoring)
+            return self.predictor.round_scores(overall), levels.astype(np.int8)
+        scores = np.empty(len(matrix), dtype=np.float64)
+        levels = np.empty(len(matrix), dtype=np.int8)
+        for start in range(0, len(matrix), self.chunk_size):
+            chunk = matrix[start:start + self.chunk_size]
+            if absent:
+                chunk = chunk.copy()
+                chunk[:, absent] = 0.0
+            chunk_profiles = None if profiles is None else profiles[start:start + len(chunk)]
+            overall, chunk_levels, _ = self.predictor.assess(chunk, chunk_profiles, scoring)
+            scores[start:start + len(chunk)] = self.predictor.round_scores(overall)
+            levels[start:start + len(chunk)] = chunk_levels
+        return scores, levels
+
+    def row_profiles(self, index, scoring: CompiledScoring) -> Optional[np.ndarray]:
+        """Scoring profile of every row of ``index`` (None: all default), one lookup per machine."""
+        machine_profiles = scoring.profiles(index.machine_ids, self.site_prefix)
+        if machine_profiles is None:
+            return None
+        return np.repeat(machine_profiles, [end - start for start, end in index.offsets.values()])
+
+    def _profile_codes(self, scoring: CompiledScoring, profiles: Optional[np.ndarray], rows: int) -> np.ndarray:
+        codes = np.array([self._fingerprints.setdefault(fingerprint, len(self._fingerprints))
+                          for fingerprint in scoring.fingerprints], dtype=np.int32)
+        return np.full(rows, codes[0], dtype=np.int32) if profiles is None else codes[profiles]
+
+    def backfill(self, index) -> None:
+        """Score every reading of ``index``."""
+        scoring = self.predictor.scoring.compiled
+        profiles = self.row_profiles(index, scoring)
+        self.scores, self.levels = self.score(index.channel_matrix(), index.data.columns, profiles, scoring)
+        self.profile_codes = self._profile_codes(scoring, profiles, len(index))
+        self.scoring_version = scoring.version
+        self.index = index
+        logger.info(f"Backfilled risk for {len(self.scores)} readings")
+
+    def extend(self, index) -> None:
+        """
+        Follow an index built by ``extend()`` from the current one.
+
+        Only the appended readings are scored (plus any rows a scoring config
+        reload made stale, see ``refresh``).
+        """
+        scoring = self.predictor.scoring.compiled
+        profiles = scoring.profiles(index.appended['machine_id'], self.site_prefix)
+        matrix = self.predictor.channels.matrix(index.appended)
+        scores, levels = self.score(matrix, index.appended.columns, profiles, scoring)
+        self.scores = index.merge_rows(self.scores, scores)
+        self.levels = index.merge_rows(self.levels, levels)
+        self.profile_codes = index.merge_rows(self.profile_codes,
+                                              self._profile_codes(scoring, profiles, len(index.appended)))
+        self.index = index
+        self.refresh()
+
+    def refresh(self) -> int:
+        """
+        Re-score the rows whose machine's scoring profile changed since they were scored.
+
+        Returns:
+            Number of rows re-scored
+        """
+        scoring = self.predictor.scoring.compiled
+        if self.index is None or scoring.version == self.scoring_version:
+            return 0
+        profiles = self.row_profiles(self.index, scoring)
+        current = self._profile_codes(scoring, profiles, len(self.index))
+        stale = np.flatnonzero(current != self.profile_codes)
+        if len(stale):
+            self.scores[stale], self.levels[stale] = self.score(
+                self.index.channel_matrix()[stale], self.index.data.columns,
+                None if profiles is None else profiles[stale], scoring
+            )
+            self.profile_codes = current
+            logger.info(f"Re-scored risk for {len(stale)} readings after a scoring config change")
+        self.scoring_version = scoring.version
+        return len(stale)
+
+    def series(self, machine_id: str, start=None, end=None, max_points: int = None) -> pd.DataFrame:
+        """
+        Get a machine's risk over time.
+
+        Args:
+            machine_id: Machine to look up
+            start: Optional inclusive lower bound on ``timestamp``
+            end: Optional inclusive upper bound on ``timestamp``
+            max_points: Optional maximum number of points (see ``downsample_risk``)
+
+        Returns:
+            ``timestamp``, ``risk_score`` and ``failure_risk`` per reading or bucket
+        """
+        lower, upper = self.index.row_range(machine_id, start, end)
+        series = pd.DataFrame({
+            'timestamp': self.index.timestamps[lower:upper],
+            'risk_score': self.scores[lower:upper],
+            'failure_risk': RISK_LEVEL_NAMES[self.levels[lower:upper]],
+        })
+        return downsample_risk(series, max_points)
+
+    def trend(self, machine_id: str, start=None, end=None) -> Optional[float]:
+        """Get the slope of a machine's risk score per day (see ``risk_trend``)."""
+        lower, upper = self.index.row_range(machine_id, start, end)
+        return risk_trend(self.index.timestamps[lower:upper], self.scores[lower:upper])
+
+
+def downsample_risk(series: pd.DataFrame, max_points: int = None) -> pd.DataFrame:
+    """
+    Bucket a time-ordered risk series down to at most ``max_points`` points.
+
+    Buckets align to the epoch, like ``downsample_history``.
+
+    Returns:
+        The series unchanged when it is short enough, otherwise the mean
+        ``risk_score``, ``risk_score_max``, the highest ``failure_risk`` and
+        the ``count`` of readings per bucket
+    """
+    width = bucket_width(series, max_points) if not series.empty else None
+    if width is None:
+        return series
+
+    timestamps = series['timestamp'].to_numpy().astype('datetime64[ns]').view('int64')
+    width_ns = width.value
+    buckets = timestamps // width_ns
+    starts = np.flatnonzero(np.concatenate(([True], buckets[1:] != buckets[:-1])))
+    counts = np.diff(np.append(starts, len(buckets)))
+    scores = series['risk_score'].to_numpy(dtype=np.float64)
+    levels = pd.Categorical(series['failure_risk'], categories=RISK_LEVEL_NAMES).codes
+    return pd.DataFrame({
+        'timestamp': pd.to_datetime(buckets[starts] * width_ns),
+        'risk_score': np.add.reduceat(scores, starts) / counts,
+        'risk_score_max': np.maximum.reduceat(scores, starts),
+        'failure_risk': RISK_LEVEL_NAMES[np.maximum.reduceat(levels, starts)],
+        'count': counts,
+    })
+
+
+def risk_trend(timestamps: np.ndarray, scores: np.ndarray) -> Optional[float]:
+    """
+    Least-squares slope of a risk series, per day.
+
+    Returns:
+        The slope, or None with fewer than two distinct timestamps
+    """
+    if len(scores) < 2:
+        return None
+    days = (timestamps - timestamps[0]) / np.timedelta64(1, 'D')
+    centered = days - days.mean()
+    denominator = (centered ** 2).sum()
+    if denominator == 0:
+        return None
+    return float((centered * (scores - scores.mean())).sum() / denominator)
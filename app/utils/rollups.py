@@ -0,0 +1,183 @@
+"""
+Pre-aggregated rollup tiers for sensor data.
+
+For every machine the store keeps per-bucket min/max/sum/count/last of each
+sensor channel at a few fixed resolutions (by default one minute, one hour and
+one day). New readings are folded into the affected buckets only, and history
+queries read the coarsest tier that evenly divides the requested resolution
+instead of scanning raw rows.
+"""
+import os
+import sys
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from logger_config import get_logger
+from downsampling import SENSOR_COLUMNS
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.app_config import config
+logger = get_logger(__name__)
+
+
+class RollupStore:
+    """Per-machine min/max/mean/count/last rollups at fixed resolutions."""
+
+    def __init__(self, tiers: List[str] = None, channels: List[str] = None):
+        """
+        Create an empty rollup store.
+
+        Args:
+            tiers: Bucket widths such as ``["1min", "1h", "1D"]`` (default: from configuration)
+            channels: Sensor channels to aggregate (default: the standard four)
+        """
+        self.tiers = sorted(pd.Timedelta(tier) for tier in (tiers or config.ROLLUP_TIERS))
+        self.channels = list(channels or SENSOR_COLUMNS)
+        # tier width -> machine_id -> stats frame indexed by bucket start
+        self._rollups: Dict[pd.Timedelta, Dict[str, pd.DataFrame]] = {tier: {} for tier in self.tiers}
+
+    def _last_columns(self, stats: pd.DataFrame) -> List[str]:
+        columns = [f'{channel}_last' for channel in self.channels] + ['operating_hours', 'last_ts']
+        return [column for column in columns if column in stats.columns]
+
+    def _aggregate_raw(self, readings: pd.DataFrame, width: pd.Timedelta) -> pd.DataFrame:
+        """Aggregate raw readings into (machine_id, bucket) stats."""
+        readings = readings.sort_values('timestamp', kind='stable')
+        channels = [channel for channel in self.channels if channel in readings.columns]
+        keys = [readings['machine_id'].astype(str).to_numpy(),
+                readings['timestamp'].dt.floor(width).to_numpy()]
+        grouped = readings[channels].groupby(keys, sort=True)
+
+        stats = pd.concat([
+            grouped.min().add_suffix('_min'),
+            grouped.max().add_suffix('_max'),
+            grouped.sum().add_suffix('_sum'),
+            grouped.count().add_suffix('_count'),
+        ], axis=1)
+        stats['count'] = grouped.size()
+
+        # Row-level last reading of each bucket, NaNs included
+        last_rows = readings.assign(machine_id=keys[0], bucket=keys[1]) \
+            .drop_duplicates(['machine_id', 'bucket'], keep='last') \
+            .set_index(['machine_id', 'bucket'])
+        last = pd.DataFrame(index=last_rows.index)
+        for channel in channels:
+            last[f'{channel}_last'] = last_rows[channel]
+        last['operating_hours'] = last_rows['operating_hours'] if 'operating_hours' in last_rows else np.nan
+        last['last_ts'] = last_rows['timestamp']
+        stats.index.names = ['machine_id', 'bucket']
+        return stats.join(last)
+
+    def _combine(self, stats: pd.DataFrame, keys: List[np.ndarray]) -> pd.DataFrame:
+        """Re-aggregate stats rows that share the same ``keys``."""
+        keys = [np.asarray(key) for key in keys]
+        grouped = stats.groupby(keys, sort=True)
+        combined = {}
+        for channel in self.channels:
+            if f'{channel}_min' not in stats.columns:
+                continue
+            combined[f'{channel}_min'] = grouped[f'{channel}_min'].min()
+            combined[f'{channel}_max'] = grouped[f'{channel}_max'].max()
+            combined[f'{channel}_sum'] = grouped[f'{channel}_sum'].sum()
+            combined[f'{channel}_count'] = grouped[f'{channel}_count'].sum()
+        combined['count'] = grouped['count'].sum()
+        result = pd.DataFrame(combined)
+
+        # The latest reading wins; on equal timestamps the later arrival does
+        key_names = [f'key_{position}' for position in range(len(keys))]
+        last = stats[self._last_columns(stats)].reset_index(drop=True)
+        for name, key in zip(key_names, keys):
+            last[name] = key
+        last = last.sort_values(key_names + ['last_ts'], kind='stable') \
+            .drop_duplicates(key_names, keep='last')
+        last.index = result.index
+        return result.join(last.drop(columns=key_names))
+
+    def update(self, readings: pd.DataFrame) -> None:
+        """Fold new raw readings into every tier."""
+        if readings.empty or not self.tiers:
+            return
+        partial = self._aggregate_raw(readings, self.tiers[0])
+        for position, tier in enumerate(self.tiers):
+            if position > 0:
+                # Coarser tiers are built from the finer partial aggregates
+                buckets = partial.index.get_level_values('bucket').floor(tier)
+                partial = self._combine(partial, [partial.index.get_level_values('machine_id'), buckets])
+                partial.index.names = ['machine_id', 'bucket']
+            tier_rollups = self._rollups[tier]
+            for machine_id, machine_stats in partial.groupby(level='machine_id', sort=False):
+                machine_stats = machine_stats.droplevel('machine_id')
+                existing = tier_rollups.get(machine_id)
+                tier_rollups[machine_id] = machine_stats if existing is None else self._merge(existing, machine_stats)
+        logger.debug(f"Folded {len(readings)} readings into {len(self.tiers)} rollup tiers")
+
+    def _merge(self, existing: pd.DataFrame, stats: pd.DataFrame) -> pd.DataFrame:
+        """
+        Fold new bucket stats into a machine's tier.
+
+        Only the buckets present in both are re-aggregated; new buckets are
+        appended. The result is a new frame, since queries read the old one
+        without the loader's lock.
+        """
+        overlap = existing.index.intersection(stats.index)
+        merged = pd.concat([existing, stats.drop(overlap)]) if len(overlap) < len(stats) else existing.copy()
+        if len(overlap):
+            both = pd.concat([existing.loc[overlap], stats.loc[overlap]])
+            combined = self._combine(both, [both.index.to_numpy()])
+            merged.loc[overlap, combined.columns] = combined
+        if not merged.index.is_monotonic_increasing:
+            # Late buckets land before the newest one
+            merged = merged.sort_index(kind='stable')
+        return merged
+
+    def tier_for(self, width: pd.Timedelta) -> Optional[pd.Timedelta]:
+        """Get the coarsest tier that evenly divides ``width``."""
+        candidates = [tier for tier in self.tiers if tier <= width and width % tier == pd.Timedelta(0)]
+        return candidates[-1] if candidates else None
+
+    def query(self, machine_id: str, width: pd.Timedelta, start=None, end=None) -> Optional[pd.DataFrame]:
+        """
+        Read a machine's history at ``width`` resolution from the rollups.
+
+        Buckets are aligned to the epoch, and ``start`` / ``end`` select whole
+        buckets of the tier used.
+
+        Returns:
+            Frame in the same layout as ``downsample_history``, or ``None`` when
+            no tier divides ``width``
+        """
+        tier = self.tier_for(width)
+        if tier is None:
+            return None
+        stats = self._rollups[tier].get(machine_id)
+        if stats is None:
+            return pd.DataFrame(columns=['timestamp', 'machine_id', 'count'])
+        if start is not None or end is not None:
+            lower = pd.Timestamp(start).floor(tier) if start is not None else None
+            upper = pd.Timestamp(end) if end is not None else None
+            stats = stats.loc[lower:upper]
+        if width != tier and not stats.empty:
+            stats = self._combine(stats, [stats.index.floor(width)])
+        return self._to_history(machine_id, stats)
+
+    def _to_history(self, machine_id: str, stats: pd.DataFrame) -> pd.DataFrame:
+        """Convert stats rows into the downsampled history layout."""
+        result = pd.DataFrame({'timestamp': stats.index.to_numpy()})
+        result['machine_id'] = machine_id
+        for channel in self.channels:
+            if f'{channel}_sum' not in stats.columns:
+                continue
+            counts = stats[f'{channel}_count'].to_numpy()
+            with np.errstate(invalid='ignore', divide='ignore'):
+                result[channel] = stats[f'{channel}_sum'].to_numpy() / counts
+            result[f'{channel}_min'] = stats[f'{channel}_min'].to_numpy()
+            result[f'{channel}_max'] = stats[f'{channel}_max'].to_numpy()
+        result['operating_hours'] = stats['operating_hours'].to_numpy()
+        result['count'] = stats['count'].to_numpy()
+        return result
+
+    def machine_ids(self) -> List[str]:
+        """Machines with at least one rollup bucket."""
+        return list(self._rollups[self.tiers[0]]) if self.tiers else []
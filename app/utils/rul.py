@@ -0,0 +1,204 @@
+"""
+Trend-based remaining useful life (RUL) per machine.
+
+Every (machine, channel) pair keeps the sufficient statistics of a weighted
+least-squares line through its readings: Σw, Σt, Σx, Σtx, Σt² and Σx².
+Older readings are forgotten exponentially (half-life RUL_HALF_LIFE_HOURS),
+so the fit follows the recent trajectory. Time is measured in hours back from
+the machine's newest reading, and the statistics are shifted to that origin
+whenever a reading arrives. That keeps the sums well conditioned, and the
+fitted intercept is the current level. Both the update and the refit are
+O(1), so the whole fleet is re-estimated on every ingest without re-reading
+history. The sums are linear in the readings, so a batch (or a whole
+replayed history) is folded in with one vectorized sum per statistic rather
+than reading by reading.
+
+The remaining life of a channel is the time until its fitted line crosses
+the channel's high threshold in the machine's scoring profile (see
+``scoring_config``). The fit is projected at query time, so a retuned profile
+applies at once. The remaining life of a machine is the shortest of its
+channels.
+"""
+import os
+import sys
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from channels import ChannelRegistry
+from machine_state import MachineChannelState, NO_TIMESTAMP
+from scoring_config import ScoringConfig, scoring_for
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.app_config import config
+
+NANOSECONDS_PER_HOUR = 3_600_000_000_000
+
+
+class RemainingLifeEstimator(MachineChannelState):
+    """Exponentially forgetting linear trend per machine and channel, projected to the high threshold."""
+
+    FIELDS = {
+        'weight': (0.0, np.float64),
+        'sum_t': (0.0, np.float64),
+        'sum_x': (0.0, np.float64),
+        'sum_tx': (0.0, np.float64),
+        'sum_tt': (0.0, np.float64),
+        'sum_xx': (0.0, np.float64),
+    }
+
+    def __init__(self, channels: ChannelRegistry = None, half_life_hours: float = None,
+                 min_readings: float = None, horizon_days: float = None, scoring: ScoringConfig = None,
+                 site_prefix: str = ""):
+        """
+        Create an estimator with no machines.
+
+        Args:
+            channels: Channels to track (default: the channel registry)
+            half_life_hours: Age at which a reading counts half (default: RUL_HALF_LIFE_HOURS)
+            min_readings: Effective (decayed) readings needed for an estimate (default: RUL_MIN_READINGS)
+            horizon_days: Crossings further out are reported as none (default: RUL_HORIZON_DAYS)
+            scoring: Scoring configuration supplying each machine's high thresholds
+                (default: the one of ``channels``)
+            site_prefix: Turns machine IDs into the IDs scoring profiles match
+                (``<site>:`` for a federated site)
+        """
+        super().__init__(channels)
+        self.scoring = scoring or scoring_for(self.channels)
+        self.half_life_hours = half_life_hours or config.RUL_HALF_LIFE_HOURS
+        self.min_readings = config.RUL_MIN_READINGS if min_readings is None else min_readings
+        self.horizon_days = horizon_days or config.RUL_HORIZON_DAYS
+        self.site_prefix = site_prefix
+
+    def _apply(self, machines: np.ndarray, timestamps: np.ndarray, values: np.ndarray) -> List[Any]:
+        # The sums are linear in the readings, so a whole batch folds in at
+        # once: shift each machine's state to its newest reading, then add
+        # every reading with weight 0.5 ** (age / half-life)
+        order = np.argsort(machines, kind='stable')
+        machines, timestamps, values = machines[order], timestamps[order], values[order]
+        starts = np.flatnonzero(np.r_[True, machines[1:] != machines[:-1]])
+        rows = machines[starts]
+        newest = np.maximum.reduceat(timestamps, starts)
+        previous = self.last_timestamp[rows]
+        self._update_layer(rows, newest, previous, np.full((len(rows), len(self.channels)), np.nan))
+        self.last_timestamp[rows] = newest
+        # Hours back from the machine's newest reading (t <= 0)
+        t = ((timestamps - np.repeat(newest, np.diff(np.r_[starts, len(machines)]))) / NANOSECONDS_PER_HOUR)[:, None]
+        valid = ~np.isnan(values)
+        weight = np.where(valid, 0.5 ** (-t / self.half_life_hours), 0.0)
+        readings = np.where(valid, values, 0.0)
+        weighted_t = weight * t
+        self.weight[rows] += np.add.reduceat(weight, starts)
+        self.sum_t[rows] += np.add.reduceat(weighted_t, starts)
+        self.sum_x[rows] += np.add.reduceat(weight * readings, starts)
+        self.sum_tx[rows] += np.add.reduceat(weighted_t * readings, starts)
+        self.sum_tt[rows] += np.add.reduceat(weighted_t * t, starts)
+        self.sum_xx[rows] += np.add.reduceat(weight * readings ** 2, starts)
+        return []
+
+    def _update_layer(self, machines: np.ndarray, timestamps: np.ndarray, previous: np.ndarray,
+                      values: np.ndarray) -> List[Any]:
+        elapsed = np.where(previous == NO_TIMESTAMP, 0, timestamps - previous) / NANOSECONDS_PER_HOUR
+        elapsed = elapsed[:, None]
+        decay = 0.5 ** (elapsed / self.half_life_hours)
+        weight = self.weight[machines]
+        sum_t = self.sum_t[machines]
+        sum_x = self.sum_x[machines]
+        # Move the origin to the new reading (t -> t - elapsed), then forget
+        self.sum_tt[machines] = decay * (self.sum_tt[machines] - 2 * elapsed * sum_t + elapsed ** 2 * weight)
+        self.sum_tx[machines] = decay * (self.sum_tx[machines] - elapsed * sum_x)
+        self.sum_t[machines] = decay * (sum_t - elapsed * weight)
+        # The new reading sits at t = 0, so it adds nothing to Σt, Σtx or Σt²
+        valid = ~np.isnan(values)
+        readings = np.where(valid, values, 0.0)
+        self.weight[machines] = decay * weight + valid
+        self.sum_x[machines] = decay * sum_x + readings
+        self.sum_xx[machines] = decay * self.sum_xx[machines] + readings ** 2
+        return []
+
+    def _fit(self, rows) -> Dict[str, np.ndarray]:
+        """Fit every channel of the given state rows at once."""
+        weight = self.weight[rows]
+        sum_t, sum_x = self.sum_t[rows], self.sum_x[rows]
+        sum_tx, sum_tt, sum_xx = self.sum_tx[rows], self.sum_tt[rows], self.sum_xx[rows]
+        # High threshold of every row's machine, from its scoring profile
+        scoring = self.scoring.compiled
+        profiles = scoring.profiles([self._machine_ids[row] for row in np.atleast_1d(rows).tolist()], self.site_prefix)
+        high = scoring.thresholds[0 if profiles is None else profiles, :, 2]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            spread = weight * sum_tt - sum_t ** 2
+            fitted = (weight >= max(self.min_readings, 2)) & (spread > 1e-9 * np.maximum(weight * sum_tt, 1e-12))
+            slope = np.where(fitted, (weight * sum_tx - sum_t * sum_x) / spread, np.nan)
+            level = np.where(fitted, (sum_x - slope * sum_t) / weight, np.nan)
+            residual = np.maximum(sum_xx - level * sum_x - slope * sum_tx, 0.0)
+            slope_error = np.sqrt(residual / np.maximum(weight - 2, 1e-9) * weight / spread)
+            hours = np.where(level >= high, 0.0, np.where(slope > 0, (high - level) / slope, np.inf))
+            confidence = np.where(slope > 0, np.clip(1.0 - slope_error / slope, 0.0, 1.0), 0.0)
+        days = hours / 24.0
+        days[~fitted | (days > self.horizon_days)] = np.nan
+        return {'level': level, 'slope_per_day': slope * 24.0, 'days': days, 'confidence': confidence}
+
+    def estimates(self, machine_ids: List[str] = None) -> pd.DataFrame:
+        """
+        Estimate the remaining life of many machines at once.
+
+        Args:
+            machine_ids: Machines to estimate (default: every machine with state)
+
+        Returns:
+            One row per known machine with ``remaining_life_days`` (NaN when no
+            channel is projected to cross its high threshold within the horizon),
+            ``limiting_channel``, ``slope_per_day`` and ``confidence`` of that channel
+        """
+        machine_ids = self.machine_ids() if machine_ids is None else \
+            [machine_id for machine_id in machine_ids if machine_id in self._positions]
+        rows = np.array([self._positions[machine_id] for machine_id in machine_ids], dtype=np.intp)
+        fit = self._fit(rows)
+        days = fit['days']
+        crossing = ~np.isnan(days).all(axis=1) if len(rows) else np.zeros(0, dtype=bool)
+        limiting = np.where(crossing, np.argmin(np.where(np.isnan(days), np.inf, days), axis=1), 0)
+        picked = np.arange(len(rows))
+        names = np.array(self.channels.names, dtype=object)
+        return pd.DataFrame({
+            'machine_id': machine_ids,
+            'remaining_life_days': np.where(crossing, days[picked, limiting], np.nan),
+            'limiting_channel': np.where(crossing, names[limiting], None),
+            'slope_per_day': np.where(crossing, fit['slope_per_day'][picked, limiting], np.nan),
+            'confidence': np.where(crossing, fit['confidence'][picked, limiting], np.nan),
+        })
+
+    def machine_estimate(self, machine_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Estimate one machine's remaining life with per-channel detail.
+
+        Returns:
+            ``remaining_life_days`` and ``limiting_channel`` (None without a
+            projected crossing) plus ``channels``: channel name -> ``level``,
+            ``slope_per_day``, ``days_to_threshold`` and ``confidence``;
+            None for an unknown machine
+        """
+        position = self.position(machine_id)
+        if position is None:
+            return None
+        fit = {name: values[0] for name, values in self._fit(np.array([position])).items()}
+        channels = {
+            name: {
+                'level': _optional(fit['level'][column]),
+                'slope_per_day': _optional(fit['slope_per_day'][column]),
+                'days_to_threshold': _optional(fit['days'][column]),
+                'confidence': float(fit['confidence'][column]),
+            }
+            for column, name in enumerate(self.channels.names)
+        }
+        summary = self.estimates([machine_id]).iloc[0]
+        return {
+            'remaining_life_days': _optional(summary['remaining_life_days']),
+            'limiting_channel': summary['limiting_channel'],
+            'channels': channels,
+        }
+
+
+def _optional(value) -> Optional[float]:
+    """A float, or None for NaN."""
+    return None if np.isnan(value) else float(value)
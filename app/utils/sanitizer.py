@@ -0,0 +1,175 @@
+"""
+Vectorized validation and sanitization of sensor readings.
+
+Readings are cleaned once when they are loaded: every numeric column is
+checked for NaN, +inf, -inf and out-of-range values in a single NumPy pass and
+handled by that column's policy, and the counts are kept as data-quality
+counters. ``to_json_records`` then emits frames as JSON-compliant records in
+bulk, replacing the per-value ``sanitize_float`` calls.
+"""
+import os
+import sys
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from channels import channel_registry
+
+# Values emitted in JSON in place of NaN / +inf / -inf
+JSON_NAN_VALUE = 0.0
+JSON_POSINF_VALUE = 999999.0
+JSON_NEGINF_VALUE = -999999.0
+
+
+class ColumnPolicy(NamedTuple):
+    """How invalid values of one column are handled at load time."""
+
+    # Replacement for NaN; None keeps it as a missing reading
+    nan: Optional[float] = None
+    # Replacements for +inf / -inf; NaN treats them as missing readings
+    posinf: float = np.nan
+    neginf: float = np.nan
+    # Values outside [lower, upper] become missing readings
+    lower: Optional[float] = None
+    upper: Optional[float] = None
+
+
+# Missing readings stay NaN so the predictor still flags them; an infinite or
+# physically impossible reading is a sensor fault and is treated as missing.
+# Registered channels without an entry here only have infinities removed.
+DEFAULT_POLICIES: Dict[str, ColumnPolicy] = {
+    **{name: ColumnPolicy() for name in channel_registry.names},
+    'vibration': ColumnPolicy(lower=0.0),
+    'temperature': ColumnPolicy(),
+    'current': ColumnPolicy(lower=0.0),
+    'pressure': ColumnPolicy(lower=0.0),
+    'operating_hours': ColumnPolicy(lower=0.0),
+}
+
+COUNTER_NAMES = ['rows', 'missing', 'posinf', 'neginf', 'out_of_range']
+
+
+class DataSanitizer:
+    """Applies per-column policies to readings and keeps data-quality counters."""
+
+    def __init__(self, policies: Dict[str, ColumnPolicy] = None):
+        """
+        Create a sanitizer.
+
+        Args:
+            policies: Column name -> policy (default: ``DEFAULT_POLICIES``)
+        """
+        self.policies = dict(DEFAULT_POLICIES if policies is None else policies)
+        self._counters = {column: dict.fromkeys(COUNTER_NAMES, 0) for column in self.policies}
+        self._lock = threading.Lock()
+
+    def sanitize(self, readings: pd.DataFrame, record: bool = True) -> pd.DataFrame:
+        """
+        Clean the policy columns of ``readings`` in place.
+
+        Args:
+            readings: Freshly loaded readings
+            record: Whether to add the findings to the counters; transient
+                reads of already-counted data pass False
+
+        Returns:
+            The same frame, for chaining
+        """
+        if readings is None or readings.empty:
+            return readings
+        counts = {}
+        for column, policy in self.policies.items():
+            if column not in readings.columns:
+                continue
+            values = readings[column].to_numpy()
+            if not np.issubdtype(values.dtype, np.number):
+                continue
+            column_counts = dict.fromkeys(COUNTER_NAMES, 0)
+            column_counts['rows'] = len(values)
+
+            invalid = np.zeros(len(values), dtype=bool)
+            if np.issubdtype(values.dtype, np.floating):
+                missing = np.isnan(values)
+                posinf = np.isposinf(values)
+                neginf = np.isneginf(values)
+                column_counts['missing'] = int(missing.sum())
+                column_counts['posinf'] = int(posinf.sum())
+                column_counts['neginf'] = int(neginf.sum())
+                invalid = missing | posinf | neginf
+            out_of_range = np.zeros(len(values), dtype=bool)
+            with np.errstate(invalid='ignore'):
+                if policy.lower is not None:
+                    out_of_range |= ~invalid & (values < policy.lower)
+                if policy.upper is not None:
+                    out_of_range |= ~invalid & (values > policy.upper)
+            column_counts['out_of_range'] = int(out_of_range.sum())
+            counts[column] = column_counts
+
+            if not (invalid.any() or out_of_range.any()):
+                continue
+            cleaned = values.astype(np.float64) if not np.issubdtype(values.dtype, np.floating) else values.copy()
+            if column_counts['posinf']:
+                cleaned[posinf] = policy.posinf
+            if column_counts['neginf']:
+                cleaned[neginf] = policy.neginf
+            cleaned[out_of_range] = np.nan
+            if policy.nan is not None:
+                cleaned[np.isnan(cleaned)] = policy.nan
+            readings[column] = cleaned
+
+        if not record:
+            return readings
+        with self._lock:
+            for column, column_counts in counts.items():
+                for name, count in column_counts.items():
+                    self._counters[column][name] += count
+        return readings
+
+    def quality_report(self) -> Dict[str, Dict[str, int]]:
+        """Get the data-quality counters accumulated since creation or the last reset."""
+        with self._lock:
+            return {column: dict(counts) for column, counts in self._counters.items()}
+
+    def reset(self) -> None:
+        """Clear the counters, e.g. before a full reload."""
+        with self._lock:
+            for counts in self._counters.values():
+                counts.update(dict.fromkeys(COUNTER_NAMES, 0))
+
+
+def _json_column(values: pd.Series) -> List[Any]:
+    """Convert one column into a list of JSON-compliant Python values."""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        timestamps = values.to_numpy().astype('datetime64[ns]')
+        if (timestamps.view('int64') % 1_000_000_000 == 0).all():
+            strings = np.datetime_as_string(timestamps.astype('datetime64[s]'), unit='s').astype(object)
+        else:
+            strings = np.array([timestamp.isoformat() if not pd.isna(timestamp) else None
+                                for timestamp in values], dtype=object)
+        strings[pd.isna(values).to_numpy()] = None
+        return strings.tolist()
+    if pd.api.types.is_bool_dtype(values):
+        return values.tolist()
+    if pd.api.types.is_numeric_dtype(values):
+        numbers = np.nan_to_num(values.to_numpy(dtype=np.float64), nan=JSON_NAN_VALUE,
+                                posinf=JSON_POSINF_VALUE, neginf=JSON_NEGINF_VALUE)
+        return numbers.tolist()
+    return values.astype(object).tolist()
+
+
+def to_json_records(frame: pd.DataFrame) -> List[Dict[str, Any]]:
+    """
+    Convert a frame into JSON-compliant records, one column at a time.
+
+    Numeric columns become floats with NaN / +inf / -inf replaced as by
+    ``MachinesService.sanitize_float``; timestamps become ISO strings.
+
+    Returns:
+        One dict per row, like ``frame.to_dict('records')``
+    """
+    columns = list(frame.columns)
+    values = [_json_column(frame[column]) for column in columns]
+    return [dict(zip(columns, row)) for row in zip(*values)]
@@ -0,0 +1,297 @@
+"""
+Versioned, hot-reloadable scoring configuration.
+
+The channel registry provides the default risk thresholds and weights.
+``SCORING_CONFIG_FILE`` (JSON) can override them and can define machine types
+with their own overrides::
+
+    {
+        "channels": {"vibration": {"thresholds": {"high": 2.2}, "weight": 0.35}},
+        "machine_types": {
+            "heavy_duty": {
+                "machines": ["CNC_3", "HD_*"],
+                "channels": {"temperature": {"thresholds": {"medium": 85, "high": 95}}}
+            }
+        }
+    }
+
+Each profile (``default`` plus one per machine type) is compiled into rows of
+a ``(profiles x channels x 3)`` threshold array and a ``(profiles x channels)``
+weight array, so a batch mixing machine types is scored with array lookups.
+Machines are matched by ID or glob pattern, as the loader reports them (with
+several sites, ``<site>:<machine_id>``).
+
+Reloading the file (by hand or through a file watcher) swaps in a new
+immutable ``CompiledScoring`` snapshot. Every profile keeps its own version,
+which changes only when that profile's thresholds or weights change, so
+results keyed on ``machine_version()`` go stale only for the machine types
+that were actually retuned.
+"""
+import fnmatch
+import hashlib
+import json
+import os
+import sys
+import threading
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from logger_config import get_logger
+from channels import ChannelRegistry, channel_registry
+from file_watcher import DataFileWatcher
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.app_config import config
+logger = get_logger(__name__)
+
+DEFAULT_PROFILE = 'default'
+THRESHOLD_BANDS = ('low', 'medium', 'high')
+
+# (profile name, profile version) of the configuration a result was computed with
+ProfileVersion = Tuple[str, int]
+
+
+class CompiledScoring(NamedTuple):
+    """Immutable snapshot of the scoring configuration as arrays."""
+
+    version: int
+    # Profile names, ``default`` first, and the version of each profile
+    names: Tuple[str, ...]
+    versions: Tuple[int, ...]
+    # Digest of each profile's thresholds and weights; unlike the versions it
+    # is stable across restarts, so stored scores can record what scored them
+    fingerprints: Tuple[str, ...]
+    # (profiles x channels x 3) low / medium / high thresholds
+    thresholds: np.ndarray
+    # (profiles x channels) channel weights
+    weights: np.ndarray
+    # Machine ID -> profile, then (glob pattern, profile) in file order
+    machines: Dict[str, int]
+    patterns: Tuple[Tuple[str, int], ...]
+
+    def profile_of(self, machine_id: str) -> int:
+        """Get the profile of a machine (0 for the default profile)."""
+        machine_id = str(machine_id)
+        profile = self.machines.get(machine_id)
+        if profile is not None:
+            return profile
+        for pattern, profile in self.patterns:
+            if fnmatch.fnmatchcase(machine_id, pattern):
+                return profile
+        return 0
+
+    def profiles(self, machine_ids: Iterable[str], prefix: str = "") -> Optional[np.ndarray]:
+        """
+        Get the profile of many machines at once.
+
+        Args:
+            machine_ids: Machines to look up
+            prefix: Prepended to every ID before matching, such as a site's
+                ``<site>:`` for the site-local IDs of a federated site
+
+        Returns:
+            Profile per machine, or None when there is only the default profile
+        """
+        if len(self.names) == 1:
+            return None
+        codes, distinct = pd.factorize(pd.Series(machine_ids).astype(str))
+        return np.array([self.profile_of(prefix + machine_id) for machine_id in distinct], dtype=np.intp)[codes]
+
+    def machine_version(self, machine_id: str) -> ProfileVersion:
+        """Get the (profile name, profile version) a machine is scored with."""
+        profile = self.profile_of(machine_id)
+        return self.names[profile], self.versions[profile]
+
+    def row_fingerprints(self, profiles: Optional[np.ndarray], rows: int) -> np.ndarray:
+        """Profile fingerprint per row (object array) for the output of ``profiles``."""
+        fingerprints = np.array(self.fingerprints, dtype=object)
+        return np.full(rows, fingerprints[0], dtype=object) if profiles is None else fingerprints[profiles]
+
+
+def _apply_overrides(channels: ChannelRegistry, thresholds: np.ndarray, weights: np.ndarray,
+                     overrides: Dict, source: str) -> None:
+    """Apply ``{channel: {"thresholds": {...}, "weight": w}}`` to one profile's rows in place."""
+    for name, override in (overrides or {}).items():
+        if name not in channels:
+            raise ValueError(f"{source}: unknown sensor channel {name!r}")
+        position = channels.index[name]
+        for band, value in (override.get('thresholds') or {}).items():
+            if band not in THRESHOLD_BANDS:
+                raise ValueError(f"{source}: unknown threshold {band!r} for {name!r}")
+            thresholds[position, THRESHOLD_BANDS.index(band)] = float(value)
+        if 'weight' in override:
+            weights[position] = float(override['weight'])
+        if not np.all(np.isfinite(thresholds[position])) or np.any(np.diff(thresholds[position]) < 0):
+            raise ValueError(f"{source}: thresholds of {name!r} must be finite and ascending")
+        if not np.isfinite(weights[position]) or weights[position] < 0:
+            raise ValueError(f"{source}: weight of {name!r} must be a non-negative number")
+
+
+def compile_scoring(channels: ChannelRegistry, definition: Dict, previous: CompiledScoring = None,
+                    registry_changed: bool = False) -> CompiledScoring:
+    """
+    Compile a scoring configuration over the channel defaults.
+
+    Args:
+        channels: Channels supplying the default thresholds and weights
+        definition: Parsed configuration file (see the module docstring)
+        previous: Snapshot being replaced; unchanged profiles keep its versions
+        registry_changed: The channels changed since ``previous``, so every
+            profile gets a new version
+
+    Returns:
+        The compiled snapshot
+    """
+    types = definition.get('machine_types') or {}
+    if DEFAULT_PROFILE in types:
+        raise ValueError(f"Machine type name {DEFAULT_PROFILE!r} is reserved")
+    names = (DEFAULT_PROFILE,) + tuple(types)
+    thresholds = np.repeat(channels.thresholds[None, :, :], len(names), axis=0)
+    weights = np.repeat(channels.weights[None, :], len(names), axis=0)
+    _apply_overrides(channels, thresholds[0], weights[0], definition.get('channels'), 'scoring config')
+    thresholds[1:] = thresholds[0]
+    weights[1:] = weights[0]
+
+    machines: Dict[str, int] = {}
+    patterns: List[Tuple[str, int]] = []
+    for profile, (name, machine_type) in enumerate(types.items(), start=1):
+        _apply_overrides(channels, thresholds[profile], weights[profile], machine_type.get('channels'),
+                         f"machine type {name!r}")
+        for machine in machine_type.get('machines') or []:
+            machine = str(machine)
+            if any(character in machine for character in '*?['):
+                patterns.append((machine, profile))
+            elif machines.setdefault(machine, profile) != profile:
+                raise ValueError(f"Machine {machine!r} is listed under several machine types")
+
+    version = 0 if previous is None else previous.version + 1
+    versions = []
+    for profile, name in enumerate(names):
+        old = previous.names.index(name) if previous is not None and name in previous.names else None
+        unchanged = (
+            old is not None and not registry_changed
+            and previous.thresholds.shape[1:] == thresholds.shape[1:]
+            and np.array_equal(previous.thresholds[old], thresholds[profile])
+            and np.array_equal(previous.weights[old], weights[profile])
+        )
+        versions.append(previous.versions[old] if unchanged else version)
+    fingerprints = tuple(
+        hashlib.sha1(thresholds[profile].tobytes() + weights[profile].tobytes()).hexdigest()[:16]
+        for profile in range(len(names))
+    )
+    thresholds.setflags(write=False)
+    weights.setflags(write=False)
+    return CompiledScoring(version, names, tuple(versions), fingerprints, thresholds, weights, machines,
+                           tuple(patterns))
+
+
+class ScoringConfig:
+    """Current scoring configuration; reloadable at runtime."""
+
+    def __init__(self, channels: ChannelRegistry = None, path: str = None):
+        """
+        Load and compile the configuration.
+
+        Args:
+            channels: Channels supplying the defaults (default: the channel registry)
+            path: JSON configuration file (default: SCORING_CONFIG_FILE; empty
+                uses the channel defaults only)
+        """
+        self.channels = channels or channel_registry
+        self.path = config.SCORING_CONFIG_FILE if path is None else path
+        self._lock = threading.Lock()
+        # Called with the (profile, version) pairs that went stale
+        self._listeners: List[Callable[[Set[ProfileVersion]], None]] = []
+        self.watcher: Optional[DataFileWatcher] = None
+        self._definition = self._read()
+        self._channels_version = self.channels.version
+        self._compiled = compile_scoring(self.channels, self._definition)
+
+    def _read(self) -> Dict:
+        if not self.path:
+            return {}
+        with open(self.path, 'r', encoding='utf-8') as handle:
+            return json.load(handle)
+
+    @property
+    def compiled(self) -> CompiledScoring:
+        """The current snapshot, recompiled first if the channel registry changed."""
+        if self.channels.version != self._channels_version:
+            self._swap(self._definition, registry_changed=True)
+        return self._compiled
+
+    @property
+    def version(self) -> int:
+        """Incremented whenever the compiled configuration changes."""
+        return self.compiled.version
+
+    def machine_version(self, machine_id: str) -> ProfileVersion:
+        """Get the (profile name, profile version) a machine is currently scored with."""
+        return self.compiled.machine_version(machine_id)
+
+    def add_listener(self, listener: Callable[[Set[ProfileVersion]], None]) -> None:
+        """Register a callback receiving the (profile, version) pairs made stale by a reload."""
+        with self._lock:
+            if listener not in self._listeners:
+                self._listeners.append(listener)
+
+    def reload(self) -> Set[ProfileVersion]:
+        """
+        Re-read and recompile the configuration file.
+
+        An invalid file raises and leaves the current configuration in place.
+
+        Returns:
+            The (profile, version) pairs that are no longer current
+        """
+        return self._swap(self._read())
+
+    def _swap(self, definition: Dict, registry_changed: bool = False) -> Set[ProfileVersion]:
+        with self._lock:
+            previous = self._compiled
+            channels_version = self.channels.version
+            compiled = compile_scoring(self.channels, definition, previous,
+                                       registry_changed or channels_version != self._channels_version)
+            stale = set(zip(previous.names, previous.versions)) - set(zip(compiled.names, compiled.versions))
+            unchanged = not stale and (compiled.names, compiled.machines, compiled.patterns) == \
+                (previous.names, previous.machines, previous.patterns)
+            self._definition = definition
+            self._channels_version = channels_version
+            if unchanged:
+                return stale
+            self._compiled = compiled
+            listeners = list(self._listeners)
+        logger.info(f"Scoring config version {compiled.version}: {len(compiled.names) - 1} machine types, "
+                    f"retuned {sorted(name for name, _ in stale) or 'none'}")
+        for listener in listeners:
+            try:
+                listener(stale)
+            except Exception as e:
+                logger.error(f"Scoring config listener failed: {str(e)}")
+        return stale
+
+    def watch(self) -> bool:
+        """
+        Reload whenever the configuration file changes (see DATA_WATCH_MODE).
+
+        Returns:
+            Whether the file is being watched
+        """
+        with self._lock:
+            if self.watcher is None and self.path:
+                watcher = DataFileWatcher([self.path])
+                watcher.add_listener(lambda paths: self.reload())
+                if watcher.start():
+                    self.watcher = watcher
+            return self.watcher is not None
+
+
+# Process-wide scoring configuration over the channel registry
+scoring_config = ScoringConfig()
+
+
+def scoring_for(channels: ChannelRegistry) -> ScoringConfig:
+    """Get the shared scoring configuration of the channel registry, or defaults-only for other channels."""
+    return scoring_config if channels is scoring_config.channels else ScoringConfig(channels, path="")
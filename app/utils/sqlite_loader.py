@@ -0,0 +1,617 @@
+"""
+SQLite-backed implementation of the DataLoader interface.
+
+Sensor readings and maintenance records live in an embedded SQLite database
+(WAL mode) indexed on (machine_id, timestamp) and next_service_due, so queries
+read only the rows they need instead of holding full frames in every process.
+
+The ``ingest_state`` table fingerprints what the rows were ingested from:
+the sensor channels, the maintenance file and the sensor file (a checksum of
+its head plus the ingested byte offset when it can be tailed, else its size
+and modification time). An existing database is reopened by tailing rows
+appended to the sensor file since, or re-ingested when any source changed.
+"""
+import sqlite3
+import threading
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Any, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Import centralized logging and configuration
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from logger_config import get_logger
+from data_loader import DataLoader
+from downsampling import downsample_history
+from ring_buffer import RecentWindowStore
+from channels import channel_registry
+from predictor import RISK_LEVEL_NAMES
+from risk_history import RiskHistory, downsample_risk, risk_trend
+from scoring_config import scoring_config
+from anomaly import StreamingAnomalyDetector
+from rul import RemainingLifeEstimator
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.app_config import config
+logger = get_logger(__name__)
+
+SENSOR_COLUMNS = ['machine_id', 'timestamp'] + channel_registry.names + ['operating_hours']
+# Precomputed risk of every reading, written at insert time, and the
+# fingerprint of the scoring profile that produced it
+RISK_COLUMNS = {'risk_score': 'REAL', 'failure_risk': 'TEXT', 'risk_profile': 'TEXT'}
+MAINTENANCE_COLUMNS = ['machine_id', 'last_service_date', 'service_notes',
+                       'next_service_due', 'service_cost']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sensor_readings (
+    timestamp TEXT NOT NULL,
+    machine_id TEXT NOT NULL,
+    operating_hours NUMERIC
+);
+CREATE INDEX IF NOT EXISTS idx_sensor_machine_time ON sensor_readings (machine_id, timestamp);
+
+CREATE TABLE IF NOT EXISTS maintenance_records (
+    machine_id TEXT NOT NULL,
+    last_service_date TEXT,
+    service_notes TEXT,
+    next_service_due TEXT,
+    service_cost NUMERIC
+);
+CREATE INDEX IF NOT EXISTS idx_maintenance_machine_date ON maintenance_records (machine_id, last_service_date);
+CREATE INDEX IF NOT EXISTS idx_maintenance_next_due ON maintenance_records (next_service_due);
+
+CREATE TABLE IF NOT EXISTS ingest_state (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+# Most recent record of every machine; rowid breaks service-date ties in insert order
+LATEST_MAINTENANCE = """
+SELECT {columns} FROM maintenance_records AS records
+WHERE records.rowid = (
+    SELECT latest.rowid FROM maintenance_records AS latest
+    WHERE latest.machine_id = records.machine_id
+    ORDER BY latest.last_service_date DESC, latest.rowid DESC LIMIT 1
+)
+"""
+
+# Leading bytes of a tailed sensor file whose checksum tells appends from a rewrite
+SOURCE_HEAD_BYTES = 64 * 1024
+
+
+def _to_text(value) -> Optional[str]:
+    """
+    Format a timestamp as sortable ISO text for storage.
+
+    Fractional seconds are kept (``2024-01-01 08:00:00.250000``), so readings
+    within the same second stay distinct; whole seconds are written without a
+    fraction, as before. Text order still follows time order.
+    """
+    if value is None or pd.isna(value):
+        return None
+    return pd.Timestamp(value).isoformat(sep=' ')
+
+
+def _column_list(names: List[str]) -> str:
+    """Quote column names, which come from the channel registry, for a SQL column list."""
+    return ', '.join('"{}"'.format(name.replace('"', '""')) for name in names)
+
+
+def _score_readings(readings: pd.DataFrame, site_prefix: str = "") -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Score readings under their machines' scoring profiles.
+
+    Args:
+        readings: Readings to score
+        site_prefix: Turns their machine IDs into the IDs scoring profiles match
+
+    Returns:
+        Tuple of (risk score, risk level name, profile fingerprint) per row
+    """
+    risk_history = RiskHistory()
+    scoring = risk_history.predictor.scoring.compiled
+    profiles = scoring.profiles(readings['machine_id'], site_prefix)
+    scores, levels = risk_history.score(channel_registry.matrix(readings), readings.columns, profiles, scoring)
+    return scores, RISK_LEVEL_NAMES[levels], scoring.row_fingerprints(profiles, len(readings))
+
+
+def _file_fingerprint(path: str) -> Tuple[int, int]:
+    """Total size and newest modification time (ns) of a file, or of the files under a directory."""
+    if os.path.isdir(path):
+        paths = [os.path.join(root, name) for root, _, names in os.walk(path) for name in names]
+    else:
+        paths = [path] if os.path.exists(path) else []
+    stats = [os.stat(file_path) for file_path in paths]
+    return sum(stat.st_size for stat in stats), max((stat.st_mtime_ns for stat in stats), default=0)
+
+
+def _head_checksum(path: str, length: int) -> int:
+    """CRC-32 of the first ``length`` bytes of a file."""
+    with open(path, 'rb') as handle:
+        return zlib.crc32(handle.read(length))
+
+
+def _to_sql_value(value):
+    """Convert pandas/NumPy scalars into values sqlite3 can bind."""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if hasattr(value, 'item'):
+        return value.item()
+    return value
+
+
+class SQLiteDataLoader(DataLoader):
+    """DataLoader that answers queries from an indexed SQLite database."""
+
+    def __init__(self, data_dir: str = None, db_path: str = None, site: str = None, federated: bool = False):
+        """
+        Open the SQLite database, populating it on first use and bringing it
+        up to date with the source files on later ones.
+
+        Args:
+            data_dir: Directory holding the source data files
+            db_path: Database file (default: SQLITE_DB_PATH for a single site,
+                else SQLITE_DB_FILE inside ``data_dir``)
+            site: Site the data directory belongs to
+            federated: The site is part of a federated fleet (see ``DataLoader``)
+        """
+        super().__init__(data_dir, site=site, federated=federated)
+        shared_path = config.SQLITE_DB_PATH if len(config.get_data_sites()) == 1 else ""
+        self.db_path = db_path or shared_path or os.path.join(self.data_dir, config.SQLITE_DB_FILE)
+        self._write_lock = threading.Lock()
+        # Machine ID -> profile fingerprint all its stored risk was last checked against
+        self._risk_profiles: Dict[str, str] = {}
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+            self._add_channel_columns(connection)
+            populated = connection.execute("SELECT EXISTS (SELECT 1 FROM sensor_readings)").fetchone()[0]
+            stored = dict(connection.execute("SELECT name, value FROM ingest_state").fetchall())
+        stale = self._stale_sources(stored) if populated else "it is empty"
+        if stale:
+            logger.info(f"Ingesting the data files into {self.db_path}: {stale}")
+            self.ingest_files()
+        else:
+            self.refresh_sensor_data()
+            self.backfill_risk()
+        logger.info(f"SQLiteDataLoader initialized with database: {self.db_path}")
+
+    @staticmethod
+    def _add_channel_columns(connection) -> None:
+        """Add a column for every registered sensor channel and risk field the table lacks."""
+        existing = {row[1] for row in connection.execute("PRAGMA table_info(sensor_readings)")}
+        columns = dict.fromkeys(channel_registry.names, 'REAL')
+        columns.update(RISK_COLUMNS)
+        for name, column_type in columns.items():
+            if name not in existing:
+                connection.execute(f'ALTER TABLE sensor_readings ADD COLUMN {_column_list([name])} {column_type}')
+
+    @contextmanager
+    def _connect(self):
+        """Open a short-lived connection; commits on success."""
+        connection = sqlite3.connect(self.db_path, timeout=config.REQUEST_TIMEOUT)
+        try:
+            yield connection
+            connection.commit()
+        finally:
+            connection.close()
+
+    def _query(self, sql: str, params=(), parse_dates: List[str] = None) -> pd.DataFrame:
+        """Run a query and return the rows as a DataFrame."""
+        with self._connect() as connection:
+            frame = pd.read_sql_query(sql, connection, params=params)
+        for column in parse_dates or []:
+            frame[column] = pd.to_datetime(frame[column], format='ISO8601')
+        return frame
+
+    def _get_sensor_offset(self) -> int:
+        """Get the byte offset of the first sensor row not yet ingested."""
+        with self._connect() as connection:
+            row = connection.execute("SELECT value FROM ingest_state WHERE name = 'sensor_offset'").fetchone()
+        return row[0] if row else 0
+
+    @staticmethod
+    def _set_sensor_offset(connection, offset: int) -> None:
+        connection.execute("INSERT OR REPLACE INTO ingest_state (name, value) VALUES ('sensor_offset', ?)", (offset,))
+
+    def _source_fingerprint(self, head_bytes: int) -> Dict[str, int]:
+        """
+        Fingerprint the channels and source files an ingest reads.
+
+        Args:
+            head_bytes: Leading bytes of a tailed sensor file to checksum
+        """
+        fingerprint = {'channels': zlib.crc32('\n'.join(channel_registry.names).encode())}
+        fingerprint['maintenance_size'], fingerprint['maintenance_mtime'] = _file_fingerprint(self.maintenance_path)
+        if self.storage.supports_tail:
+            # Appends leave the head alone, so tailing can pick them up
+            fingerprint['sensor_head_bytes'] = head_bytes
+            fingerprint['sensor_head'] = _head_checksum(self.storage.path, head_bytes)
+        else:
+            fingerprint['sensor_size'], fingerprint['sensor_mtime'] = _file_fingerprint(self.storage.path)
+        return fingerprint
+
+    def _stale_sources(self, stored: Dict[str, int]) -> Optional[str]:
+        """
+        Check the stored ingest fingerprint against the channels and source files.
+
+        Returns:
+            Why the database must be re-ingested, or None when appended sensor
+            rows (if any) can be tailed
+        """
+        if 'channels' not in stored:
+            return "it has no source fingerprint"
+        if self.storage.supports_tail and os.path.getsize(self.storage.path) < stored.get('sensor_offset', 0):
+            return "the sensor file shrank"
+        current = self._source_fingerprint(stored.get('sensor_head_bytes', 0))
+        if current['channels'] != stored['channels']:
+            return "the sensor channels changed"
+        changed = sorted(name.split('_', 1)[0] for name, value in current.items()
+                         if name != 'channels' and stored.get(name) != value)
+        return f"the {changed[0]} file changed" if changed else None
+
+    def _insert_sensor_rows(self, connection, sensor_data: pd.DataFrame) -> None:
+        rows = sensor_data.reindex(columns=SENSOR_COLUMNS)
+        rows['risk_score'], rows['failure_risk'], rows['risk_profile'] = _score_readings(sensor_data, self.site_prefix)
+        columns = SENSOR_COLUMNS + list(RISK_COLUMNS)
+        connection.executemany(
+            f"INSERT INTO sensor_readings ({_column_list(columns)}) "
+            f"VALUES ({', '.join('?' for _ in columns)})",
+            ((_to_sql_value(row[0]), _to_text(row[1])) + tuple(_to_sql_value(value) for value in row[2:])
+             for row in rows.itertuples(index=False, name=None))
+        )
+
+    def backfill_risk(self) -> int:
+        """
+        Score stored readings that have no risk yet (e.g. a database created
+        before risk was stored), chunk by chunk.
+
+        Returns:
+            Number of readings scored
+        """
+        scored = self._rescore("risk_score IS NULL")
+        if scored:
+            logger.info(f"Backfilled risk for {scored} stored readings")
+        return scored
+
+    def _rescore(self, condition: str, params: tuple = ()) -> int:
+        """Score the stored readings matching ``condition`` again, chunk by chunk."""
+        channels = channel_registry.names
+        chunk_size = config.RISK_BACKFILL_CHUNK_SIZE
+        scored = 0
+        with self._write_lock, self._connect() as connection:
+            while True:
+                chunk = pd.read_sql_query(
+                    f"SELECT rowid, machine_id, {_column_list(channels)} FROM sensor_readings WHERE {condition} LIMIT ?",
+                    connection, params=params + (chunk_size,)
+                )
+                if chunk.empty:
+                    break
+                scores, levels, fingerprints = _score_readings(chunk, self.site_prefix)
+                connection.executemany(
+                    "UPDATE sensor_readings SET risk_score = ?, failure_risk = ?, risk_profile = ? WHERE rowid = ?",
+                    zip(scores.tolist(), levels.tolist(), fingerprints.tolist(), chunk['rowid'].tolist())
+                )
+                scored += len(chunk)
+        return scored
+
+    def _refresh_machine_risk(self, machine_id: str) -> int:
+        """
+        Re-score a machine's stored risk if its scoring profile changed since it was scored.
+
+        Returns:
+            Number of readings re-scored
+        """
+        scoring = scoring_config.compiled
+        fingerprint = scoring.fingerprints[scoring.profile_of(self.site_prefix + machine_id)]
+        if self._risk_profiles.get(machine_id) == fingerprint:
+            return 0
+        scored = self._rescore("machine_id = ? AND risk_profile IS NOT ?", (_to_sql_value(machine_id), fingerprint))
+        self._risk_profiles[machine_id] = fingerprint
+        if scored:
+            logger.info(f"Re-scored risk for {scored} readings of {machine_id} after a scoring config change")
+        return scored
+
+    @staticmethod
+    def _insert_maintenance_rows(connection, maintenance_data: pd.DataFrame) -> None:
+        rows = (
+            (_to_sql_value(machine_id), _to_text(last_service), _to_sql_value(notes),
+             _to_text(next_due), _to_sql_value(cost))
+            for machine_id, last_service, notes, next_due, cost
+            in maintenance_data[MAINTENANCE_COLUMNS].itertuples(index=False, name=None)
+        )
+        connection.executemany(
+            f"INSERT INTO maintenance_records ({', '.join(MAINTENANCE_COLUMNS)}) VALUES (?, ?, ?, ?, ?)", rows
+        )
+
+    def ingest_files(self) -> None:
+        """Replace the database contents with the sensor and maintenance files in one transaction."""
+        offset = 0
+        if self.storage.supports_tail:
+            offset = self.storage.complete_offset(initial=True)
+            sensor_data = self.storage.read_until(offset)
+        else:
+            sensor_data = self.storage.read()
+        self.sanitizer.reset()
+        self.ingestor.reset()
+        sensor_data = self.ingestor.deduplicate(self.sanitizer.sanitize(sensor_data))
+        maintenance_data = DataLoader.load_maintenance_data(self)
+        self.maintenance_data = None
+        with self._write_lock, self._connect() as connection:
+            self._anomalies = None
+            self._remaining_life = None
+            connection.execute("DELETE FROM sensor_readings")
+            connection.execute("DELETE FROM maintenance_records")
+            self._insert_sensor_rows(connection, sensor_data)
+            self._insert_maintenance_rows(connection, maintenance_data)
+            self._set_sensor_offset(connection, offset)
+            connection.executemany("INSERT OR REPLACE INTO ingest_state (name, value) VALUES (?, ?)",
+                                   self._source_fingerprint(min(offset, SOURCE_HEAD_BYTES)).items())
+        self._notify_ingest(None)
+        logger.info(f"Ingested {len(sensor_data)} sensor and {len(maintenance_data)} maintenance records into SQLite")
+
+    def refresh_sensor_data(self) -> int:
+        """
+        Insert sensor rows appended to the source file since the last ingest.
+
+        Returns:
+            Number of newly ingested rows
+        """
+        if not self.storage.supports_tail:
+            return 0
+        new_rows, offset = self.storage.read_appended(self._get_sensor_offset())
+        if new_rows is None:
+            self.ingest_files()
+            with self._connect() as connection:
+                return connection.execute("SELECT COUNT(*) FROM sensor_readings").fetchone()[0]
+        new_rows = self._ingest_sensor_rows(new_rows, offset)
+        if not new_rows.empty:
+            logger.info(f"Ingested {len(new_rows)} appended sensor records into SQLite")
+        return len(new_rows)
+
+    def _newest_timestamps(self) -> Dict[str, pd.Timestamp]:
+        """Get every machine's newest stored reading time (one index seek per machine)."""
+        newest = self._query("SELECT machine_id, MAX(timestamp) AS timestamp FROM sensor_readings GROUP BY machine_id",
+                             parse_dates=['timestamp'])
+        return dict(zip(newest['machine_id'], newest['timestamp']))
+
+    def _ingest_sensor_rows(self, sensor_data: pd.DataFrame, offset: int = None) -> pd.DataFrame:
+        """
+        Sanitize, deduplicate and insert readings; a stored row with the same
+        (machine_id, timestamp) is replaced by the later arrival.
+
+        Returns:
+            The rows that were admitted
+        """
+        rows = self.sanitizer.sanitize(sensor_data)
+        with self._write_lock:
+            rows = self.ingestor.admit(rows, self._newest_timestamps())
+            with self._connect() as connection:
+                keys = [(_to_sql_value(machine_id), _to_text(timestamp))
+                        for machine_id, timestamp in rows[['machine_id', 'timestamp']].itertuples(index=False, name=None)]
+                before = connection.total_changes
+                connection.executemany("DELETE FROM sensor_readings WHERE machine_id = ? AND timestamp = ?", keys)
+                self.ingestor.record_replaced(connection.total_changes - before)
+                self._insert_sensor_rows(connection, rows)
+                if offset is not None:
+                    self._set_sensor_offset(connection, offset)
+            for state in (self._anomalies, self._remaining_life):
+                if state is not None:
+                    state.update(rows)
+        if not rows.empty:
+            self._notify_ingest(rows['machine_id'].astype(str).unique().tolist())
+        return rows
+
+    def _replay_readings(self, state):
+        """Feed the stored readings a streaming state needs to it, in time order per machine."""
+        columns = f"machine_id, timestamp, {_column_list(channel_registry.names)}"
+        limit = state.replay_readings()
+        if limit:
+            # Only each machine's most recent readings still move the state
+            query = (f"SELECT {columns} FROM (SELECT {columns}, rowid AS row_id, ROW_NUMBER() OVER "
+                     "(PARTITION BY machine_id ORDER BY timestamp DESC, rowid DESC) AS depth FROM sensor_readings) "
+                     "WHERE depth <= ? ORDER BY machine_id, timestamp, row_id")
+            readings = self._query(query, params=(limit,), parse_dates=['timestamp'])
+        else:
+            readings = self._query(f"SELECT {columns} FROM sensor_readings ORDER BY machine_id, timestamp, rowid",
+                                   parse_dates=['timestamp'])
+        state.update(readings)
+        return state
+
+    def _get_anomaly_detector(self, machine_ids: List[str] = None) -> StreamingAnomalyDetector:
+        """Get the anomaly detector, replaying the stored readings into it once."""
+        with self._write_lock:
+            if self._anomalies is None:
+                self._anomalies = self._replay_readings(StreamingAnomalyDetector())
+            return self._anomalies
+
+    def _get_remaining_life_estimator(self, machine_ids: List[str] = None) -> RemainingLifeEstimator:
+        """Get the remaining-life estimator, replaying the stored readings into it once."""
+        with self._write_lock:
+            if self._remaining_life is None:
+                self._remaining_life = self._replay_readings(RemainingLifeEstimator(site_prefix=self.site_prefix))
+            return self._remaining_life
+
+    def handle_file_changes(self, paths: List[str]) -> None:
+        """Re-ingest changed data files into the database."""
+        paths = {os.path.abspath(path) for path in paths}
+        sensor_changed = os.path.abspath(self.storage.path) in paths
+        if os.path.abspath(self.maintenance_path) in paths or (sensor_changed and not self.storage.supports_tail):
+            self.ingest_files()
+        elif sensor_changed:
+            # Appends are inserted; a rewritten (shorter) file triggers a full re-ingest
+            self.refresh_sensor_data()
+        self.data_version += 1
+
+    def append_sensor_data(self, sensor_data: pd.DataFrame) -> None:
+        """Bulk insert sensor readings through the ingest stage."""
+        self._ingest_sensor_rows(sensor_data)
+
+    def append_maintenance_records(self, maintenance_data: pd.DataFrame) -> None:
+        """Bulk insert maintenance records."""
+        with self._write_lock, self._connect() as connection:
+            self._insert_maintenance_rows(connection, maintenance_data)
+
+    def load_sensor_data(self) -> pd.DataFrame:
+        """Load all sensor readings from the database."""
+        return self._query(
+            f"SELECT {_column_list(SENSOR_COLUMNS)} FROM sensor_readings ORDER BY machine_id, timestamp, rowid",
+            parse_dates=['timestamp']
+        )
+
+    def load_maintenance_data(self) -> pd.DataFrame:
+        """Load all maintenance records from the database."""
+        return self._query(
+            f"SELECT {', '.join(MAINTENANCE_COLUMNS)} FROM maintenance_records ORDER BY rowid",
+            parse_dates=['last_service_date', 'next_service_due']
+        )
+
+    def get_latest_sensor_data(self) -> pd.DataFrame:
+        """Get the most recent sensor readings for each machine."""
+        # One index seek per machine; rowid breaks timestamp ties in insert order
+        return self._query(
+            f"""
+            SELECT {_column_list(SENSOR_COLUMNS)} FROM sensor_readings WHERE rowid IN (
+                SELECT (
+                    SELECT latest.rowid FROM sensor_readings AS latest
+                    WHERE latest.machine_id = machines.machine_id
+                    ORDER BY latest.timestamp DESC, latest.rowid DESC LIMIT 1
+                ) FROM (SELECT DISTINCT machine_id FROM sensor_readings) AS machines
+            )
+            ORDER BY machine_id
+            """,
+            parse_dates=['timestamp']
+        )
+
+    def get_machine_history(self, machine_id: str, start=None, end=None,
+                            max_points: int = None, resample: str = None) -> pd.DataFrame:
+        """Get historical data for a specific machine with an indexed range scan."""
+        conditions = ["machine_id = ?"]
+        params = [machine_id]
+        if start is not None:
+            conditions.append("timestamp >= ?")
+            params.append(_to_text(start))
+        if end is not None:
+            conditions.append("timestamp <= ?")
+            params.append(_to_text(end))
+        history = self._query(
+            f"SELECT {_column_list(SENSOR_COLUMNS)} FROM sensor_readings "
+            f"WHERE {' AND '.join(conditions)} ORDER BY timestamp, rowid",
+            params=params,
+            parse_dates=['timestamp']
+        )
+        if max_points or resample:
+            history = downsample_history(history, max_points=max_points, resample=resample)
+        return history
+
+    def _risk_query(self, machine_id: str, start, end) -> pd.DataFrame:
+        """Read a machine's stored risk series with an indexed range scan."""
+        self._refresh_machine_risk(machine_id)
+        conditions = ["machine_id = ?"]
+        params = [machine_id]
+        if start is not None:
+            conditions.append("timestamp >= ?")
+            params.append(_to_text(start))
+        if end is not None:
+            conditions.append("timestamp <= ?")
+            params.append(_to_text(end))
+        return self._query(
+            "SELECT timestamp, risk_score, failure_risk FROM sensor_readings "
+            f"WHERE {' AND '.join(conditions)} ORDER BY timestamp, rowid",
+            params=params,
+            parse_dates=['timestamp']
+        )
+
+    def get_machine_risk_history(self, machine_id: str, start=None, end=None,
+                                 max_points: int = None) -> pd.DataFrame:
+        """Get a machine's risk over time from the stored risk columns."""
+        return downsample_risk(self._risk_query(machine_id, start, end), max_points)
+
+    def get_machine_risk_trend(self, machine_id: str, start=None, end=None) -> Optional[float]:
+        """Get the least-squares slope of a machine's stored risk score per day, or None."""
+        series = self._risk_query(machine_id, start, end)
+        return risk_trend(series['timestamp'].to_numpy(), series['risk_score'].to_numpy(dtype=np.float64))
+
+    def get_recent_window(self, machine_id: str, count: int = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Get a machine's most recent readings with a reverse index scan."""
+        store = RecentWindowStore(self.recent_window_size)
+        recent = self._query(
+            f"SELECT {_column_list(SENSOR_COLUMNS)} FROM sensor_readings WHERE machine_id = ? "
+            f"ORDER BY timestamp DESC, rowid DESC LIMIT ?",
+            params=[machine_id, min(count or store.capacity, store.capacity)],
+            parse_dates=['timestamp']
+        )
+        store.update(recent.iloc[::-1], None)
+        return store.window(machine_id, count)
+
+    def count_machine_readings(self, machine_id: str) -> int:
+        """Count a machine's readings from the (machine_id, timestamp) index."""
+        with self._connect() as connection:
+            return connection.execute(
+                "SELECT COUNT(*) FROM sensor_readings WHERE machine_id = ?", (machine_id,)
+            ).fetchone()[0]
+
+    def get_maintenance_schedule(self) -> pd.DataFrame:
+        """Get upcoming maintenance schedule."""
+        return self._query(
+            f"SELECT {', '.join(MAINTENANCE_COLUMNS)} FROM maintenance_records ORDER BY next_service_due, rowid",
+            parse_dates=['last_service_date', 'next_service_due']
+        )
+
+    def get_machines_overdue(self) -> List[str]:
+        """Get machines whose latest maintenance record is past due, most overdue first."""
+        with self._connect() as connection:
+            rows = connection.execute(
+                LATEST_MAINTENANCE.format(columns='machine_id') +
+                "AND next_service_due < ? ORDER BY next_service_due, machine_id",
+                (_to_text(datetime.now()),)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def get_machines_due_within(self, days: int) -> List[str]:
+        """Get machines whose next service falls within the next ``days`` days, earliest first."""
+        today = datetime.now()
+        with self._connect() as connection:
+            rows = connection.execute(
+                LATEST_MAINTENANCE.format(columns='machine_id') +
+                "AND next_service_due BETWEEN ? AND ? ORDER BY next_service_due, machine_id",
+                (_to_text(today), _to_text(today + timedelta(days=days)))
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def get_machine_maintenance_history(self, machine_id: str) -> pd.DataFrame:
+        """Get all maintenance records of a machine in service-date order."""
+        return self._query(
+            f"SELECT {', '.join(MAINTENANCE_COLUMNS)} FROM maintenance_records "
+            "WHERE machine_id = ? ORDER BY last_service_date, rowid",
+            params=(machine_id,),
+            parse_dates=['last_service_date', 'next_service_due']
+        )
+
+    def get_machine_maintenance_data(self, machine_id: str) -> Optional[Dict[str, Any]]:
+        """Get maintenance data for a specific machine."""
+        record = self._query(
+            f"SELECT {', '.join(MAINTENANCE_COLUMNS)} FROM maintenance_records "
+            "WHERE machine_id = ? ORDER BY last_service_date DESC, rowid DESC LIMIT 1",
+            params=(machine_id,),
+            parse_dates=['last_service_date', 'next_service_due']
+        )
+        if record.empty:
+            logger.warning(f"No maintenance data found for machine {machine_id}")
+            return None
+
+        # Get the most recent maintenance record
+        latest_maintenance = record.iloc[0].to_dict()
+
+        return {
+            "machine_id": machine_id,
+            "last_service_date": latest_maintenance['last_service_date'],
+            "service_notes": latest_maintenance['service_notes'],
+            "next_service_due": latest_maintenance['next_service_due'],
+            "service_cost": latest_maintenance['service_cost']
+        }
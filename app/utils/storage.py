@@ -0,0 +1,656 @@
+"""
+Storage backends for sensor data.
+
+The CSV and JSON backends read the flat exports shipped in ``DATA_DIR``
+(delimited ``.csv`` / ``.txt`` or a ``.json`` array). The Parquet
+backend stores the same readings column by column, sorted by machine and time,
+so that queries can project only the columns they need and skip row groups that
+cannot match a ``machine_id`` / ``timestamp`` predicate. The partitioned backend
+splits readings into ``machine_id=<id>/date=<YYYY-MM-DD>`` directories so that
+queries open only the partitions they can match.
+"""
+import io
+import os
+import shutil
+import sys
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Import centralized logging and configuration
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from logger_config import get_logger
+from file_formats import detect_delimiter, detect_format, read_json_chunks
+from channels import channel_registry
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.app_config import config
+logger = get_logger(__name__)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - depends on the installed extras
+    pa = None
+    pq = None
+
+# Sensor channels stored as float32 by the streaming loader
+SENSOR_VALUE_COLUMNS = list(channel_registry.names)
+
+
+def concat_readings(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Concatenate sensor frames, keeping a categorical ``machine_id`` categorical.
+
+    ``pd.concat`` falls back to object dtype when categories differ, so the
+    frames are first recoded onto the sorted union of their categories.
+    """
+    if not any(isinstance(frame['machine_id'].dtype, pd.CategoricalDtype) for frame in frames):
+        return pd.concat(frames, ignore_index=True)
+
+    categories = set()
+    for frame in frames:
+        machine_ids = frame['machine_id']
+        if isinstance(machine_ids.dtype, pd.CategoricalDtype):
+            categories.update(machine_ids.cat.categories)
+        else:
+            categories.update(machine_ids.unique())
+    dtype = pd.CategoricalDtype(sorted(categories))
+    aligned = [
+        frame if frame['machine_id'].dtype == dtype else frame.assign(machine_id=frame['machine_id'].astype(dtype))
+        for frame in frames
+    ]
+    return pd.concat(aligned, ignore_index=True)
+
+
+def _joined_dtype(dtypes: List[np.dtype]) -> np.dtype:
+    """
+    Pick the dtype of a column joined from chunks of the given dtypes.
+
+    A compact column whose chunks differ only because some hold missing
+    values (int32 without, float32 with) is joined as float32: its values were
+    parsed through float32, and NumPy's promotion would widen it to float64.
+    """
+    dtype = np.result_type(*dtypes)
+    compact = all(chunk_dtype.kind in 'iuf' and chunk_dtype.itemsize <= 4 for chunk_dtype in dtypes)
+    if dtype == np.float64 and compact and any(chunk_dtype == np.float32 for chunk_dtype in dtypes):
+        return np.dtype(np.float32)
+    return dtype
+
+
+def concat_chunks(chunks: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Concatenate streamed sensor chunks column by column.
+
+    Each chunk is taken apart into its column arrays as it arrives, and each
+    column is joined on its own, so peak memory is the final frame plus one
+    column rather than the chunks plus the frame. Categorical columns are
+    recoded onto the sorted union of their categories, as ``concat_readings``
+    does. Each column's dtype is picked once from all of its chunks (see
+    ``_joined_dtype``) and every chunk is cast into it while joining.
+    """
+    pieces: Dict[str, List[np.ndarray]] = {}
+    # Categorical column -> category -> code in the joined column
+    categories: Dict[str, Dict] = {}
+    rows = 0
+    for chunk in chunks:
+        for name, values in chunk.items():
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                lookup = categories.setdefault(name, {})
+                # The trailing -1 keeps missing values (code -1) missing
+                codes = np.array([lookup.setdefault(category, len(lookup)) for category in values.cat.categories]
+                                 + [-1], dtype=np.int32)
+                pieces.setdefault(name, []).append(codes[values.cat.codes.to_numpy()])
+            else:
+                pieces.setdefault(name, []).append(values.to_numpy())
+        rows += len(chunk)
+
+    sensor_data = pd.DataFrame(index=pd.RangeIndex(rows))
+    for name in list(pieces):
+        column_pieces = pieces.pop(name)
+        dtypes = list({piece.dtype for piece in column_pieces})
+        if len(column_pieces) == 1:
+            values = column_pieces[0]
+        elif len(dtypes) == 1:
+            values = np.concatenate(column_pieces)
+        else:
+            values = np.concatenate(column_pieces, dtype=_joined_dtype(dtypes), casting='same_kind')
+        del column_pieces
+        if name in categories:
+            names = np.array(list(categories[name]), dtype=object)
+            order = np.argsort(names, kind='stable')
+            recode = np.full(len(names) + 1, -1, dtype=np.int32)
+            recode[order] = np.arange(len(names), dtype=np.int32)
+            values = pd.Categorical.from_codes(recode[values], categories=names[order])
+        sensor_data[name] = values
+    return sensor_data
+
+
+def compact_sensor_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Convert one chunk of parsed readings to the compact streaming dtypes."""
+    for column in SENSOR_VALUE_COLUMNS:
+        if column in chunk:
+            chunk[column] = pd.to_numeric(chunk[column]).astype('float32')
+    if 'machine_id' in chunk:
+        chunk['machine_id'] = chunk['machine_id'].astype('category')
+    if 'timestamp' in chunk:
+        chunk['timestamp'] = pd.to_datetime(chunk['timestamp'], format=config.SENSOR_TIMESTAMP_FORMAT)
+    if 'operating_hours' in chunk:
+        # Parsed as float so a missing value does not abort the chunk
+        chunk['operating_hours'] = pd.to_numeric(chunk['operating_hours']).astype('float32')
+        if not chunk['operating_hours'].isna().any():
+            chunk['operating_hours'] = chunk['operating_hours'].astype('int32')
+    return chunk
+
+
+class SensorStorage:
+    """Base class for sensor data storage backends."""
+
+    # Whether the backend can apply machine/time predicates while reading
+    supports_pushdown = False
+    # Whether rows appended to the backing file can be read incrementally
+    supports_tail = False
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def exists(self) -> bool:
+        """Check whether the backing file is present."""
+        return os.path.exists(self.path)
+
+    def read(self, columns: Optional[List[str]] = None,
+             machine_ids: Optional[Iterable[str]] = None,
+             start=None, end=None) -> pd.DataFrame:
+        """
+        Read sensor readings.
+
+        Args:
+            columns: Optional list of columns to project
+            machine_ids: Optional machine IDs to keep
+            start: Optional inclusive lower bound on ``timestamp``
+            end: Optional inclusive upper bound on ``timestamp``
+
+        Returns:
+            DataFrame with the matching readings
+        """
+        raise NotImplementedError
+
+    def read_latest(self) -> pd.DataFrame:
+        """Read the most recent reading for each machine."""
+        sensor_data = self.read()
+        return sensor_data.groupby('machine_id', observed=True).last().reset_index()
+
+    def write(self, sensor_data: pd.DataFrame) -> None:
+        """Replace the stored readings with ``sensor_data``."""
+        raise NotImplementedError
+
+    @staticmethod
+    def _filter(sensor_data: pd.DataFrame, machine_ids=None, start=None, end=None) -> pd.DataFrame:
+        """Apply machine/time predicates to an in-memory frame."""
+        mask = np.ones(len(sensor_data), dtype=bool)
+        if machine_ids is not None:
+            mask &= sensor_data['machine_id'].isin(list(machine_ids)).to_numpy()
+        if start is not None:
+            mask &= (sensor_data['timestamp'] >= pd.Timestamp(start)).to_numpy()
+        if end is not None:
+            mask &= (sensor_data['timestamp'] <= pd.Timestamp(end)).to_numpy()
+        if mask.all():
+            return sensor_data
+        return sensor_data[mask]
+
+
+class _BoundedReader:
+    """File wrapper that stops reading at a fixed byte offset."""
+
+    def __init__(self, handle, limit: int):
+        self.handle = handle
+        self.limit = limit
+
+    def read(self, size: int = -1) -> bytes:
+        remaining = max(0, self.limit - self.handle.tell())
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        return self.handle.read(size)
+
+
+class CsvStorage(SensorStorage):
+    """
+    Sensor storage backed by a delimited text file (``.csv`` or ``.txt``).
+
+    With a ``chunk_size`` the file is streamed in fixed-size chunks with compact
+    dtypes (categorical ``machine_id``, float32 sensors, int32 operating hours,
+    fixed-format timestamps), so peak memory stays close to the final frame.
+    """
+
+    supports_tail = True
+
+    def __init__(self, path: str, chunk_size: int = None, sep: str = None):
+        super().__init__(path)
+        self.chunk_size = config.SENSOR_LOAD_CHUNK_SIZE if chunk_size is None else chunk_size
+        # Text exports may use another delimiter; sniff it from the header
+        if sep is None:
+            sep = detect_delimiter(path) if os.path.exists(path) else ','
+        self.sep = sep
+
+    def read(self, columns: Optional[List[str]] = None,
+             machine_ids: Optional[Iterable[str]] = None,
+             start=None, end=None) -> pd.DataFrame:
+        """Read sensor readings from CSV, filtering after the parse."""
+        usecols = None
+        if columns is not None:
+            # Predicate columns must be parsed even when not projected
+            usecols = list(dict.fromkeys(list(columns) + ['machine_id', 'timestamp']))
+        logger.debug(f"Reading CSV sensor data from: {self.path}")
+        sensor_data = self._parse(self.path, usecols=usecols)
+        sensor_data = self._filter(sensor_data, machine_ids, start, end)
+        if columns is not None:
+            sensor_data = sensor_data[list(columns)]
+        return sensor_data
+
+    def write(self, sensor_data: pd.DataFrame) -> None:
+        """Write sensor readings to CSV."""
+        sensor_data.to_csv(self.path, sep=self.sep, index=False, date_format=config.SENSOR_TIMESTAMP_FORMAT)
+
+    def _parse(self, source, usecols: Optional[List[str]] = None) -> pd.DataFrame:
+        """Parse CSV text from a path or file object into a sensor frame."""
+        if not self.chunk_size:
+            sensor_data = pd.read_csv(source, sep=self.sep, usecols=usecols)
+            sensor_data['timestamp'] = pd.to_datetime(sensor_data['timestamp'])
+            return sensor_data
+
+        dtypes = {column: 'float32' for column in SENSOR_VALUE_COLUMNS}
+        dtypes['operating_hours'] = 'float32'
+        dtypes['machine_id'] = 'category'
+        chunks = (
+            compact_sensor_chunk(chunk)
+            for chunk in pd.read_csv(source, sep=self.sep, usecols=usecols, dtype=dtypes, chunksize=self.chunk_size)
+        )
+        sensor_data = concat_chunks(chunks)
+        logger.debug(f"Parsed {len(sensor_data)} sensor rows in chunks of up to {self.chunk_size}")
+        return sensor_data
+
+    def complete_offset(self, initial: bool = False) -> int:
+        """
+        Get the byte offset just past the last complete row in the file.
+
+        A row is complete once its newline is written. Only on the initial
+        load does a trailing row without a newline count as complete (when it
+        has every field), so files saved without a final newline still load in
+        full; while tailing, a row can have every field and still be mid-write.
+
+        Args:
+            initial: The offset is for the initial load rather than a tail read
+        """
+        size = os.path.getsize(self.path)
+        with open(self.path, 'rb') as handle:
+            header = handle.readline()
+            line_end = 0
+            position = size
+            while position > 0:
+                step = min(position, 64 * 1024)
+                handle.seek(position - step)
+                newline = handle.read(step).rfind(b'\n')
+                if newline >= 0:
+                    line_end = position - step + newline + 1
+                    break
+                position -= step
+            if initial and 0 < line_end < size:
+                handle.seek(line_end)
+                separator = self.sep.encode()
+                if handle.read(size - line_end).count(separator) >= header.count(separator):
+                    return size
+        return line_end
+
+    def read_until(self, end_offset: int) -> pd.DataFrame:
+        """Read all readings stored before ``end_offset``."""
+        logger.debug(f"Reading CSV sensor data from {self.path} up to byte {end_offset}")
+        with open(self.path, 'rb') as handle:
+            return self._parse(_BoundedReader(handle, end_offset))
+
+    def read_appended(self, offset: int) -> Tuple[Optional[pd.DataFrame], int]:
+        """
+        Read the complete rows appended after ``offset``.
+
+        Args:
+            offset: Byte offset returned by a previous read
+
+        Returns:
+            Tuple of (new readings, new offset). The readings are ``None`` when
+            the file shrank, i.e. it was rewritten and must be reloaded in full.
+        """
+        if os.path.getsize(self.path) < offset:
+            logger.warning(f"Sensor file {self.path} shrank below offset {offset}; full reload required")
+            return None, 0
+        end_offset = max(offset, self.complete_offset())
+        with open(self.path, 'rb') as handle:
+            header = handle.readline()
+            handle.seek(offset)
+            chunk = handle.read(end_offset - offset)
+        new_rows = self._parse(io.BytesIO(header + chunk))
+        logger.debug(f"Read {len(new_rows)} appended sensor rows ({end_offset - offset} bytes)")
+        return new_rows, end_offset
+
+
+class JsonStorage(SensorStorage):
+    """
+    Sensor storage backed by a JSON export (an array of objects or JSON Lines).
+
+    The file is streamed record by record into column buffers that are
+    converted to a frame every ``chunk_size`` records, so peak memory is the
+    final frame plus one chunk, as with the chunked CSV loader.
+    """
+
+    def __init__(self, path: str, chunk_size: int = None):
+        super().__init__(path)
+        self.chunk_size = config.SENSOR_LOAD_CHUNK_SIZE if chunk_size is None else chunk_size
+
+    def read(self, columns: Optional[List[str]] = None,
+             machine_ids: Optional[Iterable[str]] = None,
+             start=None, end=None) -> pd.DataFrame:
+        """Read sensor readings from JSON, filtering after the parse."""
+        usecols = None
+        if columns is not None:
+            usecols = list(dict.fromkeys(list(columns) + ['machine_id', 'timestamp']))
+        logger.debug(f"Reading JSON sensor data from: {self.path}")
+        if self.chunk_size:
+            chunks = read_json_chunks(self.path, usecols, self.chunk_size, convert=compact_sensor_chunk)
+        else:
+            chunks = read_json_chunks(self.path, usecols, convert=self._convert_chunk)
+        sensor_data = self._filter(concat_readings(chunks), machine_ids, start, end)
+        if columns is not None:
+            sensor_data = sensor_data[list(columns)]
+        return sensor_data
+
+    @staticmethod
+    def _convert_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+        """Give a chunk the same dtypes ``pd.read_csv`` infers for the CSV export."""
+        for column in SENSOR_VALUE_COLUMNS + ['operating_hours']:
+            if column in chunk and chunk[column].dtype == object:
+                # Columns that are null throughout the chunk
+                chunk[column] = pd.to_numeric(chunk[column])
+        if 'timestamp' in chunk:
+            chunk['timestamp'] = pd.to_datetime(chunk['timestamp'])
+        return chunk
+
+    def write(self, sensor_data: pd.DataFrame) -> None:
+        """Write sensor readings as a JSON array."""
+        sensor_data.to_json(self.path, orient='records', date_format='iso', indent=2)
+
+
+class ParquetStorage(SensorStorage):
+    """Sensor storage backed by a Parquet file sorted by (machine_id, timestamp)."""
+
+    supports_pushdown = True
+
+    def __init__(self, path: str, row_group_size: int = None):
+        if pq is None:
+            raise ImportError("pyarrow is required for the Parquet storage backend")
+        super().__init__(path)
+        self.row_group_size = row_group_size or config.PARQUET_ROW_GROUP_SIZE
+
+    def read(self, columns: Optional[List[str]] = None,
+             machine_ids: Optional[Iterable[str]] = None,
+             start=None, end=None) -> pd.DataFrame:
+        """Read sensor readings, pushing predicates down to the row groups."""
+        filters = []
+        if machine_ids is not None:
+            filters.append(('machine_id', 'in', list(machine_ids)))
+        if start is not None:
+            filters.append(('timestamp', '>=', pd.Timestamp(start)))
+        if end is not None:
+            filters.append(('timestamp', '<=', pd.Timestamp(end)))
+        logger.debug(f"Reading Parquet sensor data from {self.path} with filters: {filters}")
+        table = pq.read_table(self.path, columns=columns, filters=filters or None)
+        return table.to_pandas()
+
+    def read_latest(self) -> pd.DataFrame:
+        """
+        Read the most recent reading for each machine.
+
+        Only the ``machine_id`` and ``timestamp`` columns are scanned in full;
+        the complete rows are then read from the row groups that hold them.
+        """
+        parquet_file = pq.ParquetFile(self.path)
+        keys = parquet_file.read(columns=['machine_id', 'timestamp']).to_pandas()
+        if keys.empty:
+            return self.read().iloc[0:0]
+
+        # Stable sort keeps file order for equal timestamps, so the last row wins
+        order = np.lexsort((keys['timestamp'].to_numpy(), keys['machine_id'].to_numpy()))
+        sorted_ids = keys['machine_id'].to_numpy()[order]
+        is_last = np.append(sorted_ids[1:] != sorted_ids[:-1], True)
+        latest_rows = np.sort(order[is_last])
+
+        row_group_ends = np.cumsum([
+            parquet_file.metadata.row_group(i).num_rows
+            for i in range(parquet_file.metadata.num_row_groups)
+        ])
+        row_groups = np.searchsorted(row_group_ends, latest_rows, side='right')
+        needed_groups = np.unique(row_groups)
+        logger.debug(f"Reading {len(needed_groups)} of {len(row_group_ends)} row groups for latest readings")
+
+        group_starts = np.concatenate(([0], row_group_ends[:-1]))
+        # Position of each latest row within the concatenation of the needed groups
+        group_offsets = np.cumsum(np.concatenate(([0], row_group_ends[needed_groups] - group_starts[needed_groups])))
+        local_rows = (latest_rows - group_starts[row_groups]
+                      + group_offsets[np.searchsorted(needed_groups, row_groups)])
+
+        table = parquet_file.read_row_groups(needed_groups.tolist())
+        latest_data = table.take(pa.array(local_rows)).to_pandas()
+        return latest_data.sort_values('machine_id').reset_index(drop=True)
+
+    def write(self, sensor_data: pd.DataFrame) -> None:
+        """Write sensor readings sorted by machine and time."""
+        sorted_data = sensor_data.sort_values(['machine_id', 'timestamp'], kind='stable')
+        table = pa.Table.from_pandas(sorted_data, preserve_index=False)
+        pq.write_table(table, self.path, row_group_size=self.row_group_size)
+        logger.info(f"Wrote {len(sorted_data)} sensor records to {self.path}")
+
+
+class PartitionedStorage(SensorStorage):
+    """
+    Sensor storage split into one directory per machine and day.
+
+    Layout: ``<root>/machine_id=<id>/date=<YYYY-MM-DD>/part-<n>.(parquet|csv)``.
+    The partition values are taken from the directory names, so queries prune
+    whole partitions by machine and date before opening any file, and appends
+    add new part files without rewriting existing ones.
+    """
+
+    supports_pushdown = True
+
+    def __init__(self, path: str, file_format: str = None):
+        super().__init__(path)
+        self.file_format = (file_format or config.SENSOR_PARTITION_FORMAT).lower()
+        if self.file_format not in ('csv', 'parquet'):
+            raise ValueError(f"Unknown partition file format: {self.file_format}")
+        if self.file_format == 'parquet' and pq is None:
+            raise ImportError("pyarrow is required for Parquet partitions")
+
+    @staticmethod
+    def _partition_values(root: str, key: str) -> List[Tuple[str, str]]:
+        """List the ``key=<value>`` subdirectories of ``root`` as (value, path), sorted by value."""
+        if not os.path.isdir(root):
+            return []
+        prefix = f"{key}="
+        return sorted(
+            (entry.name[len(prefix):], entry.path)
+            for entry in os.scandir(root)
+            if entry.is_dir() and entry.name.startswith(prefix)
+        )
+
+    def partitions(self, machine_ids: Optional[Iterable[str]] = None,
+                   start=None, end=None) -> List[Tuple[str, str, str]]:
+        """
+        List the partitions that can hold matching readings.
+
+        Returns:
+            (machine_id, date, directory) tuples ordered by machine and date
+        """
+        wanted = set(machine_ids) if machine_ids is not None else None
+        first_date = pd.Timestamp(start).strftime('%Y-%m-%d') if start is not None else None
+        last_date = pd.Timestamp(end).strftime('%Y-%m-%d') if end is not None else None
+        selected = []
+        for machine_id, machine_dir in self._partition_values(self.path, 'machine_id'):
+            if wanted is not None and machine_id not in wanted:
+                continue
+            for date, date_dir in self._partition_values(machine_dir, 'date'):
+                if (first_date and date < first_date) or (last_date and date > last_date):
+                    continue
+                selected.append((machine_id, date, date_dir))
+        return selected
+
+    @staticmethod
+    def _part_files(directory: str) -> List[str]:
+        return sorted(
+            entry.path for entry in os.scandir(directory)
+            if entry.is_file() and entry.name.endswith(('.parquet', '.csv'))
+        )
+
+    def _read_partition(self, machine_id: str, directory: str,
+                        columns: Optional[List[str]]) -> List[pd.DataFrame]:
+        frames = []
+        for part in self._part_files(directory):
+            if part.endswith('.parquet'):
+                if pq is None:
+                    raise ImportError("pyarrow is required to read Parquet partitions")
+                frame = pq.read_table(part, columns=columns).to_pandas()
+            else:
+                frame = pd.read_csv(part, usecols=columns)
+            frame['timestamp'] = pd.to_datetime(frame['timestamp'])
+            # The machine comes from the directory name
+            frame = frame.drop(columns=['machine_id'], errors='ignore')
+            frame.insert(0, 'machine_id', machine_id)
+            frames.append(frame)
+        return frames
+
+    def read(self, columns: Optional[List[str]] = None,
+             machine_ids: Optional[Iterable[str]] = None,
+             start=None, end=None) -> pd.DataFrame:
+        """Read sensor readings from the partitions that can match the predicates."""
+        file_columns = None
+        if columns is not None:
+            file_columns = list(dict.fromkeys(
+                [column for column in columns if column != 'machine_id'] + ['timestamp']
+            ))
+        selected = self.partitions(machine_ids, start, end)
+        logger.debug(f"Reading {len(selected)} sensor partitions under {self.path}")
+        frames = []
+        for machine_id, _, directory in selected:
+            frames.extend(self._read_partition(machine_id, directory, file_columns))
+        if not frames:
+            return pd.DataFrame(columns=list(columns) if columns is not None
+                                else ['machine_id', 'timestamp'] + SENSOR_VALUE_COLUMNS + ['operating_hours'])
+        sensor_data = self._filter(pd.concat(frames, ignore_index=True), start=start, end=end)
+        if columns is not None:
+            sensor_data = sensor_data[list(columns)]
+        return sensor_data.reset_index(drop=True)
+
+    def read_latest(self) -> pd.DataFrame:
+        """Read the most recent reading of each machine from its newest date partition only."""
+        frames = []
+        for machine_id, machine_dir in self._partition_values(self.path, 'machine_id'):
+            dates = self._partition_values(machine_dir, 'date')
+            if not dates:
+                continue
+            readings = pd.concat(self._read_partition(machine_id, dates[-1][1], None), ignore_index=True)
+            # Stable sort: on equal timestamps the row written last wins
+            frames.append(readings.sort_values('timestamp', kind='stable').iloc[[-1]])
+        if not frames:
+            return self.read()
+        return pd.concat(frames, ignore_index=True)
+
+    def write(self, sensor_data: pd.DataFrame) -> None:
+        """Replace the stored readings with ``sensor_data``, one part per partition."""
+        if os.path.isdir(self.path):
+            shutil.rmtree(self.path)
+        self.append(sensor_data)
+
+    def append(self, sensor_data: pd.DataFrame) -> int:
+        """
+        Add readings as new part files, one per (machine, day) they touch.
+
+        Returns:
+            Number of part files written
+        """
+        if sensor_data.empty:
+            return 0
+        dates = sensor_data['timestamp'].dt.strftime('%Y-%m-%d')
+        written = 0
+        for (machine_id, date), readings in sensor_data.groupby(
+                [sensor_data['machine_id'].astype(str), dates], sort=True):
+            directory = os.path.join(self.path, f"machine_id={machine_id}", f"date={date}")
+            os.makedirs(directory, exist_ok=True)
+            part = os.path.join(directory, f"part-{len(self._part_files(directory)):05d}.{self.file_format}")
+            readings = readings.drop(columns=['machine_id']).sort_values('timestamp', kind='stable')
+            if self.file_format == 'parquet':
+                pq.write_table(pa.Table.from_pandas(readings, preserve_index=False), part)
+            else:
+                readings.to_csv(part, index=False, date_format=config.SENSOR_TIMESTAMP_FORMAT)
+            written += 1
+        logger.info(f"Wrote {len(sensor_data)} sensor records into {written} partitions under {self.path}")
+        return written
+
+
+def create_sensor_storage(data_dir: str, backend: str = None) -> SensorStorage:
+    """
+    Create the sensor storage backend for a data directory.
+
+    Args:
+        data_dir: Directory holding the sensor data files
+        backend: ``csv``, ``parquet``, ``partitioned`` or ``auto`` (default: from
+            configuration). ``auto`` uses the Parquet file when it exists and
+            pyarrow is installed, then the partitioned tree when it exists.
+
+    Returns:
+        Configured storage backend
+    """
+    backend = (backend or config.SENSOR_STORAGE_BACKEND).lower()
+    export_path = os.path.join(data_dir, config.SENSOR_DATA_FILE)
+    parquet_path = os.path.join(data_dir, config.SENSOR_PARQUET_FILE)
+
+    if backend == 'parquet':
+        return ParquetStorage(parquet_path)
+    if backend == 'auto' and pq is not None and os.path.exists(parquet_path):
+        return ParquetStorage(parquet_path)
+    partition_path = os.path.join(data_dir, config.SENSOR_PARTITION_DIR)
+    if backend == 'partitioned' or (backend == 'auto' and os.path.isdir(partition_path)):
+        return PartitionedStorage(partition_path)
+    if backend not in ('csv', 'auto'):
+        raise ValueError(f"Unknown sensor storage backend: {backend}")
+    return open_export_storage(export_path)
+
+
+def open_export_storage(path: str) -> SensorStorage:
+    """
+    Open a flat sensor export with the backend matching its format.
+
+    Args:
+        path: ``.csv``, ``.txt`` or ``.json`` export
+
+    Returns:
+        JsonStorage for JSON exports, otherwise CsvStorage
+    """
+    if os.path.exists(path):
+        export_format = detect_format(path)
+    else:
+        export_format = 'json' if path.lower().endswith('.json') else 'csv'
+    if export_format == 'json':
+        return JsonStorage(path)
+    return CsvStorage(path)
+
+
+def convert_csv_to_parquet(data_dir: str) -> ParquetStorage:
+    """Convert the flat sensor export in ``data_dir`` into the Parquet layout."""
+    export_storage = open_export_storage(os.path.join(data_dir, config.SENSOR_DATA_FILE))
+    parquet_storage = ParquetStorage(os.path.join(data_dir, config.SENSOR_PARQUET_FILE))
+    parquet_storage.write(export_storage.read())
+    return parquet_storage
+
+
+def partition_sensor_export(data_dir: str, file_format: str = None) -> PartitionedStorage:
+    """Split the flat sensor export in ``data_dir`` into the partitioned layout."""
+    export_storage = open_export_storage(os.path.join(data_dir, config.SENSOR_DATA_FILE))
+    partitioned_storage = PartitionedStorage(os.path.join(data_dir, config.SENSOR_PARTITION_DIR), file_format)
+    partitioned_storage.write(export_storage.read())
+    return partitioned_storage
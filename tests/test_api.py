@@ -48,3 +48,13 @@ def test_machine_details_not_found():
     with pytest.raises(Exception) as exc_info:
         service.get_machine_details("NONEXISTENT")
     assert "Machine not found" in str(exc_info.value)
+
+def test_machine_details_history_range():
+    """Test the downsampled, time-bounded history in machine details."""
+    response = service.get_machine_details("CNC_1", max_points=2)
+    assert len(response["history"]) <= 2
+    assert sum(point["count"] for point in response["history"]) == response["history_points"]
+
+    response = service.get_machine_details("CNC_1", start="2024-01-01 09:00:00", end="2024-01-01 09:00:00")
+    assert [point["timestamp"] for point in response["history"]] == ["2024-01-01T09:00:00"]
+    json.dumps(response)
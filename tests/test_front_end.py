@@ -2,6 +2,7 @@
 Tests for the Streamlit dashboard components.
 """
 import pytest
+import numpy as np
 import pandas as pd
 import sys
 import os
@@ -12,6 +13,46 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from app.utils.data_loader import DataLoader
 from app.utils.predictor import MaintenancePredictor
 
+SENSOR_HEADER = "timestamp,machine_id,vibration,temperature,current,pressure,operating_hours\n"
+
+
+@pytest.fixture
+def sensor_site(tmp_path):
+    """
+    Factory writing a data directory to ``tmp_path``: the sensor file with the
+    given rows (CSV lines after the header, or a readings frame) next to a
+    copy of the maintenance records. Returns the sensor file path.
+    """
+    import shutil
+    from app.config.app_config import config
+
+    sensor_file = tmp_path / config.SENSOR_DATA_FILE
+
+    def write(rows):
+        if isinstance(rows, pd.DataFrame):
+            rows.to_csv(sensor_file, index=False, date_format='%Y-%m-%d %H:%M:%S', float_format='%.6f')
+        else:
+            sensor_file.write_text(SENSOR_HEADER + rows)
+        shutil.copy(os.path.join(config.DATA_DIR, config.MAINTENANCE_DATA_FILE), tmp_path)
+        return sensor_file
+    return write
+
+
+@pytest.fixture
+def incremental_loader(tmp_path, sensor_site):
+    """
+    Factory writing a data directory with ``sensor_site`` and opening an
+    incremental loader that tails its CSV sensor file. Returns the loader and
+    the sensor file path.
+    """
+    from app.utils.storage import CsvStorage
+
+    def open_loader(rows, **storage_options):
+        sensor_file = sensor_site(rows)
+        storage = CsvStorage(str(sensor_file), **storage_options)
+        return DataLoader(data_dir=str(tmp_path), storage=storage, incremental=True), sensor_file
+    return open_loader
+
 def test_data_loader():
     """Test the DataLoader class."""
     loader = DataLoader()
@@ -149,3 +190,1364 @@ def test_data_consistency():
         assert prediction['failure_risk'] in ['Low', 'Medium', 'High']
         assert 0 <= prediction['risk_score'] <= 1
         assert prediction['predicted_days_to_failure'] > 0
+
+def test_parquet_storage_backend(tmp_path):
+    """Test the Parquet backend against the CSV backend."""
+    pytest.importorskip("pyarrow")
+    from app.utils.storage import ParquetStorage
+
+    csv_loader = DataLoader()
+    csv_data = csv_loader.load_sensor_data()
+
+    storage = ParquetStorage(str(tmp_path / "sensor.parquet"), row_group_size=5)
+    storage.write(csv_data)
+    parquet_loader = DataLoader(data_dir=str(tmp_path), storage=storage)
+
+    # History is read with predicate pushdown before anything is cached
+    history = parquet_loader.get_machine_history('CNC_1')
+    assert parquet_loader.sensor_data is None
+    expected_history = csv_loader.get_machine_history('CNC_1')
+    assert history['timestamp'].tolist() == expected_history['timestamp'].tolist()
+    assert history['vibration'].tolist() == expected_history['vibration'].tolist()
+
+    # Latest readings match the full groupby over the CSV
+    latest = parquet_loader.get_latest_sensor_data()
+    expected_latest = csv_loader.get_latest_sensor_data()
+    assert latest['machine_id'].tolist() == expected_latest['machine_id'].tolist()
+    assert latest['timestamp'].tolist() == expected_latest['timestamp'].tolist()
+
+    # Column projection and time predicates
+    projected = storage.read(columns=['machine_id', 'temperature'],
+                             start='2024-01-01 09:00:00')
+    assert list(projected.columns) == ['machine_id', 'temperature']
+    assert len(projected) == (csv_data['timestamp'] >= '2024-01-01 09:00:00').sum()
+
+    # Pushdown reads are deduplicated and sanitized like a load, and counted once per machine
+    repeated = csv_data[csv_data['machine_id'] == 'CNC_1'].tail(1).assign(vibration=np.inf)
+    storage.write(pd.concat([csv_data, repeated], ignore_index=True))
+    parquet_loader = DataLoader(data_dir=str(tmp_path), storage=storage)
+    history = parquet_loader.get_machine_history('CNC_1')
+    assert history['timestamp'].tolist() == expected_history['timestamp'].tolist()
+    # The later arrival wins, and its infinite vibration is a missing reading
+    assert np.isnan(history['vibration'].iloc[-1])
+    parquet_loader.get_machine_history('CNC_1')
+    quality = parquet_loader.get_data_quality()
+    assert quality['ingest']['received'] == len(expected_history) + 1 and quality['ingest']['duplicates'] == 1
+    assert quality['vibration']['posinf'] == 1
+    assert parquet_loader.sensor_data is None
+
+def test_machine_history_index():
+    """Test indexed history lookups and automatic index rebuilds."""
+    loader = DataLoader()
+    sensor_data = loader.load_sensor_data()
+
+    for machine_id in sensor_data['machine_id'].unique():
+        history = loader.get_machine_history(machine_id)
+        expected = sensor_data[sensor_data['machine_id'] == machine_id].sort_values('timestamp')
+        assert history['timestamp'].tolist() == expected['timestamp'].tolist()
+        assert history['operating_hours'].tolist() == expected['operating_hours'].tolist()
+
+    assert loader.get_machine_history('NONEXISTENT').empty
+
+    # Replacing the underlying data rebuilds the index on the next lookup
+    loader.sensor_data = sensor_data[sensor_data['machine_id'] != 'CNC_1']
+    assert loader.get_machine_history('CNC_1').empty
+    assert not loader.get_machine_history('CNC_2').empty
+
+def test_incremental_tail_ingest(tmp_path, incremental_loader):
+    """Test that rows appended to the sensor CSV are ingested incrementally."""
+    from app.utils.storage import CsvStorage
+
+    loader, sensor_file = incremental_loader(
+        "2024-01-01 08:00:00,CNC_1,1.2,65.5,12.3,2.1,1200\n"
+        "2024-01-01 08:00:00,CNC_2,0.8,62.1,11.8,1.9,980\n"
+    )
+    assert len(loader.load_sensor_data()) == 2
+
+    # A partially written line is not ingested until it is complete
+    with open(sensor_file, "a") as handle:
+        handle.write("2024-01-01 09:00:00,CNC_1,1.3,66.0,12.4,2.1,1201\n2024-01-01 09:00:00,CNC_2,0.9")
+    assert loader.refresh_sensor_data() == 1
+    with open(sensor_file, "a") as handle:
+        handle.write(",62.5,11.9,1.9,981\n")
+    assert len(loader.load_sensor_data()) == 4
+    assert loader.get_machine_history('CNC_2')['operating_hours'].tolist() == [980, 981]
+    assert loader.refresh_sensor_data() == 0
+
+    # Nor is a line that has every field but no newline yet
+    with open(sensor_file, "a") as handle:
+        handle.write("2024-01-01 10:00:00,CNC_1,1.4,66.5,12.5,2.1,12")
+    assert loader.refresh_sensor_data() == 0
+    with open(sensor_file, "a") as handle:
+        handle.write("02\n")
+    assert loader.refresh_sensor_data() == 1
+    assert loader.get_machine_history('CNC_1')['operating_hours'].tolist() == [1200, 1201, 1202]
+
+    # On the initial load, a file saved without a final newline loads in full
+    unterminated = tmp_path / "unterminated.csv"
+    unterminated.write_bytes(sensor_file.read_bytes().rstrip(b"\n"))
+    fresh = DataLoader(data_dir=str(tmp_path), storage=CsvStorage(str(unterminated)), incremental=True)
+    assert len(fresh.load_sensor_data()) == 5
+
+    # A rewritten (shorter) file is reloaded in full
+    sensor_file.write_text(SENSOR_HEADER + "2024-01-02 08:00:00,CNC_3,2.1,78.3,15.2,2.8,1450\n")
+    assert loader.refresh_sensor_data() == 1
+    assert loader.get_machine_history('CNC_1').empty
+
+def test_chunked_typed_loader(tmp_path):
+    """Test the streaming loader's compact dtypes against the default parse."""
+    from app.utils.storage import CsvStorage, concat_chunks
+    from app.config.app_config import config
+
+    csv_path = os.path.join(config.DATA_DIR, config.SENSOR_DATA_FILE)
+    default_data = DataLoader(storage=CsvStorage(csv_path, chunk_size=0)).load_sensor_data()
+    chunked_loader = DataLoader(storage=CsvStorage(csv_path, chunk_size=7))
+    chunked_data = chunked_loader.load_sensor_data()
+
+    assert isinstance(chunked_data['machine_id'].dtype, pd.CategoricalDtype)
+    assert chunked_data['vibration'].dtype == 'float32'
+    assert chunked_data['operating_hours'].dtype == 'int32'
+    assert len(chunked_data) == len(default_data)
+    assert sorted(chunked_data['machine_id'].cat.categories) == sorted(default_data['machine_id'].unique())
+
+    history = chunked_loader.get_machine_history('CNC_1')
+    expected = default_data[default_data['machine_id'] == 'CNC_1'].sort_values('timestamp')
+    assert history['timestamp'].tolist() == expected['timestamp'].tolist()
+    assert history['temperature'].to_numpy().tolist() == expected['temperature'].astype('float32').tolist()
+
+    latest = chunked_loader.get_latest_sensor_data()
+    assert len(latest) == default_data['machine_id'].nunique()
+
+    # A column missing values in some chunks only stays 32-bit instead of widening to float64
+    joined = concat_chunks([
+        pd.DataFrame({'operating_hours': np.array([1200, 1201], dtype=np.int32),
+                      'vibration': np.array([1.2, 1.3], dtype=np.float32)}),
+        pd.DataFrame({'operating_hours': np.array([np.nan, 1203], dtype=np.float32),
+                      'vibration': np.array([np.nan, 1.5], dtype=np.float32)}),
+    ])
+    assert joined.dtypes.tolist() == [np.float32, np.float32]
+    assert joined['operating_hours'].tolist()[:2] == [1200, 1201] and np.isnan(joined['operating_hours'][2])
+    sensor_file = tmp_path / "sensor.csv"
+    sensor_file.write_text(SENSOR_HEADER + "2024-01-01 08:00:00,CNC_1,1.2,65.5,12.3,2.1,1200\n"
+                                           "2024-01-01 09:00:00,CNC_1,1.3,65.5,12.3,2.1,\n")
+    gappy = CsvStorage(str(sensor_file), chunk_size=1).read()
+    assert gappy['operating_hours'].dtype == np.float32 and gappy['vibration'].dtype == np.float32
+
+def test_downsampled_machine_history():
+    """Test time-range filtering and bucketed downsampling of history."""
+    loader = DataLoader()
+    full_history = loader.get_machine_history('CNC_1')
+
+    ranged = loader.get_machine_history('CNC_1', start='2024-01-01 09:00:00', end='2024-01-01 10:00:00')
+    assert ranged['timestamp'].min() >= pd.Timestamp('2024-01-01 09:00:00')
+    assert ranged['timestamp'].max() <= pd.Timestamp('2024-01-01 10:00:00')
+
+    downsampled = loader.get_machine_history('CNC_1', max_points=2)
+    assert len(downsampled) <= 2
+    assert downsampled['count'].sum() == len(full_history)
+    assert downsampled['vibration_max'].max() == full_history['vibration'].max()
+    assert downsampled['vibration_min'].min() == full_history['vibration'].min()
+    assert (downsampled['vibration_min'] <= downsampled['vibration']).all()
+
+    # max_points buckets align to the epoch on the raw path too, like resample and the rollups
+    from app.utils.downsampling import bucket_width, downsample_history
+    width = bucket_width(full_history, max_points=3)
+    raw = downsample_history(full_history, max_points=3)
+    assert len(raw) <= 3
+    assert raw['timestamp'].tolist() == downsample_history(full_history, resample=width)['timestamp'].tolist()
+    assert raw['timestamp'].iloc[0] == full_history['timestamp'].iloc[0].floor(width)
+
+    hourly = loader.get_machine_history('CNC_1', resample='1h')
+    assert hourly['count'].sum() == len(full_history)
+    assert (hourly['timestamp'] == hourly['timestamp'].dt.floor('1h')).all()
+
+    # Short histories are returned unchanged
+    assert len(loader.get_machine_history('CNC_1', max_points=10000)) == len(full_history)
+
+def test_rollup_tiers_incremental():
+    """Test that incrementally folded rollups match a one-shot build."""
+    from app.utils.rollups import RollupStore
+    from app.utils.downsampling import downsample_history
+
+    sensor_data = DataLoader().load_sensor_data()
+    one_shot = RollupStore(tiers=['1min', '1h', '1D'])
+    one_shot.update(sensor_data)
+
+    # Fold the same readings in two batches, the second one out of order
+    incremental = RollupStore(tiers=['1min', '1h', '1D'])
+    incremental.update(sensor_data.iloc[::2])
+    incremental.update(sensor_data.iloc[1::2].iloc[::-1])
+
+    for machine_id in sensor_data['machine_id'].unique():
+        raw = sensor_data[sensor_data['machine_id'] == machine_id].sort_values('timestamp')
+        for width in ['1h', '2h', '1D']:
+            expected = downsample_history(raw, resample=width)
+            for store in (one_shot, incremental):
+                rolled = store.query(machine_id, pd.Timedelta(width))
+                assert rolled['timestamp'].tolist() == expected['timestamp'].tolist()
+                assert rolled['count'].tolist() == expected['count'].tolist()
+                assert np.array_equal(rolled['vibration_max'], expected['vibration_max'], equal_nan=True)
+                assert rolled['operating_hours'].tolist() == expected['operating_hours'].tolist()
+                assert np.allclose(rolled['temperature'], expected['temperature'], equal_nan=True)
+
+    # Widths that no tier divides are left to the raw path
+    assert one_shot.query('CNC_1', pd.Timedelta('90s')) is None
+
+def test_sqlite_data_loader(tmp_path):
+    """Test that the SQLite backend answers queries like the in-memory loader."""
+    from app.utils.sqlite_loader import SQLiteDataLoader
+
+    memory_loader = DataLoader()
+    sqlite_loader = SQLiteDataLoader(db_path=str(tmp_path / "data.db"))
+
+    latest = sqlite_loader.get_latest_sensor_data()
+    expected_latest = memory_loader.get_latest_sensor_data()
+    assert latest['machine_id'].tolist() == expected_latest['machine_id'].tolist()
+    assert latest['timestamp'].tolist() == expected_latest['timestamp'].tolist()
+    assert latest['operating_hours'].tolist() == expected_latest['operating_hours'].tolist()
+
+    history = sqlite_loader.get_machine_history('CNC_4', start='2024-01-01 09:00:00')
+    expected_history = memory_loader.get_machine_history('CNC_4', start='2024-01-01 09:00:00')
+    assert history['timestamp'].tolist() == expected_history['timestamp'].tolist()
+    assert history['vibration'].tolist() == expected_history['vibration'].tolist()
+
+    assert sqlite_loader.get_machines_overdue() == memory_loader.get_machines_overdue()
+    assert sqlite_loader.get_machines_due_within(10000) == memory_loader.get_machines_due_within(10000)
+    assert sqlite_loader.get_machine_maintenance_data('CNC_3') == memory_loader.get_machine_maintenance_data('CNC_3')
+    assert sqlite_loader.get_machine_maintenance_data('NONEXISTENT') is None
+
+    # Readings within the same second are stored as distinct readings
+    sub_second = pd.DataFrame({
+        'timestamp': pd.to_datetime(['2024-01-02 08:00:00.250', '2024-01-02 08:00:00.750']),
+        'machine_id': 'CNC_9', 'vibration': [1.0, 1.1], 'temperature': 70.0, 'current': 12.0,
+        'pressure': 2.0, 'operating_hours': [100, 100],
+    })
+    assert len(sqlite_loader._ingest_sensor_rows(sub_second)) == 2
+    assert sqlite_loader.get_machine_history('CNC_9')['timestamp'].tolist() == sub_second['timestamp'].tolist()
+    assert sqlite_loader.get_machine_history('CNC_9', start='2024-01-02 08:00:00.5')['vibration'].tolist() == \
+        pytest.approx([1.1])
+
+    # Reopening an existing database does not ingest the files again
+    reopened = SQLiteDataLoader(db_path=str(tmp_path / "data.db"))
+    assert len(reopened.load_sensor_data()) == len(memory_loader.load_sensor_data()) + 2
+
+    # Channel names are quoted, so SQL keywords and quotes are valid column names
+    import sqlite3
+    from app.utils.sqlite_loader import _column_list
+    names = ['order', 'odd "name']
+    connection = sqlite3.connect(":memory:")
+    connection.execute(f"CREATE TABLE readings ({_column_list(names)})")
+    connection.execute(f"INSERT INTO readings ({_column_list(names)}) VALUES (1, 2)")
+    assert connection.execute(f"SELECT {_column_list(names[::-1])} FROM readings").fetchall() == [(2, 1)]
+    connection.close()
+
+def test_sqlite_reopen_follows_source_files(tmp_path, sensor_site):
+    """Test that reopening a database tails appended rows and re-ingests changed sources."""
+    import sqlite3
+    from app.config.app_config import config
+    from app.utils.sqlite_loader import SQLiteDataLoader
+
+    sensor_file = sensor_site("2024-01-01 08:00:00,CNC_1,1.2,65.5,12.3,2.1,1200\n"
+                              "2024-01-01 08:00:00,CNC_2,0.8,62.1,11.8,1.9,980\n")
+    db_path = str(tmp_path / "data.db")
+    assert len(SQLiteDataLoader(data_dir=str(tmp_path), db_path=db_path).load_sensor_data()) == 2
+
+    # Rows appended while no process was running are tailed on reopen
+    with open(sensor_file, "a") as handle:
+        handle.write("2024-01-01 09:00:00,CNC_1,1.3,66.0,12.4,2.2,1201\n")
+    reopened = SQLiteDataLoader(data_dir=str(tmp_path), db_path=db_path)
+    assert reopened.get_machine_history('CNC_1')['operating_hours'].tolist() == [1200, 1201]
+    assert reopened.get_machine_risk_history('CNC_1')['risk_score'].notna().all()
+
+    # A channel set the rows were not ingested with re-ingests the files
+    connection = sqlite3.connect(db_path)
+    connection.execute("UPDATE sensor_readings SET pressure = NULL")
+    connection.execute("UPDATE ingest_state SET value = 0 WHERE name = 'channels'")
+    connection.commit()
+    connection.close()
+    reingested = SQLiteDataLoader(data_dir=str(tmp_path), db_path=db_path)
+    assert reingested.get_machine_history('CNC_1')['pressure'].tolist() == pytest.approx([2.1, 2.2])
+
+    # So does a rewritten sensor file, even one that grew
+    sensor_file.write_text(SENSOR_HEADER + "".join(f"2024-01-02 0{hour}:00:00,CNC_3,2.1,78.3,15.2,2.8,145{hour}\n"
+                                                   for hour in range(5)))
+    rewritten = SQLiteDataLoader(data_dir=str(tmp_path), db_path=db_path)
+    assert rewritten.get_machine_history('CNC_1').empty
+    assert len(rewritten.get_machine_history('CNC_3')) == 5
+
+    # And a changed maintenance file
+    maintenance_file = tmp_path / config.MAINTENANCE_DATA_FILE
+    maintenance_file.write_text(maintenance_file.read_text().replace("CNC_1,2023-12-15", "CNC_1,2024-01-02"))
+    refreshed = SQLiteDataLoader(data_dir=str(tmp_path), db_path=db_path)
+    assert str(refreshed.get_machine_maintenance_data('CNC_1')['last_service_date']).startswith('2024-01-02')
+
+def test_shared_data_loader_loads_once():
+    """Test that the shared loader is a single instance loaded once across threads."""
+    from concurrent.futures import ThreadPoolExecutor
+    from app.utils import data_loader as data_loader_module
+
+    shared = data_loader_module.get_data_loader()
+    assert data_loader_module.get_data_loader() is shared
+
+    loader = DataLoader()
+    reads = []
+    original_read = loader.storage.read
+
+    def counting_read(*args, **kwargs):
+        reads.append(1)
+        return original_read(*args, **kwargs)
+
+    loader.storage.read = counting_read
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        frames = list(executor.map(lambda _: loader.load_sensor_data(), range(16)))
+    assert len(reads) == 1
+    assert all(frame is frames[0] for frame in frames)
+
+def test_latest_readings_incremental(incremental_loader):
+    """Test that the latest-reading table ignores late rows and matches a full regroup."""
+    loader = DataLoader()
+    latest = loader.get_latest_sensor_data()
+    sensor_data = loader.load_sensor_data()
+    expected = sensor_data.sort_values('timestamp', kind='stable') \
+        .drop_duplicates('machine_id', keep='last').sort_values('machine_id')
+    assert latest['machine_id'].tolist() == expected['machine_id'].tolist()
+    assert latest['timestamp'].tolist() == expected['timestamp'].tolist()
+
+    loader, sensor_file = incremental_loader("2024-01-01 09:00:00,CNC_1,1.2,65.5,12.3,2.1,1200\n")
+    assert loader.get_latest_sensor_data()['operating_hours'].tolist() == [1200]
+
+    # A late, out-of-order reading does not replace the newer one; an equal timestamp does
+    with open(sensor_file, "a") as handle:
+        handle.write("2024-01-01 08:00:00,CNC_1,1.0,60.0,12.0,2.0,1199\n"
+                     "2024-01-01 09:00:00,CNC_1,1.4,66.0,12.5,2.2,1201\n"
+                     "2024-01-01 08:30:00,CNC_2,0.8,62.1,11.8,1.9,980\n")
+    latest = loader.get_latest_sensor_data()
+    assert latest['machine_id'].tolist() == ['CNC_1', 'CNC_2']
+    assert latest['operating_hours'].tolist() == [1201, 980]
+
+def test_maintenance_store_history_and_due_index():
+    """Test per-machine maintenance history and bisect-based due queries."""
+    from app.utils.maintenance_store import MaintenanceStore
+
+    records = pd.DataFrame({
+        'machine_id': ['CNC_1', 'CNC_2', 'CNC_1', 'CNC_3'],
+        'last_service_date': pd.to_datetime(['2024-03-01', '2024-02-01', '2024-01-01', '2024-02-15']),
+        'service_notes': ['second', 'only', 'first', 'only'],
+        'next_service_due': pd.to_datetime(['2024-04-01', '2024-03-01', '2024-02-01', '2024-05-01']),
+        'service_cost': [500, 300, 400, 250],
+    })
+    store = MaintenanceStore(records)
+    assert store.history('CNC_1')['service_notes'].tolist() == ['first', 'second']
+    assert store.latest('CNC_1')['service_notes'] == 'second'
+    assert store.latest('NONEXISTENT') is None
+    assert store.history('NONEXISTENT').empty
+
+    # Only each machine's latest record counts; results are earliest due first
+    assert store.due_before('2024-04-15') == ['CNC_2', 'CNC_1']
+    assert store.due_between('2024-03-15', '2024-05-01') == ['CNC_1', 'CNC_3']
+
+    store.extend(records.iloc[[1]].assign(last_service_date=pd.Timestamp('2024-03-05'),
+                                          next_service_due=pd.Timestamp('2024-06-01')))
+    assert store.due_before('2024-04-15') == ['CNC_1']
+    assert len(store.history('CNC_2')) == 2
+
+    loader = DataLoader()
+    maintenance_data = loader.load_maintenance_data()
+    assert sorted(loader.get_machines_overdue()) == sorted(
+        maintenance_data.loc[maintenance_data['next_service_due'] < pd.Timestamp.now(), 'machine_id'].unique()
+    )
+    assert loader.get_machine_maintenance_history('CNC_3')['machine_id'].tolist() == ['CNC_3']
+
+def test_multi_format_ingest(tmp_path):
+    """Test that the CSV, TXT and JSON exports load into identical frames."""
+    import io
+    from app.config.app_config import config
+    from app.utils.file_formats import iter_json_records, read_records
+    from app.utils.storage import JsonStorage, open_export_storage
+
+    exports = {
+        extension: open_export_storage(os.path.join(config.DATA_DIR, f"synthetic_sensor_data.{extension}"))
+        for extension in ('csv', 'txt', 'json')
+    }
+    assert isinstance(exports['json'], JsonStorage)
+    frames = {extension: storage.read() for extension, storage in exports.items()}
+    pd.testing.assert_frame_equal(frames['txt'], frames['csv'])
+    pd.testing.assert_frame_equal(frames['json'], frames['csv'])
+
+    # Streaming in small chunks gives the same compact frame as the chunked CSV parse
+    exports['json'].chunk_size = 4
+    exports['csv'].chunk_size = 4
+    pd.testing.assert_frame_equal(exports['json'].read(), exports['csv'].read())
+
+    maintenance = {
+        extension: read_records(os.path.join(config.DATA_DIR, f"synthetic_maintenance_records.{extension}"))
+        for extension in ('csv', 'txt', 'json')
+    }
+    pd.testing.assert_frame_equal(maintenance['json'], maintenance['csv'])
+    pd.testing.assert_frame_equal(maintenance['txt'], maintenance['csv'])
+
+    # Records split across buffer refills, JSON Lines and a tab-delimited .txt
+    records = list(iter_json_records(io.StringIO('[{"a": 1, "b": "x"}, {"a": 2, "b": null}]'), buffer_size=5))
+    assert records == [{"a": 1, "b": "x"}, {"a": 2, "b": None}]
+    assert len(list(iter_json_records(io.StringIO('{"a": 1}\n{"a": 2}\n')))) == 2
+    tab_file = tmp_path / "records.txt"
+    tab_file.write_text("machine_id\tservice_cost\nCNC_1\t500\n")
+    assert read_records(str(tab_file))['service_cost'].tolist() == [500]
+
+def test_data_file_watcher_refreshes_caches(tmp_path, incremental_loader):
+    """Test that only real content changes reach the loader caches."""
+    from app.config.app_config import config
+    from app.utils.file_watcher import DataFileWatcher
+
+    loader, sensor_file = incremental_loader("2024-01-01 08:00:00,CNC_1,1.2,65.5,12.3,2.1,1200\n")
+    loader.load_sensor_data()
+    loader.get_machine_maintenance_data('CNC_1')
+
+    watcher = DataFileWatcher(loader.watched_paths(), mode='poll')
+    watcher.add_listener(loader.handle_file_changes)
+    changes = []
+    watcher.add_listener(changes.append)
+
+    # Touching a file without changing its content is not a change
+    os.utime(sensor_file, ns=(0, 0))
+    assert watcher.check() == []
+    assert loader.data_version == 0
+
+    with open(sensor_file, "a") as handle:
+        handle.write("2024-01-01 09:00:00,CNC_1,1.3,66.0,12.4,2.1,1201\n")
+    assert watcher.check() == [str(sensor_file)]
+    assert loader.data_version == 1
+    # The append was ingested incrementally and the maintenance cache kept
+    assert len(loader.sensor_data) == 2
+    assert loader.maintenance_data is not None
+
+    maintenance_file = tmp_path / config.MAINTENANCE_DATA_FILE
+    maintenance_file.write_text(maintenance_file.read_text().replace("500", "650"))
+    assert watcher.check() == [str(maintenance_file)]
+    assert loader.maintenance_data is None
+    assert loader.get_machine_maintenance_data('CNC_1')['service_cost'] == 650
+    assert len(changes) == 2
+
+    # A same-size edit between the hashed head and tail of a large file is still a change
+    large_file = tmp_path / "large.csv"
+    large_file.write_bytes(b"a" * (512 * 1024))
+    large_watcher = DataFileWatcher([str(large_file)], mode='poll')
+    os.utime(large_file, ns=(0, 0))
+    assert large_watcher.check() == []
+    with open(large_file, "r+b") as handle:
+        handle.seek(256 * 1024)
+        handle.write(b"b")
+    os.utime(large_file, ns=(1, 1))
+    assert large_watcher.check() == [str(large_file)]
+
+@pytest.mark.parametrize("file_format", ["csv", "parquet"])
+def test_partitioned_storage_pruning(tmp_path, file_format):
+    """Test partition pruning and appends in the machine/day layout."""
+    if file_format == "parquet":
+        pytest.importorskip("pyarrow")
+    from app.utils.storage import PartitionedStorage
+
+    csv_loader = DataLoader()
+    csv_data = csv_loader.load_sensor_data()
+    storage = PartitionedStorage(str(tmp_path / "sensor"), file_format=file_format)
+    storage.write(csv_data)
+    assert (tmp_path / "sensor" / "machine_id=CNC_1" / "date=2024-01-01" / f"part-00000.{file_format}").exists()
+
+    # Only the requested machine's partitions are listed and read
+    assert [partition[0] for partition in storage.partitions(machine_ids=['CNC_2'])] == ['CNC_2']
+    assert storage.partitions(start='2024-01-02') == []
+
+    loader = DataLoader(data_dir=str(tmp_path), storage=storage)
+    history = loader.get_machine_history('CNC_1')
+    assert loader.sensor_data is None
+    expected = csv_loader.get_machine_history('CNC_1')
+    assert history['timestamp'].tolist() == expected['timestamp'].tolist()
+    assert history['vibration'].tolist() == expected['vibration'].tolist()
+
+    latest = loader.get_latest_sensor_data()
+    expected_latest = csv_loader.get_latest_sensor_data()
+    assert latest['machine_id'].tolist() == expected_latest['machine_id'].tolist()
+    assert latest['timestamp'].tolist() == expected_latest['timestamp'].tolist()
+
+    # Appending a new day adds a partition without touching the existing ones
+    new_day = csv_data[csv_data['machine_id'] == 'CNC_1'].tail(1).assign(
+        timestamp=pd.Timestamp('2024-01-02 08:00:00'))
+    assert storage.append(new_day) == 1
+    assert [partition[1] for partition in storage.partitions(machine_ids=['CNC_1'])] == ['2024-01-01', '2024-01-02']
+    assert len(storage.read(machine_ids=['CNC_1'], start='2024-01-02')) == 1
+    assert storage.read_latest().set_index('machine_id').loc['CNC_1', 'timestamp'] == pd.Timestamp('2024-01-02 08:00:00')
+
+def test_vectorized_sanitizer_and_json_records():
+    """Test load-time policies, data-quality counters and bulk JSON records."""
+    from app.utils.sanitizer import ColumnPolicy, DataSanitizer, to_json_records
+    from app.services.machines_service import MachinesService
+
+    readings = pd.DataFrame({
+        'timestamp': pd.to_datetime(['2024-01-01 08:00:00', '2024-01-01 09:00:00', '2024-01-01 10:00:00']),
+        'machine_id': ['CNC_1', 'CNC_1', 'CNC_1'],
+        'vibration': [1.2, np.inf, -0.5],
+        'temperature': [np.nan, 70.0, -np.inf],
+        'operating_hours': [1200, 1201, 1202],
+    })
+    sanitizer = DataSanitizer({
+        'vibration': ColumnPolicy(lower=0.0),
+        'temperature': ColumnPolicy(neginf=-40.0),
+        'operating_hours': ColumnPolicy(upper=1201),
+    })
+    sanitizer.sanitize(readings)
+    # Missing values stay missing so the predictor still flags them
+    assert np.isnan(readings['vibration'].iloc[1]) and np.isnan(readings['vibration'].iloc[2])
+    assert np.isnan(readings['temperature'].iloc[0])
+    assert readings['temperature'].iloc[2] == -40.0
+    assert np.isnan(readings['operating_hours'].iloc[2])
+    report = sanitizer.quality_report()
+    assert report['vibration'] == {'rows': 3, 'missing': 0, 'posinf': 1, 'neginf': 0, 'out_of_range': 1}
+    assert report['temperature']['missing'] == 1 and report['temperature']['neginf'] == 1
+    assert report['operating_hours']['out_of_range'] == 1
+
+    # Bulk records match the per-value sanitize_float conversion
+    service = MachinesService()
+    frame = pd.DataFrame({
+        'timestamp': pd.to_datetime(['2024-01-01 08:00:00', '2024-01-01 08:00:00.500'], format='ISO8601'),
+        'machine_id': pd.Categorical(['CNC_1', 'CNC_2']),
+        'value': np.array([np.nan, np.inf], dtype='float32'),
+        'count': [3, 4],
+    })
+    expected = []
+    for record in frame.to_dict('records'):
+        record = {key: service.sanitize_float(value) for key, value in record.items()}
+        record['timestamp'] = record['timestamp'].isoformat()
+        expected.append(record)
+    assert to_json_records(frame) == expected
+
+def test_ingest_dedup_and_late_arrivals(incremental_loader):
+    """Test deduplication, out-of-order merging and the late-arrival window."""
+    from app.utils.ingest import ReadingIngestor
+    from app.utils.machine_index import MachineIndex
+
+    loader, sensor_file = incremental_loader(
+        "2024-01-01 08:00:00,CNC_1,1.2,65.5,12.3,2.1,1200\n"
+        "2024-01-01 10:00:00,CNC_1,1.3,66.0,12.4,2.1,1202\n"
+        "2024-01-01 10:00:00,CNC_1,1.4,66.5,12.5,2.2,1202\n"
+        "2024-01-01 10:00:00,CNC_3,2.1,78.3,15.2,2.8,1450\n"
+    )
+    loader.ingestor = ReadingIngestor(late_window="90min")
+    # The repeated key keeps the last arrival
+    assert loader.get_machine_history('CNC_1')['vibration'].tolist() == [1.2, 1.4]
+    loader.get_machine_history('CNC_1', max_points=1)
+
+    with open(sensor_file, "a") as handle:
+        handle.write("2024-01-01 09:00:00,CNC_1,1.5,67.0,12.6,2.2,1201\n"   # late, inside the window
+                     "2024-01-01 08:00:00,CNC_1,9.9,99.0,19.0,9.9,1200\n"   # beyond the window
+                     "2024-01-01 10:00:00,CNC_3,2.2,78.9,15.3,2.9,1450\n"   # replaces the stored row
+                     "2024-01-01 09:30:00,CNC_2,0.8,62.1,11.8,1.9,980\n")   # new machine
+    assert loader.refresh_sensor_data() == 3
+
+    history = loader.get_machine_history('CNC_1')
+    assert history['timestamp'].dt.hour.tolist() == [8, 9, 10]
+    assert history['vibration'].tolist() == [1.2, 1.5, 1.4]
+    assert loader.get_machine_history('CNC_3')['vibration'].tolist() == [2.2]
+    assert loader.get_latest_sensor_data()['machine_id'].tolist() == ['CNC_1', 'CNC_2', 'CNC_3']
+    # Rollups were rebuilt after the replacement instead of double counting
+    assert loader.get_machine_history('CNC_3', resample='1h')['count'].tolist() == [1]
+
+    # The incremental merge matches a full sort
+    assert loader.sensor_data.equals(MachineIndex(loader.sensor_data.sample(frac=1, random_state=0)).data)
+    quality = loader.get_data_quality()
+    assert quality['ingest'] == {'received': 8, 'duplicates': 1, 'out_of_order': 1, 'late_dropped': 1, 'replaced': 1}
+
+    # The sample feed's repeated CNC_4 reading and its operating-hours regression are reported
+    sample_loader = DataLoader()
+    sample_loader.load_sensor_data()
+    series = sample_loader.get_data_quality()['series']
+    assert series['operating_hours_regressions'] >= 1
+    assert series['repeated_readings'] >= 1
+
+
+def test_recent_window_ring_buffers(incremental_loader):
+    """Test the per-machine ring buffers behind the recent-window path."""
+    from app.utils.ring_buffer import MachineRingBuffer, RecentWindowStore, channel_trends
+
+    buffer = MachineRingBuffer(capacity=4, channel_count=1)
+    times = np.arange('2024-01-01T00', '2024-01-01T06', dtype='datetime64[h]').astype('datetime64[ns]')
+    buffer.append(times[:3], np.arange(3.0)[:, None])
+    buffer.append(times[3:], np.arange(3.0, 6.0)[:, None])
+    timestamps, values = buffer.window()
+    # Wrapped around, yet the window is one contiguous view of the newest readings
+    assert values[:, 0].tolist() == [2.0, 3.0, 4.0, 5.0]
+    assert timestamps[-1] == times[-1]
+    assert values.base is not None and values.flags['C_CONTIGUOUS'] and not values.flags.writeable
+    assert buffer.window(2)[1][:, 0].tolist() == [4.0, 5.0]
+    assert channel_trends(timestamps, values)[0] == pytest.approx(1.0)
+
+    loader, sensor_file = incremental_loader("".join(
+        f"2024-01-01 {hour:02d}:00:00,CNC_1,{1 + hour / 10:.1f},65.0,12.0,2.0,{1200 + hour}\n" for hour in range(6)
+    ))
+    loader.recent_window_size = 3
+    timestamps, values = loader.get_recent_window('CNC_1')
+    assert values[:, -1].tolist() == [1203.0, 1204.0, 1205.0]
+    assert len(loader.get_recent_window('NONEXISTENT')[0]) == 0
+    assert loader.count_machine_readings('CNC_1') == 6
+
+    with open(sensor_file, "a") as handle:
+        handle.write("2024-01-01 06:00:00,CNC_1,1.6,65.0,12.0,2.0,1206\n")
+    loader.refresh_sensor_data()
+    # Appended in place: the same buffers, now holding the new reading
+    assert loader.get_recent_window('CNC_1')[1][:, -1].tolist() == [1204.0, 1205.0, 1206.0]
+    with open(sensor_file, "a") as handle:
+        handle.write("2024-01-01 05:30:00,CNC_1,1.6,65.0,12.0,2.0,1205\n")
+    loader.refresh_sensor_data()
+    # A late reading refills the machine's buffer in time order
+    recent_times = loader.get_recent_window('CNC_1')[0]
+    assert pd.DatetimeIndex(recent_times).strftime('%H:%M').tolist() == ['05:00', '05:30', '06:00']
+    assert loader._recent_index is loader._get_machine_index()
+
+def test_recent_window_pushdown_follows_file_changes(tmp_path):
+    """Test that the recent window over a pushdown backend reads one machine and sees a rewritten file."""
+    pytest.importorskip("pyarrow")
+    from app.utils.storage import ParquetStorage
+
+    sensor_data = DataLoader().load_sensor_data()
+    storage = ParquetStorage(str(tmp_path / "sensor.parquet"), row_group_size=5)
+    storage.write(sensor_data)
+    loader = DataLoader(data_dir=str(tmp_path), storage=storage)
+    loader.recent_window_size = 2
+    history = sensor_data[sensor_data['machine_id'] == 'CNC_1']
+    timestamps, values = loader.get_recent_window('CNC_1')
+    assert values[:, -1].tolist() == history['operating_hours'].tail(2).astype(float).tolist()
+    assert loader.sensor_data is None and loader.count_machine_readings('CNC_1') == len(history)
+
+    # A rewritten file reaches the window once the watcher reports it
+    latest = history.tail(1).assign(timestamp=history['timestamp'].max() + pd.Timedelta(hours=1),
+                                    operating_hours=history['operating_hours'].max() + 1)
+    storage.write(pd.concat([sensor_data, latest], ignore_index=True))
+    loader.handle_file_changes([storage.path])
+    assert loader.get_recent_window('CNC_1')[1][-1, -1] == latest['operating_hours'].iloc[0]
+    assert loader.count_machine_readings('CNC_1') == len(history) + 1
+
+
+def test_federated_sites(tmp_path):
+    """Test loading several sites in parallel as one fleet."""
+    import shutil
+    from app.config.app_config import config
+    from app.utils.data_loader import create_data_loader
+
+    for site in ('plant_a', 'plant_b'):
+        (tmp_path / site).mkdir()
+        for name in (config.SENSOR_DATA_FILE, config.MAINTENANCE_DATA_FILE):
+            shutil.copy(os.path.join(config.DATA_DIR, name), tmp_path / site / name)
+    # plant_b has one machine of its own
+    sensor_file = tmp_path / 'plant_b' / config.SENSOR_DATA_FILE
+    sensor_file.write_text(sensor_file.read_text().rstrip('\n') + "\n2024-01-01 12:00:00,PRESS_9,0.9,60.0,11.0,1.8,500\n")
+
+    data_dir = f"plant_a={tmp_path / 'plant_a'}, plant_b={tmp_path / 'plant_b'}"
+    assert list(config.get_data_sites(data_dir)) == ['plant_a', 'plant_b']
+    assert config.get_data_sites("synthetic-data") == {config.DATA_SITE: "synthetic-data"}
+    with pytest.raises(ValueError):
+        config.get_data_sites("plant_a=/data/a,/data/b")
+
+    fleet = create_data_loader(data_dir)
+    assert fleet.sites == ['plant_a', 'plant_b']
+    single = DataLoader()
+    latest = fleet.get_latest_sensor_data()
+    site_count = len(single.get_latest_sensor_data())
+    assert latest['site'].tolist() == ['plant_a'] * site_count + ['plant_b'] * (site_count + 1)
+    assert 'plant_a:CNC_1' in latest['machine_id'].tolist() and 'plant_b:CNC_1' in latest['machine_id'].tolist()
+
+    # Qualified IDs route to their site; IDs unique to one site need no qualifier
+    assert fleet.count_machine_readings('plant_b:CNC_1') == single.count_machine_readings('CNC_1')
+    assert fleet.get_machine_history('PRESS_9')['site'].tolist() == ['plant_b']
+    with pytest.raises(ValueError):
+        fleet.get_machine_history('CNC_1')
+    assert fleet.get_machine_maintenance_data('plant_a:CNC_1')['site'] == 'plant_a'
+    assert len(fleet.get_machines_overdue()) == 2 * len(single.get_machines_overdue())
+
+    # Unknown machines are not found at any site rather than looked up at the first one
+    assert fleet.count_machine_readings('LATHE_1') == 0
+    assert len(fleet.get_recent_window('LATHE_1')[0]) == 0
+    assert fleet.get_machine_history('LATHE_1').empty
+    assert fleet.get_machine_maintenance_data('LATHE_1') is None
+
+    # Lookups reuse the machine -> site map until a site's ingest changes it
+    machine_sites = fleet._machine_sites
+    assert fleet.get_machine_history('PRESS_9')['site'].tolist() == ['plant_b']
+    assert fleet._machine_sites is machine_sites
+    sensor_file = tmp_path / 'plant_a' / config.SENSOR_DATA_FILE
+    with open(sensor_file, "a") as handle:
+        # The shipped export has no final newline
+        handle.write("\n2024-01-01 13:00:00,LATHE_1,0.7,58.0,10.5,1.7,300\n")
+    fleet.handle_file_changes([str(sensor_file)])
+    assert fleet.get_machine_history('LATHE_1')['site'].tolist() == ['plant_a']
+    assert fleet._machine_sites['LATHE_1'] == ['plant_a']
+    assert set(fleet.get_data_quality()) == {'plant_a', 'plant_b'}
+
+
+def test_sensor_channel_registry(tmp_path):
+    """Test channel definitions flowing into the dense matrix and the scorer."""
+    import json
+    from app.utils.channels import load_channel_registry
+    from app.utils.machine_index import MachineIndex
+
+    channel_file = tmp_path / "channels.json"
+    channel_file.write_text(json.dumps([{
+        "name": "spindle_speed", "label": "Spindle speed", "unit": "rpm", "weight": 0.25,
+        "thresholds": {"low": 8000, "medium": 10000, "high": 12000}
+    }]))
+    registry = load_channel_registry(str(channel_file))
+    assert registry.names == ['vibration', 'temperature', 'current', 'pressure', 'spindle_speed']
+
+    readings = pd.DataFrame({'vibration': [0.5, 2.5], 'temperature': [60.0, 95.0], 'current': [10.0, 20.0],
+                             'pressure': [1.5, 3.5], 'spindle_speed': [7000.0, 13000.0]})
+    matrix = registry.matrix(readings)
+    assert matrix.dtype == np.float32 and matrix.shape == (2, 5)
+    assert np.isnan(registry.matrix(readings.drop(columns='spindle_speed'))[:, 4]).all()
+
+    # The new channel is scored and explained without code changes; weights are renormalized
+    predictor = MaintenancePredictor(channels=registry)
+    assert predictor.overall_risk(predictor.channel_risks(matrix)).tolist() == pytest.approx([0.2, 1.0])
+    high = predictor.calculate_failure_risk(dict(readings.iloc[0], spindle_speed=13000.0))
+    assert high['reason'] == "Spindle speed above 12000 rpm"
+    assert high['risk_score'] == pytest.approx(round((0.2 + 1.0 * 0.25) / 1.25, 2))
+
+    # Default channels keep the original scores, including for missing readings
+    default = MaintenancePredictor()
+    assert default.calculate_failure_risk({'vibration': 2.0, 'temperature': 80, 'current': 12, 'pressure': np.nan})['risk_score'] == 0.61
+
+    # The index's matrix follows its sorted rows, also after an incremental extend
+    loader = DataLoader()
+    index = MachineIndex(loader.load_sensor_data())
+    index.channel_matrix()
+    extended = index.extend(loader.sensor_data.tail(2).assign(timestamp=pd.Timestamp('2024-02-01'), vibration=9.0))
+    expected = extended.data[['vibration', 'temperature', 'current', 'pressure']].to_numpy(dtype=np.float32)
+    np.testing.assert_array_equal(extended.channel_matrix(), expected)
+
+
+def test_score_batch_matches_scalar_path():
+    """Test that vectorized batch scoring matches calculate_failure_risk row by row."""
+    import itertools
+
+    predictor = MaintenancePredictor()
+    bands = {
+        'vibration': [0.5, 1.0, 1.2, 1.5, 2.0, 2.5, np.nan],
+        'temperature': [60, 70, 80, 85, 90, 95],
+        'current': [10, 12, 13, 14, 16, 20],
+        'pressure': [1.5, 2.0, 2.5, 2.7, 3.0, 3.5, np.nan],
+    }
+    readings = pd.DataFrame(list(itertools.product(*bands.values())), columns=list(bands))
+    readings.insert(0, 'machine_id', [f"M_{position}" for position in range(len(readings))])
+
+    scores = predictor.score_batch(readings)
+    fields = ['failure_risk', 'risk_score', 'predicted_days_to_failure', 'confidence']
+    expected = pd.DataFrame([predictor.calculate_failure_risk(row) for row in readings.to_dict('records')])
+    pd.testing.assert_frame_equal(scores[['machine_id'] + fields], expected[['machine_id'] + fields], check_dtype=False)
+
+    # A bare matrix in channel order gives the same scores
+    matrix = readings[predictor.channels.names].to_numpy()
+    pd.testing.assert_frame_equal(predictor.score_batch(matrix)[fields], scores[fields].reset_index(drop=True))
+
+def test_risk_history_backfill(tmp_path, incremental_loader):
+    """Test the per-reading risk history against the batch scorer, incrementally and in SQLite."""
+    from app.utils.sqlite_loader import SQLiteDataLoader
+
+    loader, sensor_file = incremental_loader("".join(
+        f"2024-01-0{day} {hour:02d}:00:00,{machine},{0.5 + hour / 10:.1f},{70 + day}.0,12.0,2.0,{1200 + hour}\n"
+        for day in (1, 2) for hour in range(24) for machine in ('CNC_1', 'CNC_2')
+    ))
+    predictor = MaintenancePredictor()
+    history = loader.get_machine_history('CNC_1')
+    risk = loader.get_machine_risk_history('CNC_1')
+    expected = predictor.score_batch(history)
+    assert risk['timestamp'].tolist() == history['timestamp'].tolist()
+    assert risk['risk_score'].tolist() == expected['risk_score'].tolist()
+    assert risk['failure_risk'].tolist() == expected['failure_risk'].tolist()
+    # Vibration climbs through each day, so risk trends upward
+    assert loader.get_machine_risk_trend('CNC_1', end='2024-01-01 23:00:00') > 0
+
+    # Appended (and late) readings are scored on their own and merged in order
+    with open(sensor_file, "a") as handle:
+        handle.write("2024-01-03 00:00:00,CNC_1,2.5,95.0,20.0,3.5,1300\n"
+                     "2024-01-01 00:30:00,CNC_1,2.5,95.0,20.0,3.5,1200\n")
+    backfilled = loader._get_risk_history()
+    loader.refresh_sensor_data()
+    assert loader._get_risk_history() is backfilled
+    risk = loader.get_machine_risk_history('CNC_1')
+    assert risk['risk_score'].tolist() == predictor.score_batch(
+        loader.get_machine_history('CNC_1'))['risk_score'].tolist()
+    assert risk['failure_risk'].tolist()[1] == 'High' and risk['failure_risk'].tolist()[-1] == 'High'
+
+    # Bucketed series keep the mean, peak and worst level per bucket
+    bucketed = loader.get_machine_risk_history('CNC_1', max_points=3)
+    assert len(bucketed) <= 3 and bucketed['count'].sum() == len(risk)
+    assert bucketed['risk_score_max'].max() == risk['risk_score'].max()
+    assert 'High' in bucketed['failure_risk'].tolist()
+
+    # SQLite stores the same scores at insert time
+    sqlite_loader = SQLiteDataLoader(data_dir=str(tmp_path), db_path=str(tmp_path / "data.db"))
+    sqlite_risk = sqlite_loader.get_machine_risk_history('CNC_1')
+    assert sqlite_risk['risk_score'].tolist() == risk['risk_score'].tolist()
+    assert sqlite_risk['failure_risk'].tolist() == risk['failure_risk'].tolist()
+    assert sqlite_loader.get_machine_risk_trend('CNC_1') == pytest.approx(loader.get_machine_risk_trend('CNC_1'))
+
+def test_float32_readings_band_like_float64(tmp_path):
+    """Test that readings stored as float32 land in the same band as float64 at a threshold."""
+    import json
+    from app.utils.risk_history import RiskHistory
+    from app.utils.scoring_config import ScoringConfig
+
+    config_file = tmp_path / "scoring.json"
+    config_file.write_text(json.dumps({"channels": {"vibration": {"thresholds": {"high": 2.2}}}}))
+    predictor = MaintenancePredictor()
+    predictor.scoring = ScoringConfig(predictor.channels, path=str(config_file))
+    # Every reading sits exactly on one of its channel's thresholds
+    matrix = np.repeat(predictor.scoring.compiled.thresholds[0].T, 4, axis=0)
+    assert float(np.float32(2.2)) > 2.2 and 2.2 in matrix
+    expected = predictor.channel_risks(matrix)
+    assert np.array_equal(predictor.channel_risks(matrix.astype(np.float32)), expected)
+    scores, levels = RiskHistory(predictor).score(matrix.astype(np.float32), predictor.channels.names)
+    overall, expected_levels, _ = predictor.assess(matrix)
+    assert scores.tolist() == predictor.round_scores(overall).tolist()
+    assert levels.tolist() == expected_levels.tolist()
+
+def test_machine_details_scores_latest_reading_like_history(tmp_path, incremental_loader):
+    """Test that the details page scores its latest reading in the stored precision and reads pushdown history once."""
+    pytest.importorskip("pyarrow")
+    import json
+    import scoring_config
+    from app.services.machines_service import MachinesService
+    from app.utils.prediction_cache import PredictionCache
+    from app.utils.storage import ParquetStorage
+
+    config_file = tmp_path / "scoring.json"
+    config_file.write_text(json.dumps({"channels": {"vibration": {"thresholds": {"high": 2.2}}}}))
+    shared = scoring_config.scoring_config
+    shared.path = str(config_file)
+    try:
+        shared.reload()
+        # The chunked loader stores the channels as float32; the vibration
+        # reading sits exactly on the retuned 2.2 high threshold
+        loader, _ = incremental_loader("2024-01-01 08:00:00,CNC_1,1.1,65.5,12.3,2.1,1200\n"
+                                       "2024-01-01 09:00:00,CNC_1,2.2,65.5,12.3,2.1,1201\n", chunk_size=1000)
+        service = MachinesService()
+        service.data_loader = loader
+        service.prediction_cache = PredictionCache()
+        assert loader.get_recent_window('CNC_1')[1].dtype == np.float32
+        details = service.get_machine_details('CNC_1')
+        assert details['current_status']['risk_score'] == details['risk_history'][-1]['risk_score']
+        batch = service.predictor.score_batch(loader.get_machine_history('CNC_1'))
+        assert batch['risk_score'].iloc[-1] == details['current_status']['risk_score']
+
+        # Over pushdown, one details view reads the machine's history once until it changes
+        storage = ParquetStorage(str(tmp_path / "sensor.parquet"))
+        storage.write(loader.load_sensor_data())
+        reads = []
+        read = storage.read
+        storage.read = lambda *args, **kwargs: reads.append(kwargs.get('machine_ids')) or read(*args, **kwargs)
+        service.data_loader = pushdown = DataLoader(data_dir=str(tmp_path), storage=storage)
+        assert service.get_machine_details('CNC_1')['risk_history'] == details['risk_history']
+        assert reads == [['CNC_1']] and pushdown.sensor_data is None
+        risk_history = pushdown._machine_risk_history('CNC_1')
+        service.get_machine_details('CNC_1')
+        assert reads == [['CNC_1']] and pushdown._machine_risk_history('CNC_1') is risk_history
+        pushdown.handle_file_changes([storage.path])
+        service.get_machine_details('CNC_1')
+        assert reads == [['CNC_1'], ['CNC_1']]
+    finally:
+        shared.path = ""
+        shared.reload()
+
+def test_streaming_anomaly_detector(incremental_loader):
+    """Test EWMA/CUSUM drift detection, batch layering and incremental ingest."""
+    from app.utils.anomaly import StreamingAnomalyDetector
+
+    rng = np.random.default_rng(0)
+    timestamps = pd.date_range('2024-01-01', periods=300, freq='h')
+    readings = pd.DataFrame({
+        'machine_id': 'CNC_1',
+        'timestamp': timestamps,
+        'vibration': 1.0 + rng.normal(0, 0.05, 300),
+        'temperature': 70 + rng.normal(0, 1.0, 300),
+        'current': 12.0,
+        'pressure': 2.0,
+    })
+    # A slow vibration drift that stays far below the 1.5 mm/s high threshold
+    readings.loc[150:, 'vibration'] += np.arange(150) * 0.002
+    detector = StreamingAnomalyDetector()
+    assert detector.update(readings.iloc[:150]).empty
+    events = detector.update(readings.iloc[150:])
+    assert not events.empty and set(events['channel']) == {'vibration'}
+    assert (events['direction'] == 'high').all() and readings['vibration'].max() < 1.5
+    state = detector.machine_state('CNC_1')
+    assert state['vibration']['readings'] == 300 and state['vibration']['alarms'] == len(events)
+    assert detector.machine_state('NONEXISTENT') is None
+
+    # Interleaved, unsorted batches across machines give the same state as one machine at a time
+    other = readings.assign(machine_id='CNC_2')
+    mixed = StreamingAnomalyDetector()
+    mixed.update(pd.concat([readings, other]).sample(frac=1, random_state=0))
+    assert mixed.machine_state('CNC_2')['vibration'] == state['vibration']
+    # Readings older than the machine's state are skipped
+    mixed.update(readings.iloc[:5])
+    assert mixed.skipped == 5 and mixed.machine_state('CNC_1')['vibration']['readings'] == 300
+
+    # The loader replays its history once, then feeds only appended rows
+    loader, sensor_file = incremental_loader(readings.iloc[:200])
+    detector = loader._get_anomaly_detector()
+    assert loader.get_machine_anomaly_state('CNC_1')['vibration']['readings'] == 200
+    with open(sensor_file, "a") as handle:
+        readings.iloc[200:].to_csv(handle, header=False, index=False,
+                                   date_format='%Y-%m-%d %H:%M:%S', float_format='%.6f')
+    loader.refresh_sensor_data()
+    assert loader._get_anomaly_detector() is detector
+    assert loader.get_machine_anomaly_state('CNC_1')['vibration']['readings'] == 300
+    assert loader.get_anomaly_events('CNC_1')['channel'].eq('vibration').all()
+
+def test_anomaly_replay_bounded_and_pushdown(tmp_path, sensor_site):
+    """Test that seeding replays a bounded tail and that pushdown seeds only the machines asked for."""
+    pytest.importorskip("pyarrow")
+    from app.utils.anomaly import StreamingAnomalyDetector
+    from app.utils.sqlite_loader import SQLiteDataLoader
+    from app.utils.storage import ParquetStorage
+
+    rng = np.random.default_rng(0)
+    readings = pd.DataFrame({
+        'machine_id': 'CNC_1',
+        'timestamp': pd.date_range('2024-01-01', periods=2000, freq='min'),
+        'vibration': 1.0 + rng.normal(0, 0.05, 2000),
+        'temperature': 70 + rng.normal(0, 1.0, 2000),
+        'current': 12.0,
+        'pressure': 2.0,
+    })
+    full = StreamingAnomalyDetector(alpha=0.1, warmup=10)
+    full.update(readings)
+    replayed = StreamingAnomalyDetector(alpha=0.1, warmup=10)
+    limit = replayed.replay_readings()
+    replayed.replay(readings.sample(frac=1, random_state=0))
+    state, expected = replayed.machine_state('CNC_1'), full.machine_state('CNC_1')
+    assert state['vibration']['readings'] == limit < len(readings)
+    for channel in ('vibration', 'temperature'):
+        assert state[channel]['mean'] == pytest.approx(expected[channel]['mean'], rel=1e-4)
+        assert state[channel]['std'] == pytest.approx(expected[channel]['std'], rel=1e-3)
+
+    # SQLite replays the same tail straight from the database
+    sensor_site(readings)
+    sqlite_loader = SQLiteDataLoader(data_dir=str(tmp_path), db_path=str(tmp_path / "data.db"))
+    detector = sqlite_loader._get_anomaly_detector()
+    assert detector.machine_state('CNC_1')['vibration']['readings'] == detector.replay_readings()
+
+    # Pushdown builds the detector from the requested machine's history only
+    csv_loader = DataLoader()
+    storage = ParquetStorage(str(tmp_path / "sensor.parquet"), row_group_size=5)
+    storage.write(csv_loader.load_sensor_data())
+    loader = DataLoader(data_dir=str(tmp_path), storage=storage)
+    pd.testing.assert_frame_equal(pd.DataFrame(loader.get_machine_anomaly_state('CNC_1')),
+                                  pd.DataFrame(csv_loader.get_machine_anomaly_state('CNC_1')))
+    assert loader.sensor_data is None and loader._anomalies.machine_ids() == ['CNC_1']
+    pd.testing.assert_frame_equal(loader.get_anomaly_events('CNC_1'), csv_loader.get_anomaly_events('CNC_1'))
+
+def test_remaining_life_estimator(incremental_loader):
+    """Test the forgetting trend fit against weighted least squares and its threshold projection."""
+    from app.utils.rul import RemainingLifeEstimator
+
+    rng = np.random.default_rng(0)
+    timestamps = pd.date_range('2024-01-01', periods=400, freq='37min') + \
+        pd.to_timedelta(rng.integers(0, 600, 400), unit='s')
+    readings = pd.DataFrame({
+        'machine_id': 'CNC_1',
+        'timestamp': timestamps,
+        'vibration': 1.0 + np.arange(400) * 0.001 + rng.normal(0, 0.02, 400),
+        'temperature': 70 + rng.normal(0, 1.0, 400),
+        'current': 12.0,
+        'pressure': 2.0,
+    })
+    estimator = RemainingLifeEstimator(half_life_hours=48)
+    estimator.update(readings.iloc[:150])
+    estimator.update(readings.iloc[150:])
+
+    # Same line as a weighted fit over the whole history, with t = 0 at the newest reading
+    hours = (timestamps - timestamps[-1]).total_seconds().to_numpy() / 3600
+    slope, level = np.polyfit(hours, readings['vibration'], 1, w=np.sqrt(0.5 ** (-hours / 48)))
+    vibration = estimator.machine_estimate('CNC_1')['channels']['vibration']
+    assert vibration['slope_per_day'] == pytest.approx(slope * 24)
+    assert vibration['level'] == pytest.approx(level)
+    high = estimator.channels['vibration'].thresholds[2]
+    assert vibration['days_to_threshold'] == pytest.approx((high - level) / slope / 24)
+
+    # Flat channels never cross; the machine is limited by the rising one
+    fleet = estimator.estimates()
+    assert fleet['limiting_channel'].tolist() == ['vibration']
+    assert fleet['remaining_life_days'].iloc[0] == pytest.approx(vibration['days_to_threshold'])
+    assert estimator.machine_estimate('CNC_1')['channels']['current']['days_to_threshold'] is None
+    assert estimator.machine_estimate('NONEXISTENT') is None
+
+    # The loader feeds only appended rows after the first replay
+    loader, sensor_file = incremental_loader(readings.iloc[:300])
+    state = loader._get_remaining_life_estimator()
+    with open(sensor_file, "a") as handle:
+        readings.iloc[300:].to_csv(handle, header=False, index=False,
+                                   date_format='%Y-%m-%d %H:%M:%S', float_format='%.6f')
+    loader.refresh_sensor_data()
+    assert loader._get_remaining_life_estimator() is state
+    replayed = RemainingLifeEstimator()
+    replayed.update(loader.load_sensor_data())
+    pd.testing.assert_frame_equal(loader.get_remaining_life(), replayed.estimates())
+
+def test_remaining_life_pushdown(tmp_path):
+    """Test that remaining life over a pushdown backend is seeded per machine without loading the frame."""
+    pytest.importorskip("pyarrow")
+    from app.utils.rul import RemainingLifeEstimator
+    from app.utils.storage import ParquetStorage
+
+    csv_loader = DataLoader()
+    csv_data = csv_loader.load_sensor_data()
+    storage = ParquetStorage(str(tmp_path / "sensor.parquet"), row_group_size=5)
+    storage.write(csv_data)
+    loader = DataLoader(data_dir=str(tmp_path), storage=storage)
+
+    machine = loader.get_machine_remaining_life('CNC_1')
+    assert loader.sensor_data is None and loader._remaining_life.machine_ids() == ['CNC_1']
+    assert machine == csv_loader.get_machine_remaining_life('CNC_1')
+    fleet = loader.get_remaining_life().sort_values('machine_id', ignore_index=True)
+    assert loader.sensor_data is None
+    pd.testing.assert_frame_equal(fleet, csv_loader.get_remaining_life().sort_values('machine_id', ignore_index=True))
+
+    # The batch closed form matches folding the readings in one at a time
+    one_by_one = RemainingLifeEstimator()
+    for _, row in csv_data.iterrows():
+        one_by_one.update(row.to_frame().T.astype({'timestamp': 'datetime64[ns]'}))
+    pd.testing.assert_frame_equal(one_by_one.estimates(sorted(fleet['machine_id'])), fleet)
+
+def test_fleet_scorer_process_pool(monkeypatch):
+    """Test that sharded pool scoring over shared memory matches in-process scoring."""
+    from utils.fleet_scoring import FleetScorer
+    from app.utils.risk_history import RiskHistory
+    from app.utils.machine_index import MachineIndex
+
+    rng = np.random.default_rng(0)
+    readings = pd.DataFrame({
+        'machine_id': [f"CNC_{position}" for position in range(1000)],
+        'timestamp': pd.Timestamp('2024-01-01'),
+        'vibration': rng.uniform(0.5, 2.5, 1000),
+        'temperature': rng.uniform(60, 95, 1000),
+        'current': rng.uniform(10, 20, 1000),
+        'pressure': rng.uniform(1.5, 3.5, 1000),
+    })
+    readings.loc[::7, 'pressure'] = np.nan
+    predictor = MaintenancePredictor()
+    # A single core, or a batch that fits in one shard, is scored in-process
+    monkeypatch.setattr(os, 'cpu_count', lambda: 1)
+    assert FleetScorer(predictor, workers=4, shard_size=97, min_rows=0).workers == 1
+    monkeypatch.setattr(os, 'cpu_count', lambda: 4)
+    assert not FleetScorer(predictor, workers=2, shard_size=1000, min_rows=0).parallel(1000)
+    scorer = FleetScorer(predictor, workers=2, shard_size=97, min_rows=0)
+    try:
+        # Uneven shards finish in any order, yet every row lands in place
+        scores = scorer.score(readings)
+        pd.testing.assert_frame_equal(scores, predictor.score_batch(readings, explain=True))
+        expected = [predictor.calculate_failure_risk(row) for row in readings.head(100).to_dict('records')]
+        assert scores['reason'].head(100).tolist() == [prediction['reason'] for prediction in expected]
+        assert scores['recommendations'].head(100).tolist() == [prediction['recommendations'] for prediction in expected]
+
+        # Backfills merge pool results into the risk history in row order
+        index = MachineIndex(readings)
+        pooled = RiskHistory(predictor, scorer=scorer)
+        pooled.backfill(index)
+        serial = RiskHistory(predictor)
+        serial.backfill(index)
+        assert np.array_equal(pooled.scores, serial.scores) and np.array_equal(pooled.levels, serial.levels)
+    finally:
+        scorer.close()
+    assert not FleetScorer(predictor, workers=1).parallel(10 ** 9)
+
+    # The loader and the service share one process-wide scorer (and pool)
+    import sys
+    import app.services.machines_service  # noqa: F401
+    import app.utils.data_loader  # noqa: F401
+    loader_module, service_module = sys.modules['app.utils.data_loader'], sys.modules['app.services.machines_service']
+    assert loader_module.get_fleet_scorer is service_module.get_fleet_scorer
+
+def test_prediction_cache(incremental_loader):
+    """Test that machine details reuse cached predictions until a reading or the scoring config changes."""
+    from app.services.machines_service import MachinesService
+    from app.utils.prediction_cache import PredictionCache
+
+    # LRU eviction and per-machine invalidation
+    cache = PredictionCache(max_entries=2)
+    cache.put(('CNC_1', 't1', 0), 'a')
+    cache.put(('CNC_2', 't1', 0), 'b')
+    assert cache.get(('CNC_1', 't1', 0)) == 'a'
+    cache.put(('CNC_3', 't1', 0), 'c')
+    assert cache.get(('CNC_2', 't1', 0)) is None
+    assert cache.invalidate(['CNC_1']) == 1 and len(cache) == 1
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'hit_rate': 0.5, 'evictions': 1, 'invalidations': 1,
+                             'entries': 1, 'max_entries': 2}
+
+    # Callers get their own copy of a cached prediction
+    prediction = {'failure_risk': 'High', 'recommendations': ['Inspect spindle']}
+    cache.put(('CNC_4', 't1', 0), prediction)
+    prediction['recommendations'].append('changed after put')
+    cache.get(('CNC_4', 't1', 0))['recommendations'].clear()
+    assert cache.get(('CNC_4', 't1', 0)) == {'failure_risk': 'High', 'recommendations': ['Inspect spindle']}
+    # Nested containers of the service's (prediction, cost, remaining life) tuple too
+    remaining_life = {'remaining_life_days': 3.5, 'channels': {'vibration': {'level': 1.2}}}
+    cache.put(('CNC_5', 't1', 0), ({'risk_score': 0.8}, {'savings': 100.0}, remaining_life))
+    cache.get(('CNC_5', 't1', 0))[2]['channels']['vibration']['level'] = 0.0
+    assert cache.get(('CNC_5', 't1', 0))[2] == remaining_life
+    cache.invalidate(['CNC_4', 'CNC_5'])
+
+    loader, sensor_file = incremental_loader(
+        "2024-01-01 08:00:00,CNC_1,1.2,65.5,12.3,2.1,1200\n"
+        "2024-01-01 08:00:00,CNC_2,2.1,78.3,15.2,2.8,1450\n"
+    )
+    service = MachinesService()
+    service.data_loader = loader
+    service.prediction_cache = PredictionCache()
+    loader.add_ingest_listener(service.prediction_cache.invalidate)
+
+    first = service.get_machine_details('CNC_1')
+    assert service.get_machine_details('CNC_1')['current_status'] == first['current_status']
+    service.get_machine_details('CNC_2')
+    assert service.prediction_cache.stats()['hits'] == 1 and service.prediction_cache.stats()['misses'] == 2
+
+    # A new reading for CNC_1 drops its entry only
+    with open(sensor_file, "a") as handle:
+        handle.write("2024-01-01 09:00:00,CNC_1,2.4,92.0,19.0,3.4,1201\n")
+    assert loader.refresh_sensor_data() == 1
+    assert len(service.prediction_cache) == 1
+    updated = service.get_machine_details('CNC_1')['current_status']
+    assert updated['failure_risk'] == 'High' and updated != first['current_status']
+    service.get_machine_details('CNC_2')
+    assert service.prediction_cache.stats()['hits'] == 2
+
+    # A scoring configuration change misses under the new version
+    service.predictor.channels.version += 1
+    try:
+        service.get_machine_details('CNC_2')
+        assert service.prediction_cache.stats()['misses'] == 4
+    finally:
+        service.predictor.channels.version -= 1
+
+def test_prediction_cache_pushdown_file_change(tmp_path, sensor_site):
+    """Test that over a pushdown backend a rewritten sensor file invalidates cached predictions."""
+    pytest.importorskip("pyarrow")
+    from app.services.machines_service import MachinesService
+    from app.utils.prediction_cache import PredictionCache
+    from app.utils.storage import ParquetStorage
+
+    readings = pd.DataFrame({
+        'timestamp': pd.to_datetime(['2024-01-01 08:00:00', '2024-01-01 08:00:00']),
+        'machine_id': ['CNC_1', 'CNC_2'], 'vibration': [1.2, 2.1], 'temperature': [65.5, 78.3],
+        'current': [12.3, 15.2], 'pressure': [2.1, 2.8], 'operating_hours': [1200, 1450],
+    })
+    sensor_site(readings)
+    storage = ParquetStorage(str(tmp_path / "sensor.parquet"))
+    storage.write(readings)
+    loader = DataLoader(data_dir=str(tmp_path), storage=storage)
+    service = MachinesService()
+    service.data_loader = loader
+    service.prediction_cache = PredictionCache()
+    loader.add_ingest_listener(service.prediction_cache.invalidate)
+
+    first = service.get_machine_details('CNC_1')['current_status']
+    service.get_machine_details('CNC_1')
+    assert service.prediction_cache.stats()['hits'] == 1 and loader.sensor_data is None
+
+    # The rewrite drops every entry, and the next view scores the new latest reading
+    latest = readings.head(1).assign(timestamp=pd.Timestamp('2024-01-01 09:00:00'), vibration=2.4,
+                                     temperature=92.0, current=19.0, pressure=3.4, operating_hours=1201)
+    storage.write(pd.concat([readings, latest], ignore_index=True))
+    loader.handle_file_changes([storage.path])
+    assert len(service.prediction_cache) == 0
+    updated = service.get_machine_details('CNC_1')['current_status']
+    assert updated['failure_risk'] == 'High' and updated != first
+    assert service.prediction_cache.stats()['misses'] == 2
+
+def test_scoring_config_hot_reload(tmp_path, monkeypatch):
+    """Test per-machine-type scoring profiles and that a reload invalidates only retuned profiles."""
+    import json
+    from app.utils.channels import channel_registry
+    from utils.fleet_scoring import FleetScorer
+    from app.utils.prediction_cache import PredictionCache
+    from app.utils.scoring_config import ScoringConfig
+
+    config_file = tmp_path / "scoring.json"
+    definition = {
+        'channels': {'pressure': {'weight': 0.3}},
+        'machine_types': {
+            'heavy_duty': {'machines': ['CNC_3', 'HD_*'],
+                           'channels': {'vibration': {'thresholds': {'low': 1.5, 'medium': 2.0, 'high': 3.0}}}},
+            'precision': {'machines': ['CNC_9'], 'channels': {'temperature': {'thresholds': {'high': 85}}}},
+        },
+    }
+    config_file.write_text(json.dumps(definition))
+    scoring = ScoringConfig(channel_registry, path=str(config_file))
+    compiled = scoring.compiled
+    assert compiled.names == ('default', 'heavy_duty', 'precision')
+    assert compiled.thresholds.shape == (3, len(channel_registry), 3)
+    assert compiled.profiles(['CNC_1', 'CNC_3', 'HD_7', 'CNC_9']).tolist() == [0, 1, 1, 2]
+    # Normalized weights: the pressure override makes them sum to 1.1
+    assert compiled.weights[1].sum() == pytest.approx(1.1)
+
+    predictor = MaintenancePredictor(scoring=scoring)
+    readings = pd.DataFrame({
+        'machine_id': ['CNC_1', 'CNC_3', 'HD_7', 'CNC_9', 'CNC_1'],
+        'vibration': [3.5, 3.5, 1.8, 1.2, 1.8],
+        'temperature': [72.0, 72.0, 88.0, 88.0, 95.0],
+        'current': [13.0, 13.0, 13.0, 13.0, 15.0],
+        'pressure': [2.2, 2.2, 2.2, 2.2, 3.2],
+    })
+    scores = predictor.score_batch(readings, explain=True)
+    expected = [predictor.calculate_failure_risk(row) for row in readings.to_dict('records')]
+    for column in ['risk_score', 'failure_risk', 'predicted_days_to_failure', 'confidence', 'reason']:
+        assert scores[column].tolist() == [prediction[column] for prediction in expected]
+    # Machine types quote their own high thresholds
+    assert expected[0]['reason'] == "Vibration exceeded 2.0 g"
+    assert expected[1]['reason'] == "Vibration exceeded 3.0 g"
+    assert "85.0" in expected[3]['reason'] and expected[2]['risk_score'] < expected[3]['risk_score']
+
+    # Pool workers score with the snapshot and profiles they are sent
+    monkeypatch.setattr(os, 'cpu_count', lambda: 2)
+    scorer = FleetScorer(predictor, workers=2, shard_size=2, min_rows=0)
+    try:
+        pd.testing.assert_frame_equal(scorer.score(readings), scores)
+    finally:
+        scorer.close()
+
+    cache = PredictionCache()
+    scoring.add_listener(cache.invalidate_versions)
+    for machine_id in ['CNC_1', 'CNC_3', 'CNC_9']:
+        cache.put(PredictionCache.fingerprint(machine_id, 't', scoring.machine_version(machine_id)), machine_id)
+
+    # Retuning one machine type makes only that profile stale
+    definition['machine_types']['heavy_duty']['channels']['vibration']['thresholds']['high'] = 2.5
+    config_file.write_text(json.dumps(definition))
+    assert scoring.reload() == {('heavy_duty', 0)}
+    assert scoring.version == 1 and scoring.compiled.versions == (0, 1, 0)
+    assert len(cache) == 2 and cache.stats()['invalidations'] == 1
+    assert predictor.calculate_failure_risk(readings.iloc[1].to_dict())['reason'] == "Vibration exceeded 2.5 g"
+
+    # An unchanged file is no new version; an invalid one keeps the current config
+    assert scoring.reload() == set() and scoring.version == 1
+    config_file.write_text(json.dumps({'channels': {'vibration': {'thresholds': {'high': 0.5}}}}))
+    with pytest.raises(ValueError):
+        scoring.reload()
+    assert scoring.version == 1 and scoring.compiled.thresholds[1, 0, 2] == 2.5
+
+def test_scoring_profiles_reach_rul_and_risk_history(tmp_path, sensor_site):
+    """Test that machine-type profiles and reloads reach remaining life and stored risk."""
+    import json
+    import scoring_config
+    from app.utils.machine_index import MachineIndex
+    from app.utils.risk_history import RiskHistory
+    from app.utils.rul import RemainingLifeEstimator
+    from app.utils.sqlite_loader import SQLiteDataLoader
+
+    timestamps = pd.date_range('2024-01-01', periods=48, freq='h')
+    readings = pd.concat([pd.DataFrame({
+        'machine_id': machine_id,
+        'timestamp': timestamps,
+        'vibration': 1.0 + np.arange(48) * 0.021,
+        'temperature': 75.0,
+        'current': 13.0,
+        'pressure': 2.2,
+        'operating_hours': 1200 + np.arange(48),
+    }) for machine_id in ('CNC_1', 'CNC_3')], ignore_index=True)
+    config_file = tmp_path / "scoring.json"
+
+    def write_config(high):
+        config_file.write_text(json.dumps({'machine_types': {'heavy_duty': {
+            'machines': ['CNC_3'], 'channels': {'vibration': {'thresholds': {'low': 1.2, 'medium': 1.5, 'high': high}}}
+        }}}))
+
+    write_config(1.8)
+    scoring = scoring_config.ScoringConfig(path=str(config_file))
+    predictor = MaintenancePredictor(scoring=scoring)
+
+    # Remaining life projects to each machine's own high threshold, as currently configured
+    estimator = RemainingLifeEstimator(half_life_hours=1000, scoring=scoring)
+    estimator.update(readings)
+    days = estimator.estimates().set_index('machine_id')['remaining_life_days']
+    assert days['CNC_3'] < days['CNC_1']
+    write_config(2.0)
+    scoring.reload()
+    assert estimator.estimates().set_index('machine_id')['remaining_life_days']['CNC_3'] == pytest.approx(days['CNC_1'])
+
+    # The in-memory risk history re-scores only the retuned machine type's rows
+    history = RiskHistory(predictor)
+    history.backfill(MachineIndex(readings))
+    write_config(1.6)
+    scoring.reload()
+    assert history.refresh() == 48
+    assert history.scores.tolist() == predictor.score_batch(history.index.data)['risk_score'].tolist()
+    assert history.refresh() == 0
+
+    # SQLite stores each row's profile and re-scores a machine's rows once its profile changes
+    sensor_site(readings)
+    shared = scoring_config.scoring_config
+    write_config(1.8)
+    shared.path = str(config_file)
+    try:
+        shared.reload()
+        loader = SQLiteDataLoader(data_dir=str(tmp_path), db_path=str(tmp_path / "data.db"))
+        expected = MaintenancePredictor().score_batch(readings[readings['machine_id'] == 'CNC_3'])
+        assert loader.get_machine_risk_history('CNC_3')['risk_score'].tolist() == expected['risk_score'].tolist()
+        write_config(1.6)
+        shared.reload()
+        expected = MaintenancePredictor().score_batch(readings[readings['machine_id'] == 'CNC_3'])
+        assert loader.get_machine_risk_history('CNC_3')['failure_risk'].tolist() == expected['failure_risk'].tolist()
+        assert loader._refresh_machine_risk('CNC_3') == 0 and loader._refresh_machine_risk('CNC_1') == 0
+    finally:
+        shared.path = ""
+        shared.reload()
+
+def test_federated_scoring_profiles_match_fleet_ids(tmp_path):
+    """Test that site loaders match scoring profiles against the same fleet-wide IDs as the service."""
+    import json
+    import shutil
+    import scoring_config
+    from app.config.app_config import config
+    from app.utils.federation import FederatedDataLoader
+    from app.utils.sqlite_loader import SQLiteDataLoader
+
+    readings = pd.DataFrame({
+        'machine_id': 'CNC_1',
+        'timestamp': pd.date_range('2024-01-01', periods=48, freq='h'),
+        'vibration': 1.0 + np.arange(48) * 0.021,
+        'temperature': 75.0,
+        'current': 13.0,
+        'pressure': 2.2,
+        'operating_hours': 1200 + np.arange(48),
+    })
+    sites = {}
+    for site in ('plant_a', 'plant_b'):
+        (tmp_path / site).mkdir()
+        readings.to_csv(tmp_path / site / config.SENSOR_DATA_FILE, index=False, date_format='%Y-%m-%d %H:%M:%S')
+        shutil.copy(os.path.join(config.DATA_DIR, config.MAINTENANCE_DATA_FILE), tmp_path / site)
+        sites[site] = str(tmp_path / site)
+    # Only plant_b's CNC machines are heavy duty
+    config_file = tmp_path / "scoring.json"
+    config_file.write_text(json.dumps({'machine_types': {'heavy_duty': {
+        'machines': ['plant_b:CNC_*'], 'channels': {'vibration': {'thresholds': {'low': 1.2, 'medium': 1.5, 'high': 1.8}}}
+    }}}))
+    shared = scoring_config.scoring_config
+    shared.path = str(config_file)
+    try:
+        shared.reload()
+        fleet = FederatedDataLoader(sites)
+        predictor = MaintenancePredictor()
+        for machine_id in ('plant_a:CNC_1', 'plant_b:CNC_1'):
+            # The service scores the fleet-wide history; the site's stored risk agrees
+            expected = predictor.score_batch(fleet.get_machine_history(machine_id))
+            assert fleet.get_machine_risk_history(machine_id)['risk_score'].tolist() == expected['risk_score'].tolist()
+        assert fleet.get_machine_risk_history('plant_b:CNC_1')['risk_score'].tolist() != \
+            fleet.get_machine_risk_history('plant_a:CNC_1')['risk_score'].tolist()
+        days = fleet.get_remaining_life().set_index('machine_id')['remaining_life_days']
+        assert days['plant_b:CNC_1'] < days['plant_a:CNC_1']
+
+        site = SQLiteDataLoader(data_dir=sites['plant_b'], db_path=str(tmp_path / "plant_b.db"),
+                                site='plant_b', federated=True)
+        assert site.get_machine_risk_history('CNC_1')['risk_score'].tolist() == \
+            fleet.get_machine_risk_history('plant_b:CNC_1')['risk_score'].tolist()
+        assert site.get_machine_remaining_life('CNC_1')['remaining_life_days'] == pytest.approx(days['plant_b:CNC_1'])
+    finally:
+        shared.path = ""
+        shared.reload()